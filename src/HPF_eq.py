@@ -1,5 +1,6 @@
-from typing import Dict, List, Tuple
-from models import Place
+from typing import Dict, List, Tuple, Union
+from models import Place, PlaceSet, coords_array
+from similarity import IndexedScores, PairwiseSimilarity, exact_pss_of, exact_similarity, id_index, maxDistance
 
 
 def HPF(pi: Place, pj: Place, W: float, psS, sS, k: int) -> float:
@@ -46,6 +47,75 @@ def HPFR_div(R: List[Place], baseline_psS: Dict[int, float], baseline_sS: Dict[T
     
     return score_rf, score_ps, sum(baseline_psS[p.id] for p in R), sum(W*psR[p.id] for p in R)
 
+#######################################################################################################################
+# Exact scoring of R without the K^2 precompute of S
+def exact_R_similarity(S: Union[List[Place], PlaceSet], R: List[Place]) -> Tuple[IndexedScores, PairwiseSimilarity]:
+    """
+    Exact psS (w.r.t. the whole S) of the places in R and their pairwise
+    similarities: O(kK) distance work instead of base_precompute's O(K^2).
+    """
+    maxD = maxDistance(S)
+    psS_R = IndexedScores(id_index(R), exact_pss_of(coords_array(S), coords_array(R), maxD))
+    _, sS_R = exact_similarity(R, maxD)
+    return psS_R, sS_R
+
+def HPFR_exact(S: Union[List[Place], PlaceSet], R: List[Place], W: float):
+    """HPFR(R, exact psS, exact sS, W, |S|) from exact_R_similarity."""
+    psS_R, sS_R = exact_R_similarity(S, R)
+    return HPFR(R, psS_R, sS_R, W, len(S))
+
+def HPFR_div_exact(S: Union[List[Place], PlaceSet], R: List[Place], W: float):
+    """HPFR_div(R, exact psS, exact sS, W, |S|) from exact_R_similarity."""
+    psS_R, sS_R = exact_R_similarity(S, R)
+    return HPFR_div(R, psS_R, sS_R, W, len(S))
+
+class HPFRTracker:
+    """
+    HPFR / HPFR_div bookkeeping done by the selection loops: each picked place
+    adds its rF, its psS and its similarity to the places picked before it, so
+    the final score needs no O(k^2) pass over sS.
+
+    exact=True is for selections run on approximate psS/sS (grid, samples): the
+    values passed to add() are ignored and the picked places are scored against
+    S with exact_R_similarity when the score is read.
+    """
+
+    def __init__(self, S: Union[List[Place], PlaceSet], W: float, exact: bool = False):
+        self.S = S
+        self.K = len(S)
+        self.W = W
+        self.exact = exact
+        self.R: List[Place] = []
+        self.sum_rF = 0.0
+        self.sum_psS = 0.0
+        self.sum_psR = 0.0  # sum over p in R of psR[p] (every pair counted twice)
+
+    def add(self, place: Place, ps: float = 0.0, sims: float = 0.0) -> None:
+        """place was picked; ps = psS[place], sims = sum of sS(place, r) over the places already in R."""
+        self.R.append(place)
+        self.sum_rF += place.rF
+        if not self.exact:
+            self.sum_psS += ps
+            self.sum_psR += 2.0 * sims
+
+    def _sums(self) -> Tuple[float, float]:
+        if self.exact:
+            psS_R, sS_R = exact_R_similarity(self.S, self.R)
+            return float(psS_R.values.sum()), float(sS_R.matrix.sum())
+        return self.sum_psS, self.sum_psR
+
+    def hpfr(self):
+        """Same (score, sum psS, sum W*psR) as HPFR."""
+        k, W = len(self.R), self.W
+        sum_psS, sum_psR = self._sums()
+        score = self.sum_rF / (2 * k) + (sum_psS - W * sum_psR) / (2 * k * (self.K - W))
+        return score, sum_psS, W * sum_psR
+
+    def hpfr_div(self):
+        """Same (score_rf, score_ps, sum psS, sum W*psR) as HPFR_div."""
+        sum_psS, sum_psR = self._sums()
+        return self.sum_rF, sum_psS - self.W * sum_psR, sum_psS, self.W * sum_psR
+
 # use symmetric sS
 def spacial_proximity(sS, pi, pj):
     return sS.get((pi.id, pj.id)) or sS.get((pj.id, pi.id)) or 0.0
\ No newline at end of file
@@ -1,70 +1,94 @@
-import copy
 import pandas as pd
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Union
 from math import floor
 import time
+import warnings
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_pdf import PdfPages
-from HPF_eq import HPFR, HPFR_div
-from models import Place
+from HPF_eq import HPFR, HPFR_div, HPFRTracker
+from models import Place, PlaceSet, ids_array, rF_array
+from similarity import IndexedScores, PairwiseSimilarity, exact_similarity, lazy_similarity, maxDistance, resolve_workers
 import config as cfg
 
 
 
 # --- subfunction ---
-def baseline_iadu_algorithm(S: List[Place], K_full: int, k: int, W: float, psS, sS) -> Tuple[List[Place], float]:
-    R = []
+def baseline_iadu_algorithm(S: Union[List[Place], PlaceSet], K_full: int, k: int, W: float, psS, sS, tracker: HPFRTracker = None) -> Tuple[List[Place], float]:
+    """
+    IAdU over contiguous arrays (no copy of S): cHPF, rF and psS are vectors,
+    selected places are masked out with cHPF = -inf, curMP is an argmax and each
+    round is one vector update with the similarity row of curMP. Row-capable sS
+    (dense or matrix-free) gives O(kK) time; a LazySimilarity keeps memory O(K).
+    With a tracker, every pick also feeds the HPFR running sums (psS, psR, rF).
+    """
+    if k > len(S):
+        raise ValueError(f"IAdU error: k ({k}) is larger than the number of places ({len(S)})")
     K = K_full
-    candidates = copy.deepcopy(S)
+    ps = _score_vector(psS, S)
+    rF = rF_array(S)
+    row_of = _similarity_rows(sS, S)
+
+    cHPF = ps + rF
+    R = []
+    picked = []
 
-    for p in candidates:
-        #+ p.rF
-        p.cHPF = psS[p.id] + p.rF
-        #p.cHPF = 0
-    
     select_start = time.time()
     while len(R) < k:
-        curMP = max(candidates, key=lambda p: p.cHPF)
-        candidates.remove(curMP)
-        R.append(curMP)
-        if len(R) < k:
-            for p in candidates:
-                if p.id != curMP.id:
-                    p.cHPF += (K - k) * (p.rF + curMP.rF) / (k - 1) + (psS[p.id] + psS[curMP.id]) / (k - 1) - 2  * W * spacial_proximity(sS, p, curMP)
+        cur = int(np.argmax(cHPF))
+        cHPF[cur] = -np.inf  # no longer a candidate
+        last = len(R) + 1 == k
+        tracked = tracker is not None and not tracker.exact
+        row = row_of(cur) if not last or tracked else None
+        R.append(S[cur])
+        if tracker is not None:
+            tracker.add(R[-1], float(ps[cur]), float(row[picked].sum()) if tracked else 0.0)
+        picked.append(cur)
+        if not last:
+            cHPF += (K - k) * (rF + rF[cur]) / (k - 1) + (ps + ps[cur]) / (k - 1) - 2 * W * row
     select_end = time.time()
-    
-    select_end - select_start
+
     return R, select_end - select_start
 
+def _score_vector(psS, S: List[Place]) -> np.ndarray:
+    """psS values in S order."""
+    ids = ids_array(S).tolist()
+    if isinstance(psS, IndexedScores):
+        return psS.values[np.fromiter(map(psS.index.__getitem__, ids), dtype=np.int64, count=len(ids))]
+    return np.fromiter(map(psS.__getitem__, ids), dtype=np.float64, count=len(ids))
+
+def _similarity_rows(sS, S: List[Place]):
+    """Return row_of(i): similarities between S[i] and every place of S, in S order."""
+    if not hasattr(sS, "row"):
+        # plain tuple-keyed dict (e.g. grid sS): gather one lookup per place
+        places = list(S)
+        return lambda i: np.fromiter((spacial_proximity(sS, p, places[i]) for p in places), dtype=np.float64, count=len(places))
+
+    rows = np.fromiter(map(sS.index.__getitem__, ids_array(S).tolist()), dtype=np.int64, count=len(S))
+    if np.array_equal(rows, np.arange(len(S))):
+        return lambda i: sS.row(i)
+    return lambda i: sS.row(rows[i])[rows]
+
 ############################################################################################################
 # use symmetric sS
 def spacial_proximity(sS, pi, pj):
     return sS.get((pi.id, pj.id)) or sS.get((pj.id, pi.id)) or 0.0
 
 
-def base_precompute(S: List[Place]) -> Tuple[Dict[int, float], Dict[Tuple[int, int], float], float]:
-    sS = {}
-    maxD = maxDistance(S)
-    # Initialize psS
-    psS = {p.id: 0.0 for p in S}
-    
+def base_precompute(S: List[Place], materialize: bool = True, workers: int = None) -> Tuple[IndexedScores, PairwiseSimilarity, float]:
+    if materialize and workers is not None and resolve_workers(workers) > 1:
+        # the dense matrix is filled in one process; only the matrix-free psS pass is parallel
+        warnings.warn(f"base_precompute: workers={workers} is ignored with materialize=True "
+                      "(only the materialize=False psS pass runs in parallel).", stacklevel=2)
     prep_start = time.time()
-    for i in range(len(S)):
-        pi = S[i]
-        for j in range(i + 1, len(S)):
-            pj = S[j]
-            sim = 0
-            if pi.id != pj.id:
-                # Calculate Euclidean distance and similarity
-                d = np.linalg.norm(pi.coords - pj.coords)
-                sim = 1 - d / maxD
-                
-                # Store similarity in the dictionary
-                sS[pi.id, pj.id] = sim
-                # Update psS
-                psS[pj.id] += sim
-                psS[pi.id] += sim
+    maxD = maxDistance(S)
+    if materialize:
+        # Tiled NumPy pass: dense similarity matrix + psS vector, one id -> row index map
+        psS, sS = exact_similarity(S, maxD)
+    else:
+        # Same psS, but sS keeps only the coordinates (rows computed on demand);
+        # the psS pass is split over `workers` processes (default cfg.PRECOMPUTE_WORKERS)
+        psS, sS = lazy_similarity(S, maxD, resolve_workers(workers))
     prep_end = time.time()
             
     return psS, sS, prep_end - prep_start
@@ -72,30 +96,32 @@ def base_precompute(S: List[Place]) -> Tuple[Dict[int, float], Dict[Tuple[int, i
 ####################################################################################################
 #####################################################################################################
 # --- IAdU method ---
-def iadu(S: List[Place], k: int, W) -> Tuple[List[Place], Dict[int, float], Dict[int, float], float, float, float]:
+def iadu(S: List[Place], k: int, W, materialize: bool = True, workers: int = None) -> Tuple[List[Place], Dict[int, float], Dict[int, float], float, float, float]:
     K = len(S)
-    # Preparation step
-    exact_psS, exact_sS, prep_time = base_precompute(S)
+    # Preparation step (materialize=False: matrix-free sS for very large K)
+    exact_psS, exact_sS, prep_time = base_precompute(S, materialize, workers)
         
-    # Run baseline IAdU algorithm
-    R, selection_time = baseline_iadu_algorithm(S, K, k, W, exact_psS, exact_sS)
+    # Run baseline IAdU algorithm (HPFR sums kept while selecting)
+    tracker = HPFRTracker(S, W)
+    R, selection_time = baseline_iadu_algorithm(S, K, k, W, exact_psS, exact_sS, tracker)
     
     # Compute final scores
-    score, sum_psS, sum_psR = HPFR(R, exact_psS, exact_sS, W, len(S))
+    score, sum_psS, sum_psR = tracker.hpfr()
     
     return R, score, sum_psS, sum_psR, prep_time, selection_time
 
 # --- IAdU method ---
-def iadu_div(S: List[Place], k: int, W) -> Tuple[List[Place], Dict[int, float], Dict[int, float], float, float, float]:
+def iadu_div(S: List[Place], k: int, W, materialize: bool = True, workers: int = None) -> Tuple[List[Place], Dict[int, float], Dict[int, float], float, float, float]:
     K = len(S)
-    # Preparation step
-    exact_psS, exact_sS, prep_time = base_precompute(S)
+    # Preparation step (materialize=False: matrix-free sS for very large K)
+    exact_psS, exact_sS, prep_time = base_precompute(S, materialize, workers)
         
-    # Run baseline IAdU algorithm
-    R, selection_time = baseline_iadu_algorithm(S, K, k, W, exact_psS, exact_sS)
+    # Run baseline IAdU algorithm (HPFR sums kept while selecting)
+    tracker = HPFRTracker(S, W)
+    R, selection_time = baseline_iadu_algorithm(S, K, k, W, exact_psS, exact_sS, tracker)
     
     # Compute final scores
-    score_rf, score_ps, sum_psS, sum_psR = HPFR_div(R, exact_psS, exact_sS, W, len(S))
+    score_rf, score_ps, sum_psS, sum_psR = tracker.hpfr_div()
     
     return R, score_rf + score_ps, score_rf, score_ps, sum_psS, sum_psR, prep_time, selection_time
 
@@ -106,38 +132,42 @@ def iadu_div(S: List[Place], k: int, W) -> Tuple[List[Place], Dict[int, float],
 #     with open(path, "rb") as f:
 #         return pickle.load(f)
 
-def load_db_dataset(region_name: str, K: int) -> List[Place]:
+def load_db_dataset(region_name: str, K: int) -> Union[List[Place], PlaceSet]:
     """
     Load a DBpedia subregion dataset (exact K places) from db_datasets folder.
     """
-    import pickle, os
-    from models import Place
+    import os
+    from columnar_store import NESTED_SUFFIX, columnar_path, is_columnar, load_nested, load_places, serves_nested
+    nested = os.path.join("db_datasets", f"dbpedia_{region_name}{NESTED_SUFFIX}")
+    if serves_nested(nested, K):
+        return load_nested(nested, K)
     fname = f"dbpedia_{region_name}_K{K}.pkl"
     path = os.path.join("db_datasets", fname)
-    if not os.path.exists(path):
+    if not os.path.exists(path) and not is_columnar(columnar_path(path)):
         raise FileNotFoundError(f"No dataset file found: {path}")
-    with open(path, "rb") as f:
-        data: List[Place] = pickle.load(f)
-    return data
+    return load_places(path)
 
-def load_yago_dataset(region_name: str, K: int) -> List[Place]:
+def load_yago_dataset(region_name: str, K: int) -> Union[List[Place], PlaceSet]:
     """
     Load a DBpedia subregion dataset (exact K places) from db_datasets folder.
     """
-    import pickle, os
-    from models import Place
+    import os
+    from columnar_store import NESTED_SUFFIX, columnar_path, is_columnar, load_nested, load_places, serves_nested
+    nested = os.path.join("yago_datasets", f"yago_{region_name}{NESTED_SUFFIX}")
+    if serves_nested(nested, K):
+        return load_nested(nested, K)
     fname = f"yago_{region_name}_K{K}.pkl"
     path = os.path.join("yago_datasets", fname)
-    if not os.path.exists(path):
+    if not os.path.exists(path) and not is_columnar(columnar_path(path)):
         raise FileNotFoundError(f"No dataset file found: {path}")
-    with open(path, "rb") as f:
-        data: List[Place] = pickle.load(f)
-    return data
+    return load_places(path)
 from typing import List
 import os, pickle, re
 from models import Place
+from columnar_store import COLUMNAR_SUFFIX, NESTED_SUFFIX, columnar_path, is_columnar, load_nested, load_places, serves_nested
+from dataset_catalog import catalog_for, norm_title
 
-def load_dataset(shape: str, K: int, datasets_dir: str = None) -> List[Place]:
+def load_dataset(shape: str, K: int, datasets_dir: str = None) -> Union[List[Place], PlaceSet]:
     """
     Load a dataset list[Place] for a given Wikipedia/YAGO title `shape` and cardinality K.
     Auto-detects YAGO vs DBpedia by filename prefix.
@@ -145,8 +175,13 @@ def load_dataset(shape: str, K: int, datasets_dir: str = None) -> List[Place]:
     Expected filenames inside datasets_dir:
         - dbpedia_<TITLE>_K{K}.pkl
         - yago_<TITLE>_K{K}.pkl
+    or their columnar copies (<same name>.cols, see columnar_store.py), which are
+    preferred when present and load as a memory-mapped PlaceSet, or one nested
+    region file for all K (dbpedia_<TITLE>.nested / yago_<TITLE>.nested).
 
     The function is tolerant to minor punctuation/Unicode differences in <TITLE>.
+    With cfg.USE_DATASET_CATALOG the datasets folder's catalog.json answers first
+    (one lookup, stored maxD); files missing from it are still found by the scan.
     """
     # --- Locate datasets directory (../datasets preferred; fall back to ./datasets)
     here = os.path.abspath(os.path.dirname(__file__))
@@ -157,37 +192,46 @@ def load_dataset(shape: str, K: int, datasets_dir: str = None) -> List[Place]:
     candidates_dirs.append(os.path.abspath(os.path.join(here, "datasets")))
     base_dir = next((d for d in candidates_dirs if os.path.isdir(d)), candidates_dirs[0])
 
+    # --- Catalog (O(1) lookup, seeds maxDistance with the stored diameter)
+    catalog = catalog_for(base_dir) if getattr(cfg, "USE_DATASET_CATALOG", False) else None
+    if catalog is not None:
+        S = catalog.load(shape, K)
+        if S is not None:
+            return S
+
     # --- Candidate exact paths (fast path)
     exact_candidates = [
         os.path.join(base_dir, f"yago_{shape}_K{K}.pkl"),
         os.path.join(base_dir, f"dbpedia_{shape}_K{K}.pkl"),
     ]
     for path in exact_candidates:
-        if os.path.exists(path):
-            with open(path, "rb") as f:
-                return pickle.load(f)
+        if os.path.exists(path) or is_columnar(columnar_path(path)):
+            return load_places(path)
+    for prefix in ("yago_", "dbpedia_"):
+        path = os.path.join(base_dir, f"{prefix}{shape}{NESTED_SUFFIX}")
+        if serves_nested(path, K):
+            return load_nested(path, K)
 
     # --- Fallback: tolerant scan (handles ’ vs ', en dash vs hyphen, etc.)
-    def norm(s: str) -> str:
-        # unify dashes/apostrophes, keep alnum/underscore, collapse repeats
-        s = s.replace("–", "-").replace("—", "-").replace("’", "'")
-        s = s.replace("´", "'").replace("`", "'")
-        # keep letters/numbers/underscore only
-        s = re.sub(r"[^0-9A-Za-z_'-]+", "_", s)
-        # treat apostrophes like underscore for filename matching
-        s = s.replace("'", "_").replace("-", "_")
-        s = re.sub(r"_+", "_", s).strip("_").lower()
-        return s
+    norm = norm_title
+
+    def _serves(fname: str) -> bool:
+        if fname.endswith(NESTED_SUFFIX):
+            return serves_nested(os.path.join(base_dir, fname), K)
+        return fname.endswith((f"_K{K}.pkl", f"_K{K}{COLUMNAR_SUFFIX}"))
+
+    def _title(fname: str) -> str:
+        return fname[:-len(NESTED_SUFFIX)] if fname.endswith(NESTED_SUFFIX) else fname.split("_K")[0]
 
     target = norm(shape)
     best_path = None
     for fname in os.listdir(base_dir):
-        if not fname.endswith(f"_K{K}.pkl"):
+        if not _serves(fname):
             continue
         if not (fname.startswith("dbpedia_") or fname.startswith("yago_")):
             continue
         # strip prefix & suffix to compare the title part
-        title_part = fname.split("_K")[0]
+        title_part = _title(fname)
         title_part = title_part.split("dbpedia_", 1)[-1] if title_part.startswith("dbpedia_") else title_part.split("yago_", 1)[-1]
         if norm(title_part) == target:
             best_path = os.path.join(base_dir, fname)
@@ -196,19 +240,20 @@ def load_dataset(shape: str, K: int, datasets_dir: str = None) -> List[Place]:
     if best_path is None:
         # last-resort: loosen to "starts with" (helps when your stored title had extra tail)
         for fname in os.listdir(base_dir):
-            if not fname.endswith(f"_K{K}.pkl"):
+            if not _serves(fname):
                 continue
             if not (fname.startswith("dbpedia_") or fname.startswith("yago_")):
                 continue
-            title_part = fname.split("_K")[0]
+            title_part = _title(fname)
             title_part = title_part.split("dbpedia_", 1)[-1] if title_part.startswith("dbpedia_") else title_part.split("yago_", 1)[-1]
             if norm(title_part).startswith(target):
                 best_path = os.path.join(base_dir, fname)
                 break
 
+    if best_path and best_path.endswith(NESTED_SUFFIX):
+        return load_nested(best_path, K)
     if best_path and os.path.exists(best_path):
-        with open(best_path, "rb") as f:
-            return pickle.load(f)
+        return load_places(best_path)
 
     # If we reach here, nothing matched
     searched = "\n  - " + "\n  - ".join(exact_candidates)
@@ -217,15 +262,6 @@ def load_dataset(shape: str, K: int, datasets_dir: str = None) -> List[Place]:
         f"Tried:{searched}\nAlso scanned folder with tolerant matching."
     )
 
-def maxDistance(S: List[Place]) -> float:
-    maxD = 0
-    coords = np.array([p.coords for p in S])
-    for i in range(len(S)):
-        for j in range(i + 1, len(S)):
-            d = np.linalg.norm(coords[i] - coords[j])
-            maxD = max(maxD, d)
-    return maxD
-
 # --- Plot utility ---
 def plot_selected(S: List[Place], R: List[Place], title: str, ax):
     coords = np.array([p.coords for p in S])
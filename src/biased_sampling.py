@@ -3,42 +3,39 @@ import time
 from typing import Dict, Tuple
 
 import numpy as np
-from HPF_eq import HPFR, HPFR_div
-from baseline_iadu import base_precompute
-from models import List, Place
+from HPF_eq import HPFR_div_exact, HPFR_exact
+from models import List, Place, PlaceSet
 
 
 def biased_sampling(S: List[Place], k: int, W) -> Tuple[List[Place], Dict[int, float], float, float]:
     
-    # Preparation step
-    psS, sS, prep_time = base_precompute(S)
-    
     # Random selection
     R_sampling, pruning_time = select_random(S, k)
     
     # Compute final scores
-    score, sum_psS, sum_psR = HPFR(R_sampling, psS, sS, W, len(S))
+    score, sum_psS, sum_psR = HPFR_exact(S, R_sampling, W)
     
     return R_sampling, score, sum_psS, sum_psR, pruning_time
 
 
 def biased_sampling_div(S: List[Place], k: int, W) -> Tuple[List[Place], Dict[int, float], float, float]:
     
-    # Preparation step
-    psS, sS, prep_time = base_precompute(S)
-    
     # Random selection
     R_sampling, pruning_time = select_random(S, k)
     
     # Compute final scores
-    score_rf, score_ps, sum_psS, sum_psR = HPFR_div(R_sampling, psS, sS, W, len(S))
+    score_rf, score_ps, sum_psS, sum_psR = HPFR_div_exact(S, R_sampling, W)
     
     return R_sampling, score_rf + score_ps, score_rf, score_ps, sum_psS, sum_psR, pruning_time
 
 def select_random(S: List[Place], k: int):
     
     pruning_time_start = time.time()
-    sampled_S = random.sample(S, k)
+    if isinstance(S, PlaceSet):
+        # same draws as random.sample(S, k), returned as a view on S
+        sampled_S = S.take(random.sample(range(len(S)), k))
+    else:
+        sampled_S = random.sample(S, k)
     pruning_time = time.time() - pruning_time_start
     
     return  sampled_S, pruning_time
\ No newline at end of file
@@ -0,0 +1,181 @@
+# columnar_store.py — column-per-file dataset format loaded with mmap into a PlaceSet
+#
+#   <stem>.cols/ids.npy   int64
+#   <stem>.cols/x.npy     float64
+#   <stem>.cols/y.npy     float64
+#   <stem>.cols/rF.npy    float64
+#   <stem>.cols/meta.json {"format": 1, "K": ...}
+#
+# <stem> is the name of the pickle it replaces (dbpedia_<TITLE>_K{K}, yago_<TITLE>_K{K},
+# {shape}_K{K}), so loaders can look for "<pkl without .pkl>.cols" next to the pickle.
+# A converted copy records the pickle's "source_size"/"source_mtime_ns" in meta.json and
+# is only used while they match (a regenerated pickle wins over its stale columns).
+#
+# Nested region files (<prefix>_<TITLE>.nested/) use the same columns for ONE ranked
+# region (L-inf order, so every K-query is a prefix) plus meta "offsets" {K: rows}
+# for the generated K targets; any K up to meta "K" is served by mapping the first K rows.
+
+import argparse
+import json
+import os
+import pickle
+import re
+from typing import Iterable, List, Optional, Union
+
+import numpy as np
+
+from models import Place, PlaceSet, as_placeset
+
+COLUMNAR_SUFFIX = ".cols"
+NESTED_SUFFIX = ".nested"
+FORMAT_VERSION = 1
+_COLUMNS = ("ids", "x", "y", "rF")
+# {anything}_K{K}.pkl (dbpedia_/yago_ queries and the simulated {shape}_K{K} sets)
+_DATASET_PKL = re.compile(r"^.+_K\d+\.pkl$")
+
+
+def columnar_path(pkl_path: str) -> str:
+    """Columnar directory that stands for a dataset pickle."""
+    root, _ = os.path.splitext(pkl_path)
+    return root + COLUMNAR_SUFFIX
+
+
+def is_columnar(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, "meta.json"))
+
+
+def save_columnar(places: Union[List[Place], PlaceSet], path: str, meta: Optional[dict] = None) -> str:
+    """Write places (ids, coords, rF kept) as a columnar directory; returns its path."""
+    ps = as_placeset(places)
+    os.makedirs(path, exist_ok=True)
+    for name, col in zip(_COLUMNS, (ps.ids, ps.xs, ps.ys, ps.rF)):
+        np.save(os.path.join(path, f"{name}.npy"), col)
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({"format": FORMAT_VERSION, "K": len(ps), **(meta or {})}, f)
+    return path
+
+
+def read_meta(path: str) -> dict:
+    with open(os.path.join(path, "meta.json")) as f:
+        return json.load(f)
+
+
+def _source_meta(pkl_path: str) -> dict:
+    st = os.stat(pkl_path)
+    return {"source_size": st.st_size, "source_mtime_ns": st.st_mtime_ns}
+
+
+def serves_pickle(cols: str, pkl_path: str) -> bool:
+    """
+    True if the columnar copy `cols` stands for pkl_path: it exists and was
+    converted from the pickle as it is now (or the pickle has been removed).
+    """
+    if not is_columnar(cols):
+        return False
+    if not os.path.exists(pkl_path):
+        return True
+    meta = read_meta(cols)
+    return all(meta.get(k) == v for k, v in _source_meta(pkl_path).items())
+
+
+def load_columnar(path: str, mmap: bool = True) -> PlaceSet:
+    """
+    Columnar dataset as a PlaceSet. With mmap=True the columns are read-only
+    memory maps wrapped without a copy, so load time does not depend on K.
+    """
+    mode = "r" if mmap else None
+    ids, xs, ys, rF = (np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode) for name in _COLUMNS)
+    return PlaceSet(ids, xs, ys, rF)
+
+
+# ---------- nested regions ----------
+def save_nested(ranked: Union[List[Place], PlaceSet], path: str, K_values: Iterable[int]) -> str:
+    """
+    One file for all K of a region: `ranked` must already be in nesting order
+    (each K-query is ranked[:K]); offsets records the rows of every K target.
+    """
+    offsets = {int(K): min(int(K), len(ranked)) for K in sorted(set(K_values))}
+    return save_columnar(ranked, path, {"offsets": offsets})
+
+
+def nested_rows(path: str) -> int:
+    """How many ranked rows a nested file holds (largest servable K)."""
+    return int(read_meta(path)["K"])
+
+
+def _nested_offset(meta: dict, K: int) -> int:
+    # generated K targets keep their recorded row count (a region smaller than K
+    # was saved short, like the old per-K pickles); any other K is a plain prefix
+    return int(meta.get("offsets", {}).get(str(K), K))
+
+
+def serves_nested(path: str, K: int) -> bool:
+    """True if `path` is a nested region file that can serve the K-query."""
+    if not is_columnar(path):
+        return False
+    meta = read_meta(path)
+    return _nested_offset(meta, K) <= int(meta["K"])
+
+
+def load_nested(path: str, K: int) -> PlaceSet:
+    """The K-query of a nested region: only the first K rows of each column are mapped."""
+    meta = read_meta(path)
+    rows, N = _nested_offset(meta, K), int(meta["K"])
+    if rows > N:
+        raise ValueError(f"{path} holds {N} ranked places, cannot serve K={K}.")
+    ids, xs, ys, rF = (np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")[:rows] for name in _COLUMNS)
+    return PlaceSet(ids, xs, ys, rF)
+
+
+def load_places(path: str) -> Union[List[Place], PlaceSet]:
+    """
+    Load a dataset from a .pkl path or a .cols directory; for a .pkl the
+    columnar copy next to it is preferred while it matches the pickle.
+    """
+    if path.endswith(COLUMNAR_SUFFIX):
+        return load_columnar(path)
+    cols = columnar_path(path)
+    if serves_pickle(cols, path):
+        return load_columnar(cols)
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def convert_pickles(dirs: Iterable[str], overwrite: bool = False, remove_pickles: bool = False) -> List[str]:
+    """
+    One-shot converter: every *_K{K}.pkl holding a list of Place under `dirs`
+    gets a .cols directory next to it (rewritten when the pickle changed since
+    its conversion). Returns the directories written.
+    """
+    written = []
+    for d in dirs:
+        if not os.path.isdir(d):
+            continue
+        for fname in sorted(os.listdir(d)):
+            if not _DATASET_PKL.match(fname):
+                continue
+            pkl_path = os.path.join(d, fname)
+            cols = columnar_path(pkl_path)
+            if serves_pickle(cols, pkl_path) and not overwrite:
+                continue
+            with open(pkl_path, "rb") as f:
+                data = pickle.load(f)
+            if not isinstance(data, list) or not all(isinstance(p, Place) for p in data):
+                print(f"[columnar] skip {pkl_path}: not a list of Place")
+                continue
+            save_columnar(data, cols, _source_meta(pkl_path))
+            written.append(cols)
+            print(f"[columnar] {pkl_path} -> {cols} (K={len(data)})")
+            if remove_pickles:
+                os.remove(pkl_path)
+    return written
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Convert pickled List[Place] datasets to the columnar format.")
+    ap.add_argument("dirs", nargs="*", default=["datasets", "db_datasets", "yago_datasets"],
+                    help="Folders with dbpedia_*_K*.pkl / yago_*_K*.pkl / {shape}_K*.pkl files.")
+    ap.add_argument("--overwrite", action="store_true", help="Rewrite existing .cols directories.")
+    ap.add_argument("--remove-pickles", action="store_true", help="Delete each pickle after converting it.")
+    args = ap.parse_args()
+    convert_pickles(args.dirs, overwrite=args.overwrite, remove_pickles=args.remove_pickles)
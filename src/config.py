@@ -7,6 +7,21 @@ import math
 #default G = 256
 NUM_CELLS = [250]
 
+# Grid of the grid methods (grid_iadu.make_grid): "square" = SquareGrid(S, G);
+# "morton" = 2^l x 2^l cells from one Morton sort per dataset when G = 4^l (others stay square);
+#   always 2^l per axis, so these differ from the "square" cells when S's bounding box is not square;
+# "quadtree" = adaptive quadtree splitting its most populated leaf up to G non-empty leaves
+#   ("extent" with QUADTREE_SPLIT: largest population x side first), or leaves of at most
+#   QUADTREE_MAX_OCCUPANCY places when that is set;
+# "quantile" = Ax x Ay = G like "square", column/row edges at coordinate quantiles (balances the
+#   per-column and per-row counts, not the cells: on clustered data many cells stay empty)
+GRID_LAYOUT = "square"
+# Finest level (G = 4^l) of the per-dataset grid pyramid built up front for the "morton" layout;
+# coarser levels come from merging it, finer ones are added on demand
+GRID_PYRAMID_LEVELS = 5
+QUADTREE_MAX_OCCUPANCY = None
+QUADTREE_SPLIT = "population"
+
 
 COMBO = [
     # (100, 20),
@@ -21,6 +36,23 @@ COMBO = [
 
 GAMMAS = [1]  # example values for g
 
+# Processes for the exact psS pass of base_precompute(materialize=False); 0 = all cores
+PRECOMPUTE_WORKERS = 1
+
+# On-disk precompute cache (precompute_cache.py): None disables it, e.g. ".precompute_cache"
+PRECOMPUTE_CACHE_DIR = None
+PRECOMPUTE_CACHE_MAX_BYTES = 4 << 30  # LRU eviction above this size
+
+# True: load_dataset first resolves datasets through <datasets dir>/catalog.json when one
+# exists (built with `python src/dataset_catalog.py datasets`); False keeps the plain filename scan
+USE_DATASET_CATALOG = False
+
+# pid.txt ingestion (pid_ingest.py): processes (0 = all cores) and bytes per parsed chunk
+INGEST_WORKERS = 0
+INGEST_CHUNK_BYTES = 64 << 20
+# Parsed universes (pid.txt.snap/): None keeps them next to pid.txt
+UNIVERSE_SNAPSHOT_DIR = None
+
 
 DATASET_NAMES = [
     # ex.: "dbpedia_1994_FIFA_World_Cup_squads",
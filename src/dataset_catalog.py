@@ -0,0 +1,279 @@
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List, Optional, Union
+import numpy as np
+from columnar_store import (COLUMNAR_SUFFIX, NESTED_SUFFIX, columnar_path, is_columnar, load_nested, load_places,
+                            nested_rows, read_meta, serves_pickle)
+from models import Place, PlaceSet, coords_array, ids_array, rF_array
+from similarity import maxDistance, remember_diameter
+
+# Manifest of a datasets directory, written once as <dir>/catalog.json:
+#   entries[<normalized title>][<K>] = {"file", "kind", "K", "bbox", "maxD", "hash", "mtime"}
+#   nested[<normalized title>]       = {"file", "rows", "mtime"}
+# load_dataset resolves (title, K) with one dict lookup instead of listing and
+# normalizing every filename, and seeds the maxDistance cache with the stored diameter.
+# The catalog is built from the CLI (refresh_catalog); an entry whose file changed (mtime)
+# is re-indexed on its own, and any catalog error makes load_dataset fall back to the scan.
+CATALOG_NAME = "catalog.json"
+CATALOG_FORMAT = 1
+PREFIXES = ("yago_", "dbpedia_")          # lookup priority, as in load_dataset
+_PER_K = re.compile(r"^(?P<stem>.+)_K(?P<K>\d+)(?:\.pkl|" + re.escape(COLUMNAR_SUFFIX) + r")$")
+
+
+def norm_title(s: str) -> str:
+    """Filename-tolerant title: unify dashes/apostrophes, keep alnum/underscore, collapse repeats."""
+    s = s.replace("–", "-").replace("—", "-").replace("’", "'")
+    s = s.replace("´", "'").replace("`", "'")
+    # keep letters/numbers/underscore only
+    s = re.sub(r"[^0-9A-Za-z_'-]+", "_", s)
+    # treat apostrophes like underscore for filename matching
+    s = s.replace("'", "_").replace("-", "_")
+    s = re.sub(r"_+", "_", s).strip("_").lower()
+    return s
+
+
+def content_hash(S: Union[List[Place], PlaceSet]) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for col in (ids_array(S), coords_array(S), rF_array(S)):
+        h.update(np.ascontiguousarray(col).tobytes())
+    return h.hexdigest()
+
+
+def _mtime(path: str) -> float:
+    # .cols / .nested directories change through their meta.json
+    return os.path.getmtime(os.path.join(path, "meta.json") if os.path.isdir(path) else path)
+
+
+def _served_file(path: str, kind: str) -> str:
+    # what load_places actually opens for a .pkl path: its .cols copy while it matches the pickle
+    if kind == "file" and serves_pickle(columnar_path(path), path):
+        return columnar_path(path)
+    return path
+
+
+def _split_prefix(stem: str):
+    for rank, prefix in enumerate(PREFIXES):
+        if stem.startswith(prefix):
+            return rank, stem[len(prefix):]
+    return None, None
+
+
+def _stats(S: Union[List[Place], PlaceSet]) -> dict:
+    coords = coords_array(S)
+    bbox = [float(coords[:, 0].min()), float(coords[:, 1].min()),
+            float(coords[:, 0].max()), float(coords[:, 1].max())] if len(S) else None
+    return {"K": len(S), "bbox": bbox, "maxD": maxDistance(S), "hash": content_hash(S)}
+
+
+#######################################################################################################################
+class DatasetCatalog:
+    """
+    (title, K) -> dataset file of one datasets directory, with cached bbox, K,
+    exact maxD and content hash per dataset. Per-K files (pkl or .cols) win
+    over nested region files, yago_ over dbpedia_, like the filename scan.
+    """
+
+    def __init__(self, base_dir: str, entries: Dict[str, Dict[str, dict]], nested: Dict[str, dict]):
+        self.base_dir = base_dir
+        self.entries = entries
+        self.nested = nested
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.base_dir, CATALOG_NAME)
+
+    # ---------- build / persist ----------
+    @classmethod
+    def build(cls, base_dir: str, save: bool = True) -> "DatasetCatalog":
+        """Scan base_dir once, loading every dataset to record its statistics."""
+        found = {}  # (title, K) -> (priority, fname, kind)
+        nested = {}
+        for fname in sorted(os.listdir(base_dir)):
+            path = os.path.join(base_dir, fname)
+            if fname.endswith(NESTED_SUFFIX) and is_columnar(path):
+                rank, title = _split_prefix(fname[:-len(NESTED_SUFFIX)])
+                if rank is None:
+                    continue
+                title = norm_title(title)
+                if title not in nested or rank < nested[title]["rank"]:
+                    nested[title] = {"file": fname, "rows": nested_rows(path), "mtime": _mtime(path), "rank": rank}
+                    for K in read_meta(path).get("offsets", {}):
+                        prev = found.get((title, int(K)))
+                        if prev is None or (1, rank) < prev[0]:
+                            found[(title, int(K))] = ((1, rank), fname, "nested")
+                continue
+            m = _PER_K.match(fname)
+            if m is None:
+                continue
+            rank, title = _split_prefix(m.group("stem"))
+            if rank is None:
+                continue
+            key = (norm_title(title), int(m.group("K")))
+            stem = fname[:-len(COLUMNAR_SUFFIX)] if fname.endswith(COLUMNAR_SUFFIX) else fname[:-len(".pkl")]
+            prev = found.get(key)
+            if prev is None or (0, rank) < prev[0]:
+                # the .pkl path serves its .cols copy too (load_places prefers the latter)
+                found[key] = ((0, rank), stem + ".pkl", "file")
+
+        entries: Dict[str, Dict[str, dict]] = {}
+        for (title, K), (_, fname, kind) in sorted(found.items()):
+            path = os.path.join(base_dir, fname)
+            S = load_nested(path, K) if kind == "nested" else load_places(path)
+            entries.setdefault(title, {})[str(K)] = {"file": fname, "kind": kind, **_stats(S),
+                                                     "mtime": _mtime(_served_file(path, kind))}
+        for info in nested.values():
+            info.pop("rank")
+
+        catalog = cls(base_dir, entries, nested)
+        if save:
+            catalog.save()
+        return catalog
+
+    def save(self) -> None:
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"format": CATALOG_FORMAT, "entries": self.entries, "nested": self.nested}, f, indent=1)
+        os.replace(tmp, self.path)
+
+    def _save_quietly(self) -> None:
+        # a read-only datasets folder keeps the updated catalog in memory only
+        try:
+            self.save()
+        except OSError:
+            pass
+
+    @classmethod
+    def open(cls, base_dir: str, build: bool = True) -> Optional["DatasetCatalog"]:
+        """The catalog of base_dir (read from catalog.json, built if missing and build=True)."""
+        path = os.path.join(base_dir, CATALOG_NAME)
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+                if data.get("format") == CATALOG_FORMAT:
+                    return cls(base_dir, data["entries"], data["nested"])
+            except (OSError, ValueError, KeyError):
+                pass  # unreadable / corrupt: treated as missing
+        if not build or not os.path.isdir(base_dir):
+            return None
+        return cls.build(base_dir)
+
+    # ---------- lookups ----------
+    def _fresh(self, info: dict) -> bool:
+        path = _served_file(os.path.join(self.base_dir, info["file"]), info["kind"])
+        return os.path.exists(path) and _mtime(path) == info["mtime"]
+
+    def _lookup(self, title: str, K: int) -> Optional[dict]:
+        info = self.entries.get(title, {}).get(str(K))
+        if info is None:
+            region = self.nested.get(title)
+            if region is None or K > region["rows"]:
+                return None
+            info = {"file": region["file"], "kind": "nested", "mtime": region["mtime"]}
+        return info
+
+    def _reindex(self, title: str, K: int, info: dict) -> Optional[dict]:
+        """Re-read the one file behind a stale entry (dropping it if gone) and look (title, K) up again."""
+        fname = info["file"]
+        path = os.path.join(self.base_dir, fname)
+        per_k = self.entries.get(title, {})
+        if info["kind"] == "nested":
+            # the region and every K entry it serves
+            for key in [key for key, e in per_k.items() if e["file"] == fname]:
+                del per_k[key]
+            self.nested.pop(title, None)
+            if is_columnar(path):
+                self.nested[title] = {"file": fname, "rows": nested_rows(path), "mtime": _mtime(path)}
+                for key in read_meta(path).get("offsets", {}):
+                    if str(key) not in per_k:
+                        per_k[str(key)] = {"file": fname, "kind": "nested", **_stats(load_nested(path, int(key))),
+                                           "mtime": _mtime(path)}
+        else:
+            served = _served_file(path, "file")
+            if os.path.exists(served):
+                per_k[str(K)] = {"file": fname, "kind": "file", **_stats(load_places(path)), "mtime": _mtime(served)}
+            else:
+                per_k.pop(str(K), None)
+        if per_k:
+            self.entries[title] = per_k
+        else:
+            self.entries.pop(title, None)
+        self._save_quietly()
+        return self._lookup(title, K)
+
+    def find(self, shape: str, K: int) -> Optional[dict]:
+        """
+        Entry serving (shape, K): the recorded stats for cataloged K, or
+        {"file", "kind": "nested"} (no stats) for another K of a nested region.
+        A changed or missing file is re-indexed (only that entry) before answering.
+        """
+        title = norm_title(shape)
+        info = self._lookup(title, K)
+        if info is not None and not self._fresh(info):
+            info = self._reindex(title, K, info)
+        return info
+
+    def stats(self, shape: str, K: int) -> Optional[dict]:
+        """Cached {"K", "bbox", "maxD", "hash"} of a dataset, or None if not cataloged."""
+        info = self.find(shape, K)
+        return None if info is None or "maxD" not in info else {k: info[k] for k in ("K", "bbox", "maxD", "hash")}
+
+    def load(self, shape: str, K: int) -> Optional[Union[List[Place], PlaceSet]]:
+        """
+        The dataset (maxD already known to maxDistance), or None if the catalog
+        cannot serve it, including any error while re-indexing or reading it
+        (the caller then falls back to the filename scan).
+        """
+        try:
+            info = self.find(shape, K)
+            if info is None:
+                return None
+            path = os.path.join(self.base_dir, info["file"])
+            S = load_nested(path, K) if info["kind"] == "nested" else load_places(path)
+        except Exception as e:
+            print(f"[catalog] {self.path}: cannot serve {shape} K={K} ({e!r}), scanning instead")
+            return None
+        if "maxD" in info:
+            remember_diameter(coords_array(S), info["maxD"])
+        return S
+
+
+_open_catalogs: Dict[str, DatasetCatalog] = {}
+
+
+def catalog_for(base_dir: str) -> Optional[DatasetCatalog]:
+    """
+    Process-wide catalog of base_dir, or None if it has no readable catalog.json
+    (load_dataset never builds one; run refresh_catalog / the CLI for that).
+    """
+    base_dir = os.path.abspath(base_dir)
+    catalog = _open_catalogs.get(base_dir)
+    if catalog is None:
+        catalog = DatasetCatalog.open(base_dir, build=False)
+        if catalog is None:
+            return None
+        _open_catalogs[base_dir] = catalog
+    return catalog
+
+
+def refresh_catalog(base_dir: str) -> Optional[DatasetCatalog]:
+    """Rebuild the catalog of base_dir (after adding, removing or regenerating datasets)."""
+    base_dir = os.path.abspath(base_dir)
+    _open_catalogs.pop(base_dir, None)
+    if not os.path.isdir(base_dir):
+        return None
+    _open_catalogs[base_dir] = DatasetCatalog.build(base_dir)
+    return _open_catalogs[base_dir]
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Build the dataset catalog (catalog.json) of datasets folders.")
+    ap.add_argument("dirs", nargs="*", default=["datasets"], help="Folders with dbpedia_*/yago_* datasets.")
+    for d in ap.parse_args().dirs:
+        catalog = refresh_catalog(d)
+        if catalog is not None:
+            n = sum(len(v) for v in catalog.entries.values())
+            print(f"[catalog] {catalog.path}: {n} datasets, {len(catalog.nested)} nested regions")
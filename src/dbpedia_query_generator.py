@@ -5,6 +5,8 @@
 #   1) estimate a robust center,
 #   2) build ONE global order by L∞ distance to that center (tie-break by id),
 #   3) slice prefixes for each K in K_TARGETS -> PERFECT nesting across K.
+# The ranked region is written ONCE (dbpedia_<name>.nested/, see columnar_store.py)
+# with a K -> offset table; any K up to the region size can then be loaded.
 # -----------------------------------------------------------------------------
 
 from __future__ import annotations
@@ -16,7 +18,10 @@ from typing import List, Tuple, Dict, Iterable, Optional
 import numpy as np
 
 # Your project models: Place must have .id and .coords -> (x, y)
-from models import Place
+from models import Place, PlaceSet, coords_array, ids_array
+from columnar_store import NESTED_SUFFIX, save_nested
+from pid_ingest import ingest_pid, open_universe
+from spatial_index import GridIndex, chebyshev_rank
 
 
 # ======== CONFIG (adjust paths to your repo layout if needed) =================
@@ -26,6 +31,8 @@ REGIONS_CSV = None # e.g. "datasets/regions.csv" if you want a curated list
 
 # K values to generate for *each* region/query
 K_TARGETS: List[int] = [5000]
+# Ranked places kept per nested region file (None = the whole bbox region)
+NESTED_MAX_ROWS: Optional[int] = None
 
 
 # ======== LOADING UTILITIES ====================================================
@@ -38,22 +45,13 @@ def load_places_from_pkl(path: str) -> List[Place]:
     return data
 
 
-def load_places_from_txt(path: str) -> List[Place]:
+def load_places_from_txt(path: str) -> PlaceSet:
     """
     TXT format: each line -> id x y
+    Read in chunks with a vectorized parse (pid_ingest.py); rows without an id are skipped.
     """
-    out: List[Place] = []
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
-            parts = line.replace(",", " ").split()
-            if len(parts) < 3:
-                continue
-            pid, x, y = int(parts[0]), float(parts[1]), float(parts[2])
-            out.append(Place(pid, (x, y)))
-    return out
+    ids, x, y = ingest_pid(path, orient=False, require_id=True)
+    return PlaceSet(ids, x, y)
 
 
 def load_popular_regions(csv_path: str) -> List[str]:
@@ -106,7 +104,7 @@ def compute_fixed_center(places: List[Place], *, method: str = "median") -> np.n
     """
     if not places:
         raise ValueError("compute_fixed_center: empty places")
-    pts = np.asarray([p.coords for p in places], dtype=float)
+    pts = coords_array(places)
     if method == "median":
         cx = float(np.median(pts[:, 0]))
         cy = float(np.median(pts[:, 1]))
@@ -157,16 +155,7 @@ def build_nested_square_subsets(
     if not places:
         return {K: [] for K in Ks}
 
-    pts   = np.asarray([p.coords for p in places], dtype=float)
-    dists = np.max(np.abs(pts - center[None, :]), axis=1)
-
-    try:
-        ids = np.asarray([p.id for p in places])
-    except Exception as e:
-        raise AttributeError("Place must expose a stable 'id' for tie-breaking.") from e
-
-    order = np.lexsort((ids, dists))           # primary: dists; secondary: ids
-    ordered = [places[i] for i in order]       # ONE deterministic ranking
+    ordered = rank_square(places, center, limit=Ks[-1])   # ONE deterministic ranking
 
     out: Dict[int, List[Place]] = {}
     for K in Ks:
@@ -175,6 +164,25 @@ def build_nested_square_subsets(
     return out
 
 
+def rank_square(places: List[Place], center: np.ndarray, limit: Optional[int] = None) -> List[Place]:
+    """
+    Places in nesting order: (dist∞ to center asc, id asc); only the first
+    `limit` if given (partial selection, the rest is never sorted).
+    """
+    pts   = coords_array(places)
+
+    try:
+        ids = ids_array(places)
+    except Exception as e:
+        raise AttributeError("Place must expose a stable 'id' for tie-breaking.") from e
+
+    # primary: dists; secondary: ids
+    order = chebyshev_rank(pts[:, 0], pts[:, 1], ids, np.arange(len(ids)), center[0], center[1], limit)
+    if isinstance(places, PlaceSet):
+        return places.take(order)
+    return [places[i] for i in order]
+
+
 # ======== PERSISTENCE & HELPERS ===============================================
 def _norm_name(s: str) -> str:
     return "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in s)
@@ -193,7 +201,7 @@ def save_nested_subsets(
     if ensure_nested:
         prev_ids: Optional[set] = None
         for K in sorted(nested.keys()):
-            cur_ids = {p.id for p in nested[K]}
+            cur_ids = set(ids_array(nested[K]).tolist())
             if prev_ids is not None and not prev_ids.issubset(cur_ids):
                 raise AssertionError(f"[NESTING VIOLATION] at K={K} for region '{name}'")
             prev_ids = cur_ids
@@ -201,11 +209,27 @@ def save_nested_subsets(
     for K in sorted(nested.keys()):
         fname = f"dbpedia_{_norm_name(name)}_K{K}.pkl"
         path = os.path.join(out_dir, fname)
+        data = nested[K].to_places() if isinstance(nested[K], PlaceSet) else nested[K]
         with open(path, "wb") as f:
-            pickle.dump(nested[K], f)
+            pickle.dump(data, f)
         print(f"[OK] Saved square selection: {path} (#{len(nested[K])})")
 
 
+def save_nested_region(
+    ranked: List[Place],
+    *,
+    out_dir: str,
+    name: str,
+    K_values: Iterable[int],
+) -> str:
+    """One file for the whole ranked region + K -> offset table (replaces one pickle per K)."""
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"dbpedia_{_norm_name(name)}{NESTED_SUFFIX}")
+    save_nested(ranked, path, K_values)
+    print(f"[OK] Saved nested region: {path} (#{len(ranked)}, K targets {sorted(set(K_values))})")
+    return path
+
+
 # ======== MAIN PIPELINE ========================================================
 def generate_datasets(
     *,
@@ -213,23 +237,31 @@ def generate_datasets(
     out_dir: str = OUTPUT_DIR,
     k_targets: Iterable[int] = K_TARGETS,
     center_method: str = "median",
+    legacy_pickles: bool = False,
+    use_snapshot: bool = True,
 ) -> None:
     """
     For each query in the popular regions file, filter pid.txt by its
     bounding box and generate nested subsets for that query.
+    By default one nested file per region is written; legacy_pickles=True
+    writes the old dbpedia_<name>_K{K}.pkl files instead.
+    use_snapshot=True parses pid.txt once into pid.txt.snap/ (columns + grid
+    index, see pid_ingest.py) and later runs only map it.
     """
     # 1) Load the master list of all places ONCE
     master_places_path = os.path.join(data_root, "pid.txt")
     print(f"[INFO] Loading all places from master file: {master_places_path}")
     try:
-        all_places = load_places_from_txt(master_places_path)
+        if use_snapshot:
+            universe = open_universe(master_places_path, orient=False, require_id=True)
+            all_places, index = universe.places, universe.index
+        else:
+            all_places = load_places_from_txt(master_places_path)
+            index = GridIndex.build(all_places.xs, all_places.ys)
     except FileNotFoundError as e:
         print(f"[ERROR] Master pid.txt file not found. {e}")
         return
     print(f"[INFO] Loaded {len(all_places)} total places.")
-    
-    # Create a NumPy array for efficient filtering
-    all_coords = np.asarray([p.coords for p in all_places], dtype=float)
 
     # 2) Load the 10 queries and their bounding boxes
     queries_path = os.path.join(data_root, "dbpedia_popular.txt")
@@ -240,22 +272,19 @@ def generate_datasets(
         return
     print(f"[INFO] Found {len(queries)} unique queries to process.")
 
+    # Places within every bounding box, one batched grid-index query
+    # Note: as before, coords[0] is matched against lat and coords[1] against lon
+    boxes = [(q["bbox"]["min_lat"], q["bbox"]["min_lon"], q["bbox"]["max_lat"], q["bbox"]["max_lon"]) for q in queries]
+    rows_in_box = index.query_bboxes(all_places.xs, all_places.ys, boxes)
+
     # 3) Process each query
-    for query in queries:
+    for query, indices_in_box in zip(queries, rows_in_box):
         name = query["name"]
-        bbox = query["bbox"]
         print(f"\n--- Processing query: {name} ---")
 
-        # Filter places within the bounding box
-        # Note: Latitude is Y (coords[1]), Longitude is X (coords[0])
-        lat_mask = (all_coords[:, 0] >= bbox["min_lat"]) & (all_coords[:, 0] <= bbox["max_lat"])
-        lon_mask = (all_coords[:, 1] >= bbox["min_lon"]) & (all_coords[:, 1] <= bbox["max_lon"])
-        
-        indices_in_box = np.where(lat_mask & lon_mask)[0]
-        
-        region_places = [all_places[i] for i in indices_in_box]
+        region_places = all_places.take(indices_in_box)
 
-        if not region_places:
+        if len(region_places) == 0:
             print(f"[WARN] No places from pid.txt found within the bounding box for '{name}'. Skipping.")
             continue
         
@@ -263,8 +292,13 @@ def generate_datasets(
 
         # Run the standard analysis on this subset
         center = compute_fixed_center(region_places, method=center_method)
-        nested = build_nested_square_subsets(region_places, center, k_targets)
-        save_nested_subsets(nested, out_dir=out_dir, name=name, ensure_nested=True)
+        if legacy_pickles:
+            nested = build_nested_square_subsets(region_places, center, k_targets)
+            save_nested_subsets(nested, out_dir=out_dir, name=name, ensure_nested=True)
+        else:
+            limit = None if NESTED_MAX_ROWS is None else max(NESTED_MAX_ROWS, max(k_targets))
+            save_nested_region(rank_square(region_places, center, limit), out_dir=out_dir, name=name,
+                               K_values=k_targets)
 
     print("\n[SUCCESS] All queries processed successfully.")
 # ======== CLI =================================================================
@@ -278,6 +312,10 @@ def _parse_cli() -> Optional[dict]:
     ap.add_argument("--Ks", type=int, nargs="+", default=K_TARGETS, help="K values, e.g. 500 1000 2000.")
     ap.add_argument("--center-method", choices=["median", "mean"], default="median",
                     help="How to compute the fixed region center.")
+    ap.add_argument("--no-snapshot", action="store_true",
+                    help="Parse pid.txt every run instead of reusing pid.txt.snap/.")
+    ap.add_argument("--legacy-pickles", action="store_true",
+                    help="Write one dbpedia_<name>_K{K}.pkl per K instead of one nested file per region.")
     return vars(ap.parse_args())
 
 
@@ -289,6 +327,8 @@ def _main_cli():
         out_dir=args["out_dir"],
         k_targets=args["Ks"],
         center_method=args["center_method"],
+        legacy_pickles=args["legacy_pickles"],
+        use_snapshot=not args["no_snapshot"],
     )
 
 
@@ -0,0 +1,137 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import time
+from collections import defaultdict
+from typing import List, Dict
+import numpy as np
+import pandas as pd
+from models import Place, SquareGrid, QuantileGrid, QuadTreeGrid, coords_array
+from config import COMBO, NUM_CELLS, DATASET_NAMES
+from baseline_iadu import load_dataset
+from grid_iadu import virtual_grid_based_algorithm
+from similarity import exact_pss, maxDistance
+
+EXPERIMENT_NAME = "grid_layout_error"
+SHAPES = DATASET_NAMES
+
+# Two sweeps per G:
+#   "equal G":    every layout gets the same G (SquareGrid leaves many cells empty, so |CL| differs)
+#   "equal |CL|": every layout gets the non-empty cell count of SquareGrid(S, G), the budget
+#                 that sets the |CL| x |CL| cell matrix and the per-cell heaps
+LAYOUTS = {
+    "square": lambda S, G: SquareGrid(S, G),
+    "quantile": lambda S, G: QuantileGrid(S, G),
+    "quadtree": lambda S, G: QuadTreeGrid(S, max_leaves=G),
+    "quadtree_extent": lambda S, G: QuadTreeGrid(S, max_leaves=G, split="extent"),
+}
+
+
+def quantile_G_for_cells(S: List[Place], cells: int, G_max: int) -> int:
+    """
+    Largest G' <= G_max whose QuantileGrid has at most `cells` non-empty cells (bisection).
+    Only G' = Ax * round(Ax / aspect) are tried: an arbitrary G' (e.g. a prime) would
+    force thin Ax x Ay strips and measure the factorization, not the quantile edges.
+    """
+    coords = coords_array(S)
+    span = coords.max(axis=0) - coords.min(axis=0)
+    aspect = max(span[0], 1e-12) / max(span[1], 1e-12)
+    options = sorted({Ax * max(1, round(Ax / aspect)) for Ax in range(1, G_max + 1)} - {0})
+    options = [G for G in options if G <= G_max] or [1]
+    lo, hi = 0, len(options) - 1
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if len(QuantileGrid(S, options[mid]).get_full_cells()) <= cells:
+            lo = mid
+        else:
+            hi = mid - 1
+    return options[lo]
+
+
+def measure(S: List[Place], exact: np.ndarray, build) -> Dict:
+    # grid + cell similarities + pr: everything grid_iadu pays before selection
+    start = time.time()
+    grid = build()
+    CL = grid.get_full_cells()
+    psS, sS, _ = virtual_grid_based_algorithm(CL, S)
+    ms = 1000 * (time.time() - start)
+
+    approx = np.asarray(psS.values, dtype=np.float64)
+    error = float(np.mean(100 * np.abs(approx - exact) / exact))
+    sizes = np.fromiter((c.size() for c in CL), dtype=np.int64, count=len(CL))
+    return {
+        "|CL|": len(CL),
+        "max_cell": int(sizes.max()),
+        "cell_size_cv": float(sizes.std() / sizes.mean()),
+        "grid_error": error,
+        "grid_ms": ms,
+        "error*ms": error * ms,
+    }
+
+
+def run_experiment():
+    log = defaultdict(list)
+
+    for (K, k) in COMBO:
+        for shape in SHAPES:
+            print(f"Grid layouts on psS error and time | shape={shape}, K={K}")
+            S: List[Place] = load_dataset(shape, K)
+            exact = exact_pss(coords_array(S), maxDistance(S))
+
+            for G in NUM_CELLS:
+                cells = len(SquareGrid(S, G).get_full_cells())
+                sizes = {"equal G": {layout: G for layout in LAYOUTS},
+                         "equal |CL|": {"square": G, "quantile": quantile_G_for_cells(S, cells, G),
+                                        "quadtree": cells, "quadtree_extent": cells}}
+                for sweep, per_layout in sizes.items():
+                    for layout, size in per_layout.items():
+                        row = measure(S, exact, lambda: LAYOUTS[layout](S, size))
+                        log[(K, G, sweep, layout)].append({"shape": shape, "size": size, **row})
+                        print(f"  G={G} {sweep:10s} {layout:15s} size={size:5d} |CL|={row['|CL|']:5d} "
+                              f"error={row['grid_error']:.4f}% time={row['grid_ms']:.1f}ms")
+
+    save_outputs(average_rows(log))
+
+
+def average_rows(log: Dict) -> List[Dict]:
+    """
+    One row per (K, G, sweep, layout): fields averaged over shapes, plus error and
+    time relative to square in the same sweep.
+    """
+    rows = []
+    for (K, G, sweep, layout), entries in log.items():
+        row = {"K": K, "G": G, "sweep": sweep, "layout": layout}
+        for field in entries[0]:
+            if field != "shape":
+                row[field] = sum(e[field] for e in entries) / len(entries)
+        rows.append(row)
+
+    square = {(r["K"], r["G"], r["sweep"]): r for r in rows if r["layout"] == "square"}
+    for r in rows:
+        base = square.get((r["K"], r["G"], r["sweep"]))
+        if base is not None:
+            r["error_vs_square"] = r["grid_error"] / base["grid_error"] if base["grid_error"] else None
+            r["time_vs_square"] = r["grid_ms"] / base["grid_ms"] if base["grid_ms"] else None
+    return rows
+
+
+def save_outputs(rows: List[Dict]):
+    df = pd.DataFrame(rows)
+    order = {name: i for i, name in enumerate(LAYOUTS)}
+    df["_layout"] = df["layout"].map(order)
+    df.sort_values(by=["K", "G", "sweep", "_layout"], inplace=True)
+    df.drop(columns=["_layout"], inplace=True)
+    # |CL| next to every error
+    cols = ["K", "G", "sweep", "layout", "size", "|CL|", "grid_error", "error_vs_square", "grid_ms",
+            "time_vs_square", "error*ms", "max_cell", "cell_size_cv"]
+    df = df[[c for c in cols if c in df.columns]].round(5)
+
+    print(df.to_string(index=False))
+    xlsx_name = f"{EXPERIMENT_NAME}.xlsx"
+    df.to_excel(xlsx_name, index=False)
+    print(f"Results saved to {xlsx_name}")
+
+
+if __name__ == "__main__":
+    run_experiment()
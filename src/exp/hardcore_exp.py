@@ -11,6 +11,7 @@ from config import COMBO, NUM_CELLS, GAMMAS, DATASET_NAMES
 from baseline_iadu import iadu, load_dataset
 from hybrid_sampling import hybrid, hybrid_on_grid
 from grid_iadu import grid_iadu
+from session import DatasetSession
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_pdf import PdfPages
 from openpyxl import load_workbook
@@ -28,25 +29,28 @@ def run_experiment():
             print(f"Comparing ALL methods on HPFR and times | K={K}, k={k}, g={g}, W={W:.2f}")
 
             for shape in SHAPES:
+                # One exact precompute per dataset, shared by iadu, grid_iadu and biased sampling over G
+                session = DatasetSession(load_dataset(shape, K))
+                S: List[Place] = session.S
+
+                # Baseline does not depend on G: run (and time) it once per dataset, the same row values for every G
+                R_base, score_base, base_pss_sum, base_psr_sum, t_base_prep, t_base_select = session.iadu(k, W)
                 for G in NUM_CELLS:
                     print(f"  Shape={shape}, G={G}")
                     
-                    S: List[Place] = load_dataset(shape, K)
-                    
 
                     # --- use three K' values ---
                     K_samples = [int(K * 0.2)]
 
-                    # Baselines / Grid / Biased (do once per dataset)
-                    R_base, score_base, base_pss_sum, base_psr_sum, t_base_prep, t_base_select = iadu(S, k, W)
-                    R_grid, score_grid, grid_pss_sum, gridiadu_psr_sum, t_grid_prep, t_grid_select, lenCL = grid_iadu(S, k, W, G)
-                    R_biased, score_biased, biased_pss_sum, biased_psr_sum, t_biased_select = biased_sampling(S, k, W)
+                    # Grid / Biased
+                    R_grid, score_grid, grid_pss_sum, gridiadu_psr_sum, t_grid_prep, t_grid_select, lenCL = session.grid_iadu(k, W, G)
+                    R_biased, score_biased, biased_pss_sum, biased_psr_sum, t_biased_select = session.biased_sampling(k, W)
 
                     diff_grid = pct_diff(score_grid, score_base)
                     diff_grid_pss_error = pct_diff(grid_pss_sum, base_pss_sum)
                     
                     for K_sample in K_samples:
-                        # Hybrids depend on K'
+                        # Hybrids depend on K' (standalone: their prep time is the sample's own precompute)
                         R_hybrid, score_hybrid, hybrid_pss_sum, hybrid_psr_sum, t_hybrid_prep, t_hybrid_select, t_pruning_ex, W_hybrid = hybrid(S, k, K_sample, W)
                         R_hybrid_grid, score_hybrid_grid, hybridgrid_pss_sum, hybridgrid_psr_sum, t_hybrid_grid_prep, t_hybrid_grid_select, t_pruning_grid = hybrid_on_grid(S, k, G, K_sample, W)
 
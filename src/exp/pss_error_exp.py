@@ -6,11 +6,11 @@ from biased_sampling import biased_sampling
 from collections import defaultdict
 from typing import List, Dict, Tuple
 import pandas as pd
-from models import Place, SquareGrid
+from models import Place
 from config import COMBO, NUM_CELLS, GAMMAS, DATASET_NAMES
 from baseline_iadu import base_precompute, iadu, load_dataset
 from hybrid_sampling import hybrid, hybrid_on_grid
-from grid_iadu import base_iadu_on_grid, grid_iadu, virtual_grid_based_algorithm
+from grid_iadu import base_iadu_on_grid, grid_iadu, make_grid, virtual_grid_based_algorithm
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_pdf import PdfPages
 from openpyxl import load_workbook
@@ -42,7 +42,7 @@ def run_experiment():
                     exact_psS, exact_sS, prep_time = base_precompute(S)
                     base_pss_sum = sum(exact_psS[p.id] for p in S)
                     
-                    grid = SquareGrid(S, G)
+                    grid = make_grid(S, G)
                     CL = grid.get_full_cells()
                     psS, sS , prep_time = virtual_grid_based_algorithm(CL,S)
                     grid_pss_sum = sum(psS[p.id] for p in S)
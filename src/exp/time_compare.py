@@ -11,6 +11,7 @@ from config import COMBO, NUM_CELLS, GAMMAS, DATASET_NAMES
 from baseline_iadu import load_dataset, iadu, load_dataset
 from hybrid_sampling import hybrid, hybrid_on_grid
 from grid_iadu import grid_iadu
+from session import DatasetSession
 
 EXPERIMENT_NAME = "times"
 SHAPES = DATASET_NAMES
@@ -196,11 +197,16 @@ def run_multiple_experiments(num_runs: int = 1):
             for (K, k) in COMBO:
                 for g in GAMMAS:
                     W = K / (g * k)
+                    # One exact precompute per dataset, shared by iadu, grid_iadu and biased sampling over G
+                    try:
+                        session = DatasetSession(load_dataset(shape, K))
+                    except FileNotFoundError:
+                        continue
+                    S: List[Place] = session.S
+
+                    # Baseline does not depend on G: run (and time) it once per dataset, the same row values for every G
+                    R_base, score_base, sum_psS_base, sum_psR_base, t_base_prep, t_base_select = session.iadu(k, W)
                     for G in NUM_CELLS:
-                        try:
-                            S: List[Place] = load_dataset(shape, K)
-                        except FileNotFoundError:
-                            continue
 
                         K_samples = [int(K * 0.1), 
                                     #  int(K * 0.2), 
@@ -208,12 +214,12 @@ def run_multiple_experiments(num_runs: int = 1):
                                     #  int(K * 0.75)
                                     ]
 
-                        # === Baselines ===
-                        R_base, score_base, sum_psS_base, sum_psR_base, t_base_prep, t_base_select = iadu(S, k, W)
-                        R_grid, score_grid, sum_psS_grid, sum_psR_grid, t_grid_prep, t_grid_select, _cl = grid_iadu(S, k, W, G)
-                        R_biased, score_biased, sum_psS_biased, sum_psR_biased, t_biased_select = biased_sampling(S, k, W)
+                        # === Grid / Biased ===
+                        R_grid, score_grid, sum_psS_grid, sum_psR_grid, t_grid_prep, t_grid_select, _cl = session.grid_iadu(k, W, G)
+                        R_biased, score_biased, sum_psS_biased, sum_psR_biased, t_biased_select = session.biased_sampling(k, W)
 
                         for K_sample in K_samples:
+                            # standalone hybrids: their prep time is the sample's own precompute, not a cut of the shared one
                             R_hybrid, score_hybrid, psS_sum_hybrid, psR_sum_hybrid, t_hybrid_prep, t_hybrid_select, t_pruning_exact, W_hybrid = hybrid(S, k, K_sample, W)
                             R_hybrid_grid, score_hybrid_grid, psS_sum_hg, psR_sum_hg, t_hybrid_grid_prep, t_hybrid_grid_select, t_pruning_grid = hybrid_on_grid(S, k, G, K_sample, W)
 
@@ -12,6 +12,9 @@ from grid_iadu import old_grid_iadu, grid_iadu
 
 EXPERIMENT_NAME = "timesCLvsFullGrid"
 SHAPES = DATASET_NAMES
+# FL column uses the exact dense |FL| x |FL| pr; FL_FFT = True adds an FL run with the
+# approximate lattice-convolution pr (pr_mode="fft", ~1e-4 relative error, G up to 10^6)
+FL_FFT = False
 
 
 def save_outputs(log: List[Dict], DECIMALS_W: int = 2, DECIMALS_TIME: int = 7):
@@ -28,6 +31,10 @@ def save_outputs(log: List[Dict], DECIMALS_W: int = 2, DECIMALS_TIME: int = 7):
     prep_cols   = ["grid_pss_time", "old_grid_pss_time"]
     select_cols = ["grid_iadu_time", "old_grid_iadu_time"]
     total_cols   = ["grid_total_time", "old_grid_total_time"]
+    if FL_FFT:
+        prep_cols.append("old_grid_fft_pss_time")
+        select_cols.append("old_grid_fft_iadu_time")
+        total_cols.append("old_grid_fft_total_time")
 
     all_cols = setup_cols + prep_cols + select_cols + total_cols
     for col in all_cols:
@@ -192,7 +199,7 @@ def run_multiple_experiments(num_runs: int = 1):
                         R_grid, score_grid, sum_psS_grid, sum_psR_grid, t_grid_prep, t_grid_select, lenCL = grid_iadu(S, k, W, G)
                         R_old_grid, score_old_grid, sum_psS_old_grid, sum_psR_old_grid, t_old_grid_prep, t_old_grid_select, lenFL = old_grid_iadu(S, k, W, G)
                         
-                        log[(K, k, g, G)].append({
+                        row = {
                             "K": K, "k": k, "g": g, "W": W,
                             "K/(k*g)": W,           # numeric (equals W), not a string
                             "G": G, "|CL|": lenCL, "|FL|": lenFL,
@@ -205,7 +212,13 @@ def run_multiple_experiments(num_runs: int = 1):
 
                             "grid_total_time": t_grid_prep + t_grid_select,
                             "old_grid_total_time": t_old_grid_prep + t_old_grid_select,
-                        })
+                        }
+                        if FL_FFT:
+                            _, _, _, _, t_fft_prep, t_fft_select, _ = old_grid_iadu(S, k, W, G, pr_mode="fft")
+                            row["old_grid_fft_pss_time"] = t_fft_prep
+                            row["old_grid_fft_iadu_time"] = t_fft_select
+                            row["old_grid_fft_total_time"] = t_fft_prep + t_fft_select
+                        log[(K, k, g, G)].append(row)
 
 
         # First averaging: across shapes
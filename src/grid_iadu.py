@@ -7,12 +7,151 @@ import numpy as np
 from typing import List, Tuple, Dict
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_pdf import PdfPages
-from HPF_eq import HPF, HPFR, HPFR_div
+from HPF_eq import HPF, HPFR, HPFR_div, HPFRTracker
 from baseline_iadu import base_precompute, baseline_iadu_algorithm
-from models import Place, Cell, SquareGrid, FullGrid
+from collections import OrderedDict
+from models import MORTON_BITS, Place, Cell, SquareGrid, FullGrid, MortonGrid, MortonOrder, QuadTreeGrid, QuantileGrid, morton_level
+from similarity import GridSimilarity, IndexedScores, cell_pr, cell_similarity, cell_similarity_lookup, grid_similarity, lattice_pr, maxDistance
 import dataset_store as ds
+from dataset_catalog import content_hash
 import config as cfg
-# Global Grid Config
+# Global Grid Config (cfg.GRID_LAYOUT / GRID_PYRAMID_LEVELS / QUADTREE_MAX_OCCUPANCY are read at call time)
+PYRAMID_CACHE_SIZE = 8
+
+
+def grid_layout(G: int) -> str:
+    """Layout make_grid uses for G: "morton" only if configured and G = 4^l; "quadtree"/"quantile" if configured."""
+    layout = getattr(cfg, "GRID_LAYOUT", "square")
+    if layout in ("quadtree", "quantile"):
+        return layout
+    return "morton" if layout == "morton" and morton_level(G) is not None else "square"
+
+
+def quadtree_grid(S: List[Place], G: int, morton: MortonOrder = None) -> QuadTreeGrid:
+    """
+    Quadtree of the "quadtree" layout: a budget of G non-empty leaves (|CL| ~ G, the
+    same cell count as the other layouts) split in cfg.QUADTREE_SPLIT order, or
+    leaves of at most cfg.QUADTREE_MAX_OCCUPANCY places when that is set.
+    """
+    cap = getattr(cfg, "QUADTREE_MAX_OCCUPANCY", None)
+    if cap:
+        return QuadTreeGrid(S, max_occupancy=int(cap), morton=morton)
+    return QuadTreeGrid(S, max_leaves=G, morton=morton, split=getattr(cfg, "QUADTREE_SPLIT", "population"))
+
+
+class GridPyramid:
+    """
+    Morton grids of one dataset S at every level l (G = 4^l) from one sort and
+    one scan: the finest level's cells are the runs of equal code prefixes and
+    each coarser level merges the runs of its four children (counts and
+    coordinate sums add up, centers = sums / counts).
+    pr has no exact bottom-up form (it needs the cell similarities of the level
+    itself), so the precompute of a level is computed on first use and kept:
+    a G sweep, or repeated runs at one G, pay for each level once.
+    """
+
+    def __init__(self, S: List[Place], max_level: int = None):
+        if max_level is None:
+            max_level = getattr(cfg, "GRID_PYRAMID_LEVELS", 5)
+        self.S = S
+        self.morton = MortonOrder(S)
+        self.max_level = -1
+        self._cells: Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._grids: Dict[int, MortonGrid] = {}
+        self._precomputed: Dict[Tuple[int, str], Tuple[List[Cell], IndexedScores, GridSimilarity, float]] = {}
+        self._build(max_level)
+
+    def _build(self, max_level: int) -> None:
+        m = self.morton
+        max_level = min(max_level, MORTON_BITS)
+        prefix = m.codes >> np.uint32(2 * (MORTON_BITS - max_level))
+        starts = np.flatnonzero(np.concatenate(([True], prefix[1:] != prefix[:-1])))
+        cell_start = np.append(starts, len(prefix)).astype(np.int64)
+        codes = prefix[starts].astype(np.int64)
+        sums = np.column_stack([np.add.reduceat(m.xs_sorted, starts), np.add.reduceat(m.ys_sorted, starts)])
+        for level in range(max_level, -1, -1):
+            if level < max_level:
+                parent = codes >> 2
+                first = np.flatnonzero(np.concatenate(([True], parent[1:] != parent[:-1])))
+                codes, sums = parent[first], np.add.reduceat(sums, first, axis=0)
+                cell_start = np.append(cell_start[first], cell_start[-1])
+            # levels built before keep their cells (grids/precomputes may already use them)
+            self._cells.setdefault(level, (cell_start, codes, sums / np.diff(cell_start)[:, None]))
+        self.max_level = max_level
+
+    @staticmethod
+    def level(G: int) -> int:
+        level = morton_level(G)
+        if level is None:
+            raise ValueError(f"Grid pyramid levels need G = 4^l with l <= {MORTON_BITS} (got G={G}).")
+        return level
+
+    def grid(self, G: int) -> MortonGrid:
+        """The level of G as a MortonGrid (levels finer than max_level are added on demand)."""
+        level = self.level(G)
+        if level > self.max_level:
+            self._build(level)
+        if level not in self._grids:
+            self._grids[level] = MortonGrid(self.morton, level, self._cells[level])
+        return self._grids[level]
+
+    def precompute(self, G: int, dtype=np.float64) -> Tuple[List[Cell], IndexedScores, GridSimilarity, float]:
+        """
+        (CL, psS, sS, prep_time) of the level of G: virtual_grid_based_algorithm, once
+        per level. A level computed before reports prep_time = 0.0 (nothing spent now).
+        """
+        key = (self.level(G), np.dtype(dtype).name)
+        if key not in self._precomputed:
+            CL = self.grid(G).get_full_cells()
+            self._precomputed[key] = (CL, *virtual_grid_based_algorithm(CL, self.S, dtype))
+            return self._precomputed[key]
+        CL, psS, sS, _ = self._precomputed[key]
+        return CL, psS, sS, 0.0
+
+
+_pyramids: "OrderedDict[str, GridPyramid]" = OrderedDict()
+
+
+def pyramid_for(S: List[Place]) -> GridPyramid:
+    """Process-wide GridPyramid of S (keyed by content, last PYRAMID_CACHE_SIZE datasets kept)."""
+    key = content_hash(S)
+    if key in _pyramids:
+        _pyramids.move_to_end(key)
+    else:
+        _pyramids[key] = GridPyramid(S)
+        if len(_pyramids) > PYRAMID_CACHE_SIZE:
+            _pyramids.popitem(last=False)
+    return _pyramids[key]
+
+
+def make_grid(S: List[Place], G: int, cache: bool = True) -> SquareGrid:
+    """
+    The grid the grid methods run on: SquareGrid(S, G), or with
+    cfg.GRID_LAYOUT = "morton" and G = 4^l the level of S's GridPyramid
+    (cached by content, so a G sweep costs one sort plus one scan), or with
+    "quadtree" the quadtree_grid(S, G) (about G leaves, cut from the same
+    cached Morton sort), or with "quantile" a
+    QuantileGrid(S, G).
+    """
+    layout = grid_layout(G)
+    if layout == "square":
+        return SquareGrid(S, G)
+    if layout == "quantile":
+        return QuantileGrid(S, G)
+    if layout == "quadtree":
+        return quadtree_grid(S, G, pyramid_for(S).morton if cache else None)
+    if not cache:
+        return MortonOrder(S).grid(G)
+    return pyramid_for(S).grid(G)
+
+
+def grid_precompute(S: List[Place], G: int, cache: bool = True) -> Tuple[List[Cell], IndexedScores, GridSimilarity, float]:
+    """(CL, psS, sS, prep_time) of make_grid(S, G); Morton levels come from the pyramid's per-level cache."""
+    if grid_layout(G) == "morton" and cache:
+        return pyramid_for(S).precompute(G)
+    CL = make_grid(S, G, cache).get_full_cells()
+    return (CL, *virtual_grid_based_algorithm(CL, S))
+
 
 #################################################################################################################################################################################
 import heapq
@@ -48,7 +187,7 @@ class MinHeap:
 
 ##########################################################################################################################################
 ###########################################################################################################################################################
-def grid_based_iadu_algorithm(S: list[Place], CL: list[Cell], W: float, psS ,sS: dict, k: int) -> Tuple[list[Place], float]:
+def grid_based_iadu_algorithm(S: list[Place], CL: list[Cell], W: float, psS ,sS: dict, k: int, tracker: HPFRTracker = None) -> Tuple[list[Place], float]:
 
     K = len(S)
     # Create heap per cell with top-k places by initial cHPF = rF + pSS
@@ -90,7 +229,12 @@ def grid_based_iadu_algorithm(S: list[Place], CL: list[Cell], W: float, psS ,sS:
 
 
 
-        # Add curMP to R
+        # Add curMP to R (and its psS / similarity to R to the HPFR running sums)
+        if tracker is not None:
+            if tracker.exact:
+                tracker.add(curMP)  # scored against S at the end; approximate sums unused
+            else:
+                tracker.add(curMP, psS[curMP.id], sum(sS[(curMP.id, p.id)] for p in R))
         R.append(curMP)
 
         # Update each heap's head with contribution from curMP
@@ -100,7 +244,7 @@ def grid_based_iadu_algorithm(S: list[Place], CL: list[Cell], W: float, psS ,sS:
     selection_time = time.time() - heap_time_start
     return R, selection_time
 
-def old_grid_iadu_algorithm(S: list[Place], CL: list[Cell], W: float, psS ,sS: dict, k: int) -> Tuple[list[Place], float]:
+def old_grid_iadu_algorithm(S: list[Place], CL: list[Cell], W: float, psS ,sS: dict, k: int, tracker: HPFRTracker = None) -> Tuple[list[Place], float]:
 
     K = len(S)
     # Create heap per cell with top-k places by initial cHPF = rF + pSS
@@ -146,7 +290,12 @@ def old_grid_iadu_algorithm(S: list[Place], CL: list[Cell], W: float, psS ,sS: d
                 for p in R:
                     heads[curID].cHPF += (K - k) * (heads[curID].rF - p.rF) / (k - 1) + (psS[heads[curID].id] + psS[p.id]) / (k - 1) - 2 * W * sS[(heads[curID].id, p.id)]
 
-        # Add curMP to R
+        # Add curMP to R (and its psS / similarity to R to the HPFR running sums)
+        if tracker is not None:
+            if tracker.exact:
+                tracker.add(curMP)  # scored against S at the end; approximate sums unused
+            else:
+                tracker.add(curMP, psS[curMP.id], sum(sS[(curMP.id, p.id)] for p in R))
         R.append(curMP)
 
         # Update each heap's head with contribution from curMP
@@ -160,123 +309,70 @@ def old_grid_iadu_algorithm(S: list[Place], CL: list[Cell], W: float, psS ,sS: d
 
 ###############################################################################################################################################################################
 ###############################################################################################################################################################################
-def virtual_grid_based_algorithm(CL: List[Cell], S: List[Place]) -> Tuple[ Dict[int, float], float]:
+def virtual_grid_based_algorithm(CL: List[Cell], S: List[Place], dtype=np.float64) -> Tuple[IndexedScores, GridSimilarity, float]:
 
-    cell_sS = {}
-    pr = {cell.id: 0.0 for cell in CL}
     prep_time = 0.0
-    centers = {cell.id: cell.compute_center() for cell in CL}
-    cl_centers = list(centers.keys())
+    centers = np.array([cell.compute_center() for cell in CL], dtype=np.float64).reshape(len(CL), 2)
+    counts = np.fromiter((cell.size() for cell in CL), dtype=np.float64, count=len(CL))
     
-    # Compute max distance for normalization
+    prep_time_start = time.time()
+    # Compute max distance for normalization (hull + calipers, cached per dataset)
     maxD = maxDistance(S)
     
-    
-    for ci in cl_centers:
-        for cj in cl_centers:
-            if ci == cj:
-                cell_sS[(ci, cj)] = 1.0  # ensure diagonal exists
-            else:
-                d = np.linalg.norm(centers[ci] - centers[cj])
-                cell_sS[(ci, cj)] = 1.0 - (d / maxD)
-
-
-    prep_time_start = time.time()
-    for i in range(len(CL)):
-        ci = CL[i]
-        for j in range(i , len(CL)):
-            cj = CL[j]
-            sim = 1
-            if ci != cj:
-                sim = cell_sS[(ci.id,cj.id)]
-                
-            # Update pr(ci) and pr(cj)
-            pr[ci.id] += cj.size() * sim
-            if ci != cj:
-                pr[cj.id] += ci.size() * sim
-        pr[ci.id] -= 1.0
-        
+    # Cell similarity from all center pairs at once, pr(c) = sum_c' |c'| sim(c, c') - 1 as one mat-vec
+    cell_matrix = cell_similarity(centers, maxD, dtype)
+    pr = cell_pr(cell_matrix, counts)
         
     prep_time = time.time() - prep_time_start
     
-    place_to_cell = map_place_to_cell(CL)
-    
-    psS = {p.id: 0.0 for p in S}
-    sS = {}
-    for pi in S:
-        psS[pi.id] = pr[place_to_cell[pi.id]]
-        for pj in S:
-            if (place_to_cell[pi.id] != place_to_cell[pj.id]):
-                sS[(pi.id, pj.id)] = cell_sS[(place_to_cell[pi.id], place_to_cell[pj.id])]
-            else:
-                if (pi.id != pj.id):
-                    sS[(pi.id, pj.id)] = 1.0
+    # Place-level psS/sS stay implicit: place -> cell index + |CL| x |CL| cell matrix (no K^2 dict)
+    psS, sS = grid_similarity(CL, S, cell_matrix, pr)
                     
     return psS, sS, prep_time
 
-def old_grid_precompute(CL: List[Cell], S: List[Place]) -> Tuple[ Dict[int, float], float]:
+def old_grid_precompute(CL: List[Cell], S: List[Place], dtype=np.float64, grid: FullGrid = None, pr_mode: str = "matrix") -> Tuple[IndexedScores, GridSimilarity, float]:
+    """
+    pr_mode="matrix": dense cell similarity + mat-vec (any CL).
+    pr_mode="fft": CL must be grid.get_all_cells() of a FullGrid; pr comes from an FFT
+    convolution of the count lattice (lattice_pr) and the cell similarity is only
+    materialized when small enough (cell_similarity_lookup), so G can reach 10^6.
+    The FFT pr is approximate (up to ~5e-3 * (N - 1) off the matrix pr on clustered
+    data at G = 16-64, see lattice_pr) and can change R; use "matrix" where CL fits.
+    """
+    if pr_mode not in ("matrix", "fft"):
+        raise ValueError(f"Unknown pr_mode '{pr_mode}' (expected 'matrix' or 'fft').")
+    if pr_mode == "fft" and (grid is None or len(CL) != grid.total_cells()):
+        raise ValueError("pr_mode='fft' needs the FullGrid and its full cell list (FL).")
 
-    cell_sS = {}
-    pr = {cell.id: 0.0 for cell in CL}
     prep_time = 0.0
-    centers = {cell.id: cell.compute_center() for cell in CL}
-    cl_centers = list(centers.keys())
+    centers = np.array([cell.compute_center() for cell in CL], dtype=np.float64).reshape(len(CL), 2)
+    counts = np.fromiter((cell.size() for cell in CL), dtype=np.float64, count=len(CL))
     
-    # Compute max distance for normalization
+    prep_time_start = time.time()
+    # Compute max distance for normalization (hull + calipers, cached per dataset)
     maxD = maxDistance(S)
     
-    
-    for ci in cl_centers:
-        for cj in cl_centers:
-            if ci == cj:
-                cell_sS[(ci, cj)] = 1.0  # ensure diagonal exists
-            else:
-                d = np.linalg.norm(centers[ci] - centers[cj])
-                cell_sS[(ci, cj)] = 1.0 - (d / maxD)
-
-
-    prep_time_start = time.time()
-    for i in range(len(CL)):
-        ci = CL[i]
-        for j in range(i , len(CL)):
-            cj = CL[j]
-            sim = 1
-            if ci != cj:
-                sim = cell_sS[(ci.id,cj.id)]
-                
-            # Update pr(ci) and pr(cj)
-            pr[ci.id] += cj.size() * sim
-            if ci != cj:
-                pr[cj.id] += ci.size() * sim
-        pr[ci.id] -= 1.0
-        
+    if pr_mode == "fft":
+        # FL is gx-major, so the cells reshape to the (Ax, Ay) lattice
+        Ax, Ay = grid.dims()
+        lat_x = grid.x_min + (np.arange(Ax) + 0.5) * grid.cell_w
+        lat_y = grid.y_min + (np.arange(Ay) + 0.5) * grid.cell_h
+        off_x = centers[:, 0].reshape(Ax, Ay) - lat_x[:, None]
+        off_y = centers[:, 1].reshape(Ax, Ay) - lat_y[None, :]
+        pr = lattice_pr(counts.reshape(Ax, Ay), off_x, off_y, grid.cell_w, grid.cell_h, maxD).ravel()
+        cell_matrix = cell_similarity_lookup(centers, maxD, dtype)
+    else:
+        # Cell similarity from all center pairs at once, pr(c) = sum_c' |c'| sim(c, c') - 1 as one mat-vec
+        cell_matrix = cell_similarity(centers, maxD, dtype)
+        pr = cell_pr(cell_matrix, counts)
         
     prep_time = time.time() - prep_time_start
     
-    place_to_cell = map_place_to_cell(CL)
-    
-    psS = {p.id: 0.0 for p in S}
-    sS = {}
-    for pi in S:
-        psS[pi.id] = pr[place_to_cell[pi.id]]
-        for pj in S:
-            if (place_to_cell[pi.id] != place_to_cell[pj.id]):
-                sS[(pi.id, pj.id)] = cell_sS[(place_to_cell[pi.id], place_to_cell[pj.id])]
-            else:
-                if (pi.id != pj.id):
-                    sS[(pi.id, pj.id)] = 1.0
+    # Place-level psS/sS stay implicit: place -> cell index + |CL| x |CL| cell matrix (no K^2 dict)
+    psS, sS = grid_similarity(CL, S, cell_matrix, pr)
                     
     return psS, sS, prep_time
 
-def maxDistance(S: List[Place]) -> float:
-    maxD = 0
-    coords = np.array([p.coords for p in S])
-    for i in range(len(S)):
-        for j in range(i + 1, len(S)):
-            d = np.linalg.norm(coords[i] - coords[j])
-            maxD = max(maxD, d)
-    return maxD
-
 import pickle
 
 def load_dataset(shape_name: str, K: int, k: int, G: int):
@@ -343,16 +439,16 @@ def base_iadu_on_grid(S: List[Place], k: int, W, G) -> Tuple[List[Place], Dict[i
     K = len(S)
     
     # Preparation step
-    grid = SquareGrid(S, G)
+    grid = make_grid(S, G)
     CL = list(grid.get_grid().values())
     psS, sS, prep_time = virtual_grid_based_algorithm(CL,S)
-    exact_psS, exact_sS, exact_prep_time = base_precompute(S)
         
     # Run baseline IAdU algorithm
-    R, selection_time = baseline_iadu_algorithm(S, K, k, W, psS, sS)
+    tracker = HPFRTracker(S, W, exact=True)
+    R, selection_time = baseline_iadu_algorithm(S, K, k, W, psS, sS, tracker=tracker)
     
     # Compute final scores
-    score, sum_psS, sum_psR = HPFR(R, exact_psS, exact_sS, W, len(S))
+    score, sum_psS, sum_psR = tracker.hpfr()
     
     return R, score, sum_psS, sum_psR, prep_time, selection_time
 
@@ -360,52 +456,48 @@ def base_iadu_on_grid(S: List[Place], k: int, W, G) -> Tuple[List[Place], Dict[i
 def grid_iadu(S: List[Place], k: int, W, G: int) -> Tuple[List[Place], Dict[int, float], Dict[int, float], float, float, float]:
 
     # Preparation step
-    grid = SquareGrid(S, G)
-    CL = grid.get_full_cells()
-    psS, sS , prep_time = virtual_grid_based_algorithm(CL,S)
-    optimal_psS, optimal_sS, optimal_prep_time = base_precompute(S)
+    CL, psS, sS, prep_time = grid_precompute(S, G)
 
         
     # Run grid IAdU algorithm
-    R, selection_time = grid_based_iadu_algorithm(S, CL, W, psS, sS, k)
+    tracker = HPFRTracker(S, W, exact=True)
+    R, selection_time = grid_based_iadu_algorithm(S, CL, W, psS, sS, k, tracker=tracker)
     
     # Compute final scores
-    score, sum_psS, sum_psR = HPFR(R, optimal_psS, optimal_sS, W, len(S))
+    score, sum_psS, sum_psR = tracker.hpfr()
     
     return R, score, sum_psS, sum_psR, prep_time, selection_time, len(CL)
 
 def grid_iadu_div(S: List[Place], k: int, W, G: int) -> Tuple[List[Place], Dict[int, float], Dict[int, float], float, float, float]:
 
     # Preparation step
-    grid = SquareGrid(S, G)
-    CL = grid.get_full_cells()
-    psS, sS , prep_time = virtual_grid_based_algorithm(CL,S)
-    optimal_psS, optimal_sS, optimal_prep_time = base_precompute(S)
+    CL, psS, sS, prep_time = grid_precompute(S, G)
 
         
     # Run grid IAdU algorithm
-    R, selection_time = grid_based_iadu_algorithm(S, CL, W, psS, sS, k)
+    tracker = HPFRTracker(S, W, exact=True)
+    R, selection_time = grid_based_iadu_algorithm(S, CL, W, psS, sS, k, tracker=tracker)
     
     # Compute final scores
-    score_rf, score_ps, sum_psS, sum_psR = HPFR_div(R, optimal_psS, optimal_sS, W, len(S))
+    score_rf, score_ps, sum_psS, sum_psR = tracker.hpfr_div()
     
     return R, score_rf + score_ps, score_rf, score_ps, sum_psS, sum_psR, prep_time, selection_time, len(CL)
 
-def old_grid_iadu(S: List[Place], k: int, W, G: int) -> Tuple[List[Place], Dict[int, float], Dict[int, float], float, float, float]:
+def old_grid_iadu(S: List[Place], k: int, W, G: int, pr_mode: str = "matrix") -> Tuple[List[Place], Dict[int, float], Dict[int, float], float, float, float]:
 
     # Preparation step
     grid = FullGrid(S, G)
     FL = grid.get_all_cells()
     grid.ensure_empty_cell_centers()
-    psS, sS , prep_time = old_grid_precompute(FL,S)
-    optimal_psS, optimal_sS, optimal_prep_time = base_precompute(S)
+    psS, sS , prep_time = old_grid_precompute(FL, S, grid=grid, pr_mode=pr_mode)
 
         
     # Run grid IAdU algorithm
-    R, selection_time = old_grid_iadu_algorithm(S, FL, W, psS, sS, k)
+    tracker = HPFRTracker(S, W, exact=True)
+    R, selection_time = old_grid_iadu_algorithm(S, FL, W, psS, sS, k, tracker=tracker)
     
     # Compute final scores
-    score, sum_psS, sum_psR = HPFR(R, optimal_psS, optimal_sS, W, len(S))
+    score, sum_psS, sum_psR = tracker.hpfr()
     
     return R, score, sum_psS, sum_psR, prep_time, selection_time, len(FL)
 
@@ -1,9 +1,9 @@
 from typing import Dict, Tuple
 from baseline_iadu import base_precompute, baseline_iadu_algorithm
 from biased_sampling import select_random
-from grid_iadu import grid_based_iadu_algorithm, virtual_grid_based_algorithm
-from models import List, Place, SquareGrid
-from HPF_eq import HPFR, HPFR_div
+from grid_iadu import grid_based_iadu_algorithm, make_grid, virtual_grid_based_algorithm
+from models import List, Place
+from HPF_eq import HPFRTracker
 
 ################################################################################################################3
 #####################################################################################################################
@@ -20,14 +20,14 @@ def hybrid(S: List[Place], k: int, K_sample, W):
     
     # Preparation for hybrid
     bs_psS, bs_sS, prep_time = base_precompute(biased_sampled_S)
-    exact_psS, exact_sS, exact_prep_time = base_precompute(S)
     
     
     # Run baseline IAdU on sampled set
-    R_hybrid, selection_time = baseline_iadu_algorithm(biased_sampled_S, K_sample, k, W_hybrid, bs_psS, bs_sS)
+    tracker = HPFRTracker(S, W, exact=True)
+    R_hybrid, selection_time = baseline_iadu_algorithm(biased_sampled_S, K_sample, k, W_hybrid, bs_psS, bs_sS, tracker=tracker)
     
     # Compute final scores
-    score, psS_sum, psR_sum = HPFR(R_hybrid, exact_psS, exact_sS, W, K)
+    score, psS_sum, psR_sum = tracker.hpfr()
     
     return R_hybrid, score, psS_sum, psR_sum, prep_time, selection_time, pruning_time, W_hybrid
 
@@ -41,16 +41,16 @@ def hybrid_on_grid(S: List[Place], k: int, G, K_sample, W):
     W_hybrid = K_sample / (k*g)
     
     # Preparation for hybrid
-    grid = SquareGrid(biased_sampled_S, G)
+    grid = make_grid(biased_sampled_S, G, cache=False)
     CL = grid.get_full_cells()
     bs_psS, bs_sS, prep_time = virtual_grid_based_algorithm(CL, biased_sampled_S)
-    exact_psS, exact_sS, exact_prep_time = base_precompute(S)
         
     # Run grid IAdU algorithm
-    R_hybrid, selection_time = grid_based_iadu_algorithm(biased_sampled_S, CL, W_hybrid, bs_psS,  bs_sS, k)
+    tracker = HPFRTracker(S, W, exact=True)
+    R_hybrid, selection_time = grid_based_iadu_algorithm(biased_sampled_S, CL, W_hybrid, bs_psS,  bs_sS, k, tracker=tracker)
     
     # Compute final scores
-    score, sum_psS, sum_psR = HPFR(R_hybrid, exact_psS, exact_sS, W, K)
+    score, sum_psS, sum_psR = tracker.hpfr()
     
     return R_hybrid, score, sum_psS, sum_psR, prep_time, selection_time, pruning_time
 
@@ -67,14 +67,14 @@ def hybrid_div(S: List[Place], k: int, K_sample, W):
     
     # Preparation for hybrid
     bs_psS, bs_sS, prep_time = base_precompute(biased_sampled_S)
-    exact_psS, exact_sS, exact_prep_time = base_precompute(S)
     
     
     # Run baseline IAdU on sampled set
-    R_hybrid, selection_time = baseline_iadu_algorithm(biased_sampled_S, K_sample, k, W_hybrid, bs_psS, bs_sS)
+    tracker = HPFRTracker(S, W, exact=True)
+    R_hybrid, selection_time = baseline_iadu_algorithm(biased_sampled_S, K_sample, k, W_hybrid, bs_psS, bs_sS, tracker=tracker)
     
     # Compute final scores
-    score_rf, score_ps, psS_sum, psR_sum = HPFR_div(R_hybrid, exact_psS, exact_sS, W, K)
+    score_rf, score_ps, psS_sum, psR_sum = tracker.hpfr_div()
     
     return R_hybrid, score_rf + score_ps, score_rf, score_ps, psS_sum, psR_sum, prep_time, selection_time, pruning_time, W_hybrid
 
@@ -88,16 +88,16 @@ def hybrid_on_grid_div(S: List[Place], k: int, G, K_sample, W):
     W_hybrid = K_sample / (k*g)
     
     # Preparation for hybrid
-    grid = SquareGrid(biased_sampled_S, G)
+    grid = make_grid(biased_sampled_S, G, cache=False)
     CL = grid.get_full_cells()
     bs_psS, bs_sS, prep_time = virtual_grid_based_algorithm(CL, biased_sampled_S)
-    exact_psS, exact_sS, exact_prep_time = base_precompute(S)
         
     # Run grid IAdU algorithm
-    R_hybrid, selection_time = grid_based_iadu_algorithm(biased_sampled_S, CL, W_hybrid, bs_psS,  bs_sS, k)
+    tracker = HPFRTracker(S, W, exact=True)
+    R_hybrid, selection_time = grid_based_iadu_algorithm(biased_sampled_S, CL, W_hybrid, bs_psS,  bs_sS, k, tracker=tracker)
     
     # Compute final scores
-    score_rf, score_ps, sum_psS, sum_psR = HPFR_div(R_hybrid, exact_psS, exact_sS, W, K)
+    score_rf, score_ps, sum_psS, sum_psR = tracker.hpfr_div()
     
     return R_hybrid, score_rf + score_ps, score_rf, score_ps, sum_psS, sum_psR, prep_time, selection_time, pruning_time
 
@@ -1,18 +1,137 @@
+import heapq
 import random
 import numpy as np
 from collections import defaultdict
-from typing import List, Tuple, Dict
+from collections.abc import Sequence
+from typing import List, Tuple, Dict, Iterable, Optional, Union
+
+RF_LEVELS = (0.4, 0.6, 0.8)
 
 
 class Place:
-    def __init__(self, id: int, coords: Tuple[float, float]):
+    def __init__(self, id: int, coords: Tuple[float, float], rF: Optional[float] = None):
         self.id = id
         self.coords = np.array(coords)
-        self.rF = random.choice([0.4, 0.6, 0.8])
+        self.rF = random.choice([0.4, 0.6, 0.8]) if rF is None else rF
         #self.rF = 0.0
         self.cHPF = 0.0
 
 
+class PlaceSet(Sequence):
+    """
+    Struct-of-arrays replacement for List[Place]: contiguous ids, xs, ys and rF
+    (32 bytes per place). Indexing/iterating yields Place objects, so code written
+    against List[Place] keeps working, while the core algorithms read the arrays.
+
+    take(idx) is a subset view: it stores the parent and the index array and
+    gathers the columns only on first access. Slicing gives NumPy views.
+    """
+
+    def __init__(self, ids, xs, ys, rF=None):
+        self._parent: Optional["PlaceSet"] = None
+        self.indices: Optional[np.ndarray] = None
+        self._set_columns(ids, xs, ys, rF)
+
+    def _set_columns(self, ids, xs, ys, rF) -> None:
+        self._ids = np.ascontiguousarray(ids, dtype=np.int64)
+        self._xs = np.ascontiguousarray(xs, dtype=np.float64)
+        self._ys = np.ascontiguousarray(ys, dtype=np.float64)
+        if rF is None:
+            rF = np.random.choice(RF_LEVELS, size=len(self._ids))
+        self._rF = np.ascontiguousarray(rF, dtype=np.float64)
+
+    # ---------- adapters ----------
+    @classmethod
+    def from_places(cls, places: Iterable[Place]) -> "PlaceSet":
+        """Build from a List[Place] (e.g. an unpickled dataset), keeping ids and rF."""
+        places = list(places)
+        coords = np.array([p.coords for p in places], dtype=np.float64).reshape(-1, 2)
+        return cls([p.id for p in places], coords[:, 0], coords[:, 1], [p.rF for p in places])
+
+    def to_places(self) -> List[Place]:
+        """Back to List[Place] (e.g. to pickle in the legacy format)."""
+        return list(self)
+
+    # ---------- columns ----------
+    def _materialize(self) -> None:
+        if self._parent is not None:
+            p, idx = self._parent, self.indices
+            self._set_columns(p.ids[idx], p.xs[idx], p.ys[idx], p.rF[idx])
+            self._parent = None
+
+    @property
+    def ids(self) -> np.ndarray:
+        self._materialize()
+        return self._ids
+
+    @property
+    def xs(self) -> np.ndarray:
+        self._materialize()
+        return self._xs
+
+    @property
+    def ys(self) -> np.ndarray:
+        self._materialize()
+        return self._ys
+
+    @property
+    def rF(self) -> np.ndarray:
+        self._materialize()
+        return self._rF
+
+    @property
+    def coords(self) -> np.ndarray:
+        """(K, 2) coordinate array (a new array)."""
+        return np.column_stack((self.xs, self.ys))
+
+    # ---------- views ----------
+    def take(self, idx) -> "PlaceSet":
+        """Subset view by index array (order kept); nothing is copied until used."""
+        view = PlaceSet.__new__(PlaceSet)
+        view._parent = self
+        view.indices = np.asarray(idx, dtype=np.int64)
+        return view
+
+    # ---------- Sequence API ----------
+    def __len__(self) -> int:
+        return len(self.indices) if self._parent is not None else len(self._ids)
+
+    def __getitem__(self, i: Union[int, slice]):
+        if isinstance(i, slice):
+            return PlaceSet(self.ids[i], self.xs[i], self.ys[i], self.rF[i])
+        return Place(int(self.ids[i]), (float(self.xs[i]), float(self.ys[i])), rF=float(self.rF[i]))
+
+    def __iter__(self):
+        for pid, x, y, r in zip(self.ids.tolist(), self.xs.tolist(), self.ys.tolist(), self.rF.tolist()):
+            yield Place(pid, (x, y), rF=r)
+
+    def nbytes(self) -> int:
+        return self.ids.nbytes + self.xs.nbytes + self.ys.nbytes + self.rF.nbytes
+
+
+def as_placeset(S: Union[List[Place], PlaceSet]) -> PlaceSet:
+    return S if isinstance(S, PlaceSet) else PlaceSet.from_places(S)
+
+
+def coords_array(S: Union[List[Place], PlaceSet]) -> np.ndarray:
+    """(K, 2) float64 contiguous array of the place coordinates, in S order."""
+    if isinstance(S, PlaceSet):
+        return S.coords
+    return np.ascontiguousarray([p.coords for p in S], dtype=np.float64).reshape(-1, 2)
+
+
+def ids_array(S: Union[List[Place], PlaceSet]) -> np.ndarray:
+    if isinstance(S, PlaceSet):
+        return S.ids
+    return np.fromiter((p.id for p in S), dtype=np.int64, count=len(S))
+
+
+def rF_array(S: Union[List[Place], PlaceSet]) -> np.ndarray:
+    if isinstance(S, PlaceSet):
+        return S.rF
+    return np.fromiter((p.rF for p in S), dtype=np.float64, count=len(S))
+
+
 class Cell:
     def __init__(self, cell_id: Tuple[int, int]):
         self.id = cell_id
@@ -33,6 +152,42 @@ class Cell:
     def size(self) -> int:
         return len(self.places)
 
+
+class CellView(Cell):
+    """
+    Cell of a SquareGrid backed by the grid's CSR layout: its places are
+    grid.places[rows] (rows = a slice of the cell-sorted order), the count and
+    the center come from the grid's bincounts. The Place list is only built on
+    first access to .places (and then kept, so cHPF updates stick).
+    """
+
+    def __init__(self, cell_id: Tuple[int, int], grid: "SquareGrid", rows: np.ndarray, center: np.ndarray):
+        self.id = cell_id
+        self.grid = grid
+        self.rows = rows
+        self.center = center
+        self.score: float = None
+        self._places: Optional[List[Place]] = None
+
+    @property
+    def places(self) -> List[Place]:
+        if self._places is None:
+            S = self.grid.places
+            self._places = [S[int(i)] for i in self.rows]
+        return self._places
+
+    @places.setter
+    def places(self, value: List[Place]) -> None:
+        self._places = value
+
+    def add(self, p: Place):
+        self.places.append(p)
+        self.rows = None  # no longer the grid's slice
+        self.center = None
+
+    def size(self) -> int:
+        return len(self.rows) if self._places is None else len(self._places)
+
 from typing import Dict, List, Tuple
 import math
 
@@ -52,8 +207,8 @@ class SquareGrid:
     - Stores only non-empty cells by default (virtual grid).
     """
 
-    def __init__(self, places: List["Place"], G: int, precreate: bool = False):
-        if not places:
+    def __init__(self, places: Union[List["Place"], PlaceSet], G: int, precreate: bool = False):
+        if len(places) == 0:
             raise ValueError("SquereGrid requires non-empty 'places'.")
         if not isinstance(G, int) or G <= 0:
             raise ValueError("G must be a positive integer.")
@@ -62,10 +217,13 @@ class SquareGrid:
         self.G = G
 
         # ---- tight rectangular bounds from S ----
-        xs = [p.coords[0] for p in places]
-        ys = [p.coords[1] for p in places]
-        x_min, x_max = min(xs), max(xs)
-        y_min, y_max = min(ys), max(ys)
+        if isinstance(places, PlaceSet):
+            xs, ys = places.xs, places.ys
+        else:
+            coords = coords_array(places)
+            xs, ys = coords[:, 0], coords[:, 1]
+        x_min, x_max = float(xs.min()), float(xs.max())
+        y_min, y_max = float(ys.min()), float(ys.max())
         self.x_min, self.x_max = x_min, x_max
         self.y_min, self.y_max = y_min, y_max
 
@@ -83,13 +241,14 @@ class SquareGrid:
         self.cell_h = (height - eps) / self.Ay
 
         # ---- grid storage ----
+        # CSR layout: places of flat cell f = gx * Ay + gy are places[order[cell_start[f]:cell_start[f + 1]]]
         self._grid: Dict[Tuple[int, int], "Cell"] = {}
         if precreate:
             for gx in range(self.Ax):
                 for gy in range(self.Ay):
                     self._grid[(gx, gy)] = Cell((gx, gy))
 
-        self._assign_to_cells()
+        self._assign_to_cells(xs, ys)
 
     # ---------- internals ----------
     @staticmethod
@@ -130,12 +289,34 @@ class SquareGrid:
         elif gy >= self.Ay: gy = self.Ay - 1
         return gx, gy
 
-    def _assign_to_cells(self) -> None:
-        for p in self.places:
-            key = self._to_index(*p.coords)
-            if key not in self._grid:
-                self._grid[key] = Cell(key)
-            self._grid[key].add(p)
+    def _to_indices(self, xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Vectorized _to_index over coordinate arrays."""
+        gx = np.clip(((xs - self.x_min) / self.cell_w).astype(np.int64), 0, self.Ax - 1)
+        gy = np.clip(((ys - self.y_min) / self.cell_h).astype(np.int64), 0, self.Ay - 1)
+        return gx, gy
+
+    def _assign_to_cells(self, xs: np.ndarray, ys: np.ndarray) -> None:
+        G = self.Ax * self.Ay
+        gx, gy = self._to_indices(xs, ys)
+        flat = gx * self.Ay + gy
+        # one stable sort by cell (radix sort for 16-bit keys), counts and sums by bincount
+        key_dtype = np.uint16 if G <= (1 << 16) else np.uint32 if G <= (1 << 32) else np.int64
+        self.cell_of = flat
+        self.order = np.argsort(flat.astype(key_dtype), kind="stable")
+        self.counts = np.bincount(flat, minlength=G)
+        self.cell_start = np.zeros(G + 1, dtype=np.int64)
+        np.cumsum(self.counts, out=self.cell_start[1:])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.centers = np.column_stack([np.bincount(flat, weights=xs, minlength=G),
+                                            np.bincount(flat, weights=ys, minlength=G)]) / self.counts[:, None]
+
+        # non-empty cells in order of first appearance in places (the old insertion order)
+        full = np.flatnonzero(self.counts)
+        full = full[np.argsort(self.order[self.cell_start[full]], kind="stable")]
+        starts = self.cell_start.tolist()
+        for f in full.tolist():
+            key = (f // self.Ay, f % self.Ay)
+            self._grid[key] = CellView(key, self, self.order[starts[f]:starts[f + 1]], self.centers[f])
 
     # ---------- API ----------
     def get_grid(self) -> Dict[Tuple[int, int], "Cell"]:
@@ -201,3 +382,288 @@ class FullGrid(SquareGrid):
                     cx = self.x_min + (gx + 0.5) * self.cell_w
                     cy = self.y_min + (gy + 0.5) * self.cell_h
                     c.center = np.array([cx, cy])
+
+
+# --- QuantileGrid: SquareGrid axes, but column/row edges at coordinate quantiles ---
+class QuantileGrid(SquareGrid):
+    """
+    Ax × Ay = G chosen like SquareGrid, but the column (row) boundaries are
+    the 1/Ax (1/Ay) quantiles of S's x (y) coordinates instead of uniform
+    splits. Only the marginals are balanced: every column holds about K/Ax
+    places and every row about K/Ay, so hot spots are cut finer. Neither the
+    per-cell counts nor |CL| are balanced: on clustered data many column x row
+    products miss every cluster and stay empty (e.g. 405 of 1024 cells
+    non-empty on a 5000-place flower, 859 of 1024 on bubble clusters).
+    x_edges / y_edges hold all Ax + 1 / Ay + 1 boundaries (first/last = bounds).
+    """
+
+    def _assign_to_cells(self, xs: np.ndarray, ys: np.ndarray) -> None:
+        self.x_edges = np.quantile(xs, np.linspace(0.0, 1.0, self.Ax + 1))
+        self.y_edges = np.quantile(ys, np.linspace(0.0, 1.0, self.Ay + 1))
+        self.x_edges[[0, -1]] = self.x_min, self.x_max
+        self.y_edges[[0, -1]] = self.y_min, self.y_max
+        super()._assign_to_cells(xs, ys)
+
+    def _to_index(self, x: float, y: float) -> Tuple[int, int]:
+        gx, gy = self._to_indices(np.array([x]), np.array([y]))
+        return int(gx[0]), int(gy[0])
+
+    def _to_indices(self, xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # place on an inner edge goes right/up, like the uniform grid; max edge stays in the last cell
+        gx = np.searchsorted(self.x_edges[1:-1], xs, side="right")
+        gy = np.searchsorted(self.y_edges[1:-1], ys, side="right")
+        return gx.astype(np.int64), gy.astype(np.int64)
+
+
+# --- Morton (Z-order) layout: sort once, derive every 2^l x 2^l grid from code prefixes ---
+MORTON_BITS = 16  # quantization bits per axis (levels l = 0..16, G = 4^l)
+
+
+def _part1by1(v: np.ndarray) -> np.ndarray:
+    """Spread the low 16 bits of v to the even bit positions."""
+    v = v.astype(np.uint64) & 0xFFFF
+    v = (v | (v << 8)) & 0x00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F
+    v = (v | (v << 2)) & 0x33333333
+    v = (v | (v << 1)) & 0x55555555
+    return v
+
+
+def _compact1by1(v: np.ndarray) -> np.ndarray:
+    """Inverse of _part1by1: gather the even bits of v."""
+    v = v.astype(np.uint64) & 0x55555555
+    v = (v | (v >> 1)) & 0x33333333
+    v = (v | (v >> 2)) & 0x0F0F0F0F
+    v = (v | (v >> 4)) & 0x00FF00FF
+    v = (v | (v >> 8)) & 0x0000FFFF
+    return v.astype(np.int64)
+
+
+def morton_level(G: int) -> Optional[int]:
+    """l with G == 4^l (l <= MORTON_BITS), else None."""
+    if not isinstance(G, int) or G <= 0 or G & (G - 1):
+        return None
+    l2 = G.bit_length() - 1
+    return l2 // 2 if l2 % 2 == 0 and l2 // 2 <= MORTON_BITS else None
+
+
+class MortonOrder:
+    """
+    Places of S sorted once by Morton code inside S's tight bounding rectangle
+    (each axis quantized to MORTON_BITS bits). A grid of 2^l x 2^l cells is then
+    the runs of equal code prefixes (code >> 2 * (MORTON_BITS - l)): one linear
+    scan per resolution, no re-sort, no per-place Python work.
+    """
+
+    def __init__(self, places: Union[List["Place"], PlaceSet]):
+        if len(places) == 0:
+            raise ValueError("MortonOrder requires non-empty 'places'.")
+        self.places = places
+        if isinstance(places, PlaceSet):
+            xs, ys = places.xs, places.ys
+        else:
+            coords = coords_array(places)
+            xs, ys = coords[:, 0], coords[:, 1]
+        self.x_min, self.x_max = float(xs.min()), float(xs.max())
+        self.y_min, self.y_max = float(ys.min()), float(ys.max())
+        width = max(self.x_max - self.x_min, 1e-12)
+        height = max(self.y_max - self.y_min, 1e-12)
+
+        # same cell-edge convention as SquareGrid (epsilon keeps max-edge inside last cell)
+        eps = 1e-12
+        side = 1 << MORTON_BITS
+        qx = np.clip(((xs - self.x_min) / ((width - eps) / side)).astype(np.int64), 0, side - 1)
+        qy = np.clip(((ys - self.y_min) / ((height - eps) / side)).astype(np.int64), 0, side - 1)
+        codes = (_part1by1(qx) | (_part1by1(qy) << 1)).astype(np.uint32)
+
+        # stable LSD radix sort on two 16-bit halves (ties keep S order)
+        order = np.argsort((codes & 0xFFFF).astype(np.uint16), kind="stable")
+        order = order[np.argsort((codes[order] >> 16).astype(np.uint16), kind="stable")]
+        self.order = order
+        self.codes = codes[order]
+        self.xs_sorted = np.ascontiguousarray(xs[order])
+        self.ys_sorted = np.ascontiguousarray(ys[order])
+
+    def grid(self, G: int) -> "MortonGrid":
+        level = morton_level(G)
+        if level is None:
+            raise ValueError(f"Morton grids need G = 4^l with l <= {MORTON_BITS} (got G={G}).")
+        return MortonGrid(self, level)
+
+
+class MortonGrid(SquareGrid):
+    """
+    2^l x 2^l grid over a MortonOrder (G = 4^l): same API as SquareGrid
+    (get_grid, get_full_cells, dims, ...), non-empty cells only, as CellViews
+    in Morton order. The cells are those of a SquareGrid with Ax = Ay = 2^l,
+    which is what SquareGrid(S, G) picks only when S's bounding box is square:
+    otherwise SquareGrid fits Ax x Ay to the aspect ratio (32 x 8 for G = 256
+    on a 4:1 box) and the Morton cells are 2^l x 2^l stretched rectangles.
+    """
+
+    def __init__(self, morton: MortonOrder, level: int, cells: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None):
+        """cells = (cell_start, cell_codes, centers) of this level if already known (GridPyramid)."""
+        self.morton = morton
+        self.places = morton.places
+        self.level = level
+        self.G = 4 ** level
+        self.x_min, self.x_max = morton.x_min, morton.x_max
+        self.y_min, self.y_max = morton.y_min, morton.y_max
+        self.Ax = self.Ay = 1 << level
+        eps = 1e-12
+        self.cell_w = (max(self.x_max - self.x_min, 1e-12) - eps) / self.Ax
+        self.cell_h = (max(self.y_max - self.y_min, 1e-12) - eps) / self.Ay
+
+        if cells is None:
+            # runs of equal prefixes = cells (codes are sorted)
+            prefix = morton.codes >> np.uint32(2 * (MORTON_BITS - level))
+            starts = np.flatnonzero(np.concatenate(([True], prefix[1:] != prefix[:-1])))
+            cell_start = np.append(starts, len(prefix)).astype(np.int64)
+            counts = np.diff(cell_start)
+            centers = np.column_stack([np.add.reduceat(morton.xs_sorted, starts),
+                                       np.add.reduceat(morton.ys_sorted, starts)]) / counts[:, None]
+            cells = (cell_start, prefix[starts].astype(np.int64), centers)
+        self.cell_start, self.cell_codes, self.centers = cells
+        self.counts = np.diff(self.cell_start)
+        self.order = morton.order
+
+        gxs = _compact1by1(self.cell_codes).tolist()
+        gys = _compact1by1(self.cell_codes >> 1).tolist()
+        bounds = self.cell_start.tolist()
+        self._grid: Dict[Tuple[int, int], "Cell"] = {}
+        for c, key in enumerate(zip(gxs, gys)):
+            self._grid[key] = CellView(key, self, self.order[bounds[c]:bounds[c + 1]], self.centers[c])
+
+
+class QuadTreeGrid(SquareGrid):
+    """
+    Adaptive quadtree over S's tight bounding rectangle, in one of two modes:
+      - max_occupancy: a cell is split into its four quadrants while it holds
+        more than max_occupancy places (down to max_level, where only
+        duplicate-close places can exceed it);
+      - max_leaves: the most populated leaf is split until one more split would
+        give more than max_leaves non-empty leaves (|CL| ~ max_leaves, the cell
+        budget of a SquareGrid with G = max_leaves). split="extent" ranks leaves
+        by population x side instead, the leaf's share of the center-distance
+        error bound, so large sparse leaves are split too.
+    Dense regions get small cells and sparse ones stay coarse. Leaves are Morton
+    code prefixes of varying length, read from one MortonOrder (pass `morton` to
+    reuse a sort); only non-empty leaves are stored, as CellViews in Morton order
+    with keys (level, gx, gy). Same cell API as SquareGrid (get_grid, get_full_cells, stats).
+    """
+
+    def __init__(self, places: Union[List["Place"], PlaceSet], max_occupancy: Optional[int] = None,
+                 max_level: int = MORTON_BITS, morton: Optional[MortonOrder] = None,
+                 max_leaves: Optional[int] = None, split: str = "population"):
+        if (max_occupancy is None) == (max_leaves is None):
+            raise ValueError("QuadTreeGrid needs exactly one of max_occupancy / max_leaves.")
+        if split not in ("population", "extent"):
+            raise ValueError(f"split must be 'population' or 'extent' (got {split!r}).")
+        for name, value in (("max_occupancy", max_occupancy), ("max_leaves", max_leaves)):
+            if value is not None and (not isinstance(value, (int, np.integer)) or value <= 0):
+                raise ValueError(f"{name} must be a positive integer.")
+        morton = morton if morton is not None else MortonOrder(places)
+        self.morton = morton
+        self.places = morton.places
+        self.max_occupancy = None if max_occupancy is None else int(max_occupancy)
+        self.max_leaves = None if max_leaves is None else int(max_leaves)
+        self.split = split
+        self.max_level = min(int(max_level), MORTON_BITS)
+        self.x_min, self.x_max = morton.x_min, morton.x_max
+        self.y_min, self.y_max = morton.y_min, morton.y_max
+
+        if self.max_leaves is None:
+            starts, levels, codes = self._split_by_occupancy()
+        else:
+            starts, levels, codes = self._split_by_budget()
+        srt = np.argsort(starts, kind="stable")
+        starts = starts[srt]
+        self.cell_start = np.append(starts, len(morton.codes)).astype(np.int64)
+        self.cell_level = levels[srt]
+        self.cell_codes = codes[srt]
+        self.counts = np.diff(self.cell_start)
+        self.centers = np.column_stack([np.add.reduceat(morton.xs_sorted, starts),
+                                        np.add.reduceat(morton.ys_sorted, starts)]) / self.counts[:, None]
+        self.order = morton.order
+
+        # finest leaf level sets the nominal axes/cell size (dims, stats)
+        self.depth = int(self.cell_level.max())
+        self.Ax = self.Ay = 1 << self.depth
+        self.G = len(starts)
+        eps = 1e-12
+        self.cell_w = (max(self.x_max - self.x_min, 1e-12) - eps) / self.Ax
+        self.cell_h = (max(self.y_max - self.y_min, 1e-12) - eps) / self.Ay
+
+        gxs = _compact1by1(self.cell_codes).tolist()
+        gys = _compact1by1(self.cell_codes >> 1).tolist()
+        bounds = self.cell_start.tolist()
+        self._grid: Dict[Tuple[int, int, int], "Cell"] = {}
+        for c, key in enumerate(zip(self.cell_level.tolist(), gxs, gys)):
+            self._grid[key] = CellView(key, self, self.order[bounds[c]:bounds[c + 1]], self.centers[c])
+
+    def _split_by_occupancy(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # top-down, one level at a time over the places of still-open cells only
+        codes = self.morton.codes
+        pos = np.arange(len(codes))
+        leaf_start, leaf_level, leaf_code = [], [], []
+        for level in range(self.max_level + 1):
+            prefix = codes[pos] >> np.uint32(2 * (MORTON_BITS - level))
+            brk = np.flatnonzero(np.concatenate(([True], prefix[1:] != prefix[:-1])))
+            counts = np.diff(np.append(brk, len(pos)))
+            leaf = counts <= self.max_occupancy if level < self.max_level else np.ones(len(brk), dtype=bool)
+            leaf_start.append(pos[brk[leaf]])
+            leaf_level.append(np.full(int(leaf.sum()), level, dtype=np.int64))
+            leaf_code.append(prefix[brk[leaf]].astype(np.int64))
+            pos = pos[np.repeat(~leaf, counts)]
+            if len(pos) == 0:
+                break
+        return np.concatenate(leaf_start), np.concatenate(leaf_level), np.concatenate(leaf_code)
+
+    def _children(self, start: int, end: int, level: int):
+        """Non-empty sub-quadrant runs of a leaf (descending while they are a single run), or None."""
+        codes = self.morton.codes[start:end]
+        for child in range(level + 1, self.max_level + 1):
+            prefix = codes >> np.uint32(2 * (MORTON_BITS - child))
+            brk = np.flatnonzero(prefix[1:] != prefix[:-1]) + 1
+            if len(brk):
+                first = np.concatenate(([0], brk))
+                return child, (start + first).tolist(), prefix[first].astype(np.int64).tolist()
+        return None  # duplicate-close places down to max_level: cannot be split
+
+    def _split_by_budget(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # max-heap on population (x side for "extent"); a split replaces one leaf with 2..4 non-empty ones
+        extent = self.split == "extent"
+        N = len(self.morton.codes)
+        leaves = {0: (N, 0, 0)}  # start -> (end, level, code)
+        heap = [(-N, 0)]
+        while heap and len(leaves) < self.max_leaves:
+            _, start = heapq.heappop(heap)
+            end, level, _ = leaves[start]
+            children = self._children(start, end, level)
+            if children is None:
+                continue
+            child_level, child_starts, child_codes = children
+            if len(leaves) - 1 + len(child_starts) > self.max_leaves:
+                break
+            child_ends = child_starts[1:] + [end]
+            for s, e, code in zip(child_starts, child_ends, child_codes):
+                leaves[s] = (e, child_level, code)
+                heapq.heappush(heap, (-(e - s) * (0.5 ** child_level if extent else 1), s))
+        starts = np.fromiter(leaves, dtype=np.int64, count=len(leaves))
+        levels = np.array([leaves[s][1] for s in starts.tolist()], dtype=np.int64)
+        codes = np.array([leaves[s][2] for s in starts.tolist()], dtype=np.int64)
+        return starts, levels, codes
+
+    def get_all_cells(self) -> List["Cell"]:
+        """The leaves (empty quadrants are not stored)."""
+        return list(self._grid.values())
+
+    def total_cells(self) -> int:
+        return len(self._grid)
+
+    def stats(self) -> str:
+        K = len(self.places)
+        mode = f"max_occ={self.max_occupancy}" if self.max_leaves is None else f"max_leaves={self.max_leaves} split={self.split}"
+        return (f"quadtree leaves={len(self._grid)} depth={self.depth} {mode} "
+                f"largest={int(self.counts.max())} K={K} avg_occ={K / max(1, len(self._grid)):.2f} "
+                f"span=[{self.x_min:.6g},{self.x_max:.6g}]×[{self.y_min:.6g},{self.y_max:.6g}]")
@@ -0,0 +1,289 @@
+# pid_ingest.py — bulk reader for pid.txt universes (DBpedia / YAGO2 master files)
+#
+# The file is split into byte ranges of CHUNK_BYTES aligned to line starts; every
+# chunk is parsed with one np.fromstring call (commas -> spaces, whole-line '#'
+# comments dropped) in a process pool and the chunks are concatenated in file
+# order. Chunks whose lines do not all have the same number of numeric fields
+# fall back to the per-line regex parse the generators used before.
+#
+# Rows: "id a b" (extra fields ignored) or "a b" (no id -> numbered 1.. in file order).
+#
+# Universe snapshots (<pid.txt>.snap/, or under SNAPSHOT_DIR) keep the parsed universe
+# so later runs skip the text entirely:
+#   ids/x/y/rF.npy + meta.json   columnar_store layout, opened mmap
+#   index/                       spatial_index.GridIndex over (x, y)
+# meta.json records the snapshot version, the parse options and the size/mtime of the
+# source file; a snapshot that does not match them is rewritten on open.
+
+import os
+import re
+import shutil
+import warnings
+from multiprocessing import Pool
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from columnar_store import load_columnar, read_meta, save_columnar
+from models import PlaceSet
+from spatial_index import GridIndex
+
+try:
+    import config as cfg
+except Exception:  # allow quick runs without config present
+    cfg = object()
+
+CHUNK_BYTES: int = getattr(cfg, "INGEST_CHUNK_BYTES", 64 << 20)
+SNAPSHOT_DIR: Optional[str] = getattr(cfg, "UNIVERSE_SNAPSHOT_DIR", None)
+SNAPSHOT_SUFFIX = ".snap"
+SNAPSHOT_VERSION = 1
+FLOAT_RE = re.compile(rb"[-+]?\d*\.?\d+(?:[eE][-+]?\d+)?")
+_COMMENT_RE = re.compile(rb"(?m)^[ \t\r\f\v]*#[^\n]*")
+_WS = np.zeros(256, dtype=bool)
+_WS[list(b" \t\n\r\f\v")] = True
+
+
+def resolve_ingest_workers(workers: Optional[int] = None) -> int:
+    """None -> cfg.INGEST_WORKERS, <= 0 -> all cores."""
+    if workers is None:
+        workers = getattr(cfg, "INGEST_WORKERS", 0)
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+# ---------- chunking ----------
+def chunk_ranges(path: str, chunk_bytes: int = None) -> List[Tuple[int, int]]:
+    size = os.path.getsize(path)
+    step = max(1, chunk_bytes or CHUNK_BYTES)
+    return [(start, min(start + step, size)) for start in range(0, size, step)] or [(0, 0)]
+
+
+def _read_lines(path: str, start: int, end: int) -> bytes:
+    """Bytes of the lines that START inside [start, end)."""
+    with open(path, "rb") as f:
+        if start > 0:
+            f.seek(start - 1)
+            f.readline()           # finish the line owned by the previous chunk
+            start = f.tell()
+        if start >= end:
+            return b""
+        data = f.read(end - start)
+        if data and not data.endswith(b"\n"):
+            data += f.readline()   # complete the last line we own
+    return data
+
+
+# ---------- parsing ----------
+def _fields_per_line(buf: np.ndarray) -> np.ndarray:
+    """Number of whitespace-separated fields of every non-empty line."""
+    ws = _WS[buf]
+    starts = ~ws
+    starts[1:] &= ws[:-1]                          # first byte of each field
+    line_of = np.cumsum(buf == ord("\n"))
+    counts = np.bincount(line_of[starts])
+    return counts[counts > 0]
+
+
+def _parse_slow(data: bytes) -> np.ndarray:
+    rows = []
+    for line in data.splitlines():
+        s = line.strip()
+        if not s or s.startswith(b"#"):
+            continue
+        nums = [float(x) for x in FLOAT_RE.findall(s.replace(b",", b" "))]
+        if len(nums) >= 3:
+            rows.append((nums[0], nums[1], nums[2]))     # maybe_id, a, b
+        elif len(nums) == 2:
+            rows.append((np.nan, nums[0], nums[1]))      # no id -> assign later
+    return np.asarray(rows, dtype=np.float64).reshape(-1, 3)
+
+
+def parse_chunk(data: bytes) -> np.ndarray:
+    """(n, 3) float64 rows (id or NaN, a, b) of a block of pid.txt lines."""
+    if b"#" in data:
+        data = _COMMENT_RE.sub(b"", data)
+    data = data.replace(b",", b" ")
+    fields = _fields_per_line(np.frombuffer(data, dtype=np.uint8))
+    if len(fields) == 0:
+        return np.empty((0, 3), dtype=np.float64)
+    ncols = int(fields[0])
+    if ncols >= 2 and (fields == ncols).all():
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            try:
+                vals = np.fromstring(data, dtype=np.float64, sep=" ")
+            except (ValueError, DeprecationWarning):
+                vals = None
+        if vals is not None and vals.size == ncols * len(fields):
+            vals = vals.reshape(-1, ncols)
+            if ncols == 2:
+                return np.column_stack([np.full(len(vals), np.nan), vals])
+            return np.ascontiguousarray(vals[:, :3])
+    return _parse_slow(data)
+
+
+def _parse_range(args) -> np.ndarray:
+    path, start, end = args
+    return parse_chunk(_read_lines(path, start, end))
+
+
+def read_pid_rows(path: str, workers: int = None, chunk_bytes: int = None) -> np.ndarray:
+    """All (id or NaN, a, b) rows of a pid.txt file, in file order."""
+    tasks = [(path, start, end) for start, end in chunk_ranges(path, chunk_bytes)]
+    workers = min(resolve_ingest_workers(workers), len(tasks))
+    if workers > 1:
+        with Pool(processes=workers) as pool:
+            parts = pool.map(_parse_range, tasks, chunksize=1)
+    else:
+        parts = [_parse_range(t) for t in tasks]
+    return np.concatenate(parts) if parts else np.empty((0, 3), dtype=np.float64)
+
+
+# ---------- universes ----------
+def orient_lat_lon(a: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(lat, lon) from two coordinate columns of unknown order (most in-range rows wins)."""
+    def score(lat, lon):
+        valid = ((-90 <= lat) & (lat <= 90) & (-180 <= lon) & (lon <= 180)).sum()
+        return valid + 0.001 * ((lon.max()-lon.min()) - (lat.max()-lat.min()))
+
+    if score(a, b) >= score(b, a):
+        return a, b
+    return b, a
+
+
+def ingest_pid(path: str, orient: bool = True, require_id: bool = False, workers: int = None,
+               chunk_bytes: int = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Contiguous (ids int64, x, y) of a pid.txt universe.
+
+    orient=True: x = lon, y = lat chosen by orient_lat_lon and clipped to the
+    valid ranges (YAGO2). orient=False: the two columns as written (DBpedia).
+    Rows without an id are numbered 1.. in file order, or dropped if require_id.
+    """
+    rows = read_pid_rows(path, workers, chunk_bytes)
+    if require_id:
+        rows = rows[~np.isnan(rows[:, 0])]
+    if len(rows) == 0:
+        raise ValueError(f"No numeric rows in {path}")
+
+    ids = np.full(len(rows), -1, dtype=np.int64)
+    has_id = ~np.isnan(rows[:, 0])
+    ids[has_id] = rows[has_id, 0].astype(np.int64)
+    need_seq = ids < 0
+    if need_seq.any():
+        ids[need_seq] = np.arange(1, need_seq.sum() + 1, dtype=np.int64)
+
+    a, b = np.ascontiguousarray(rows[:, 1]), np.ascontiguousarray(rows[:, 2])
+    if not orient:
+        return ids, a, b
+    lat, lon = orient_lat_lon(a, b)
+    return ids, np.clip(lon, -180, 180), np.clip(lat, -90, 90)
+
+
+# ---------- snapshots ----------
+class UniverseSnapshot:
+    """A written universe snapshot; columns and index are mapped on first access."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.meta = read_meta(path)
+        self._places: Optional[PlaceSet] = None
+        self._index: Optional[GridIndex] = None
+
+    @property
+    def places(self) -> PlaceSet:
+        if self._places is None:
+            self._places = load_columnar(self.path)
+        return self._places
+
+    @property
+    def index(self) -> GridIndex:
+        if self._index is None:
+            self._index = GridIndex.load(os.path.join(self.path, "index"))
+        return self._index
+
+    def __len__(self) -> int:
+        return int(self.meta["K"])
+
+    def query_bboxes(self, boxes) -> List[PlaceSet]:
+        """Places in each (xmin, ymin, xmax, ymax) box, in file order (one batched index query)."""
+        S = self.places
+        return [S.take(rows) for rows in self.index.query_bboxes(S.xs, S.ys, boxes)]
+
+    def query_bbox(self, xmin: float, ymin: float, xmax: float, ymax: float) -> PlaceSet:
+        return self.query_bboxes([(xmin, ymin, xmax, ymax)])[0]
+
+    def knn_chebyshev(self, seeds, K: int, workers: int = None) -> List[np.ndarray]:
+        """
+        Rows of the K nearest places (L-inf, ties by id) of every (x, y) seed, in
+        ranking order. Seeds are split over `workers` processes (None ->
+        cfg.INGEST_WORKERS); each worker maps the snapshot itself.
+        """
+        seeds = np.asarray(seeds, dtype=np.float64).reshape(-1, 2)
+        workers = min(resolve_ingest_workers(workers), len(seeds))
+        if workers <= 1:
+            S = self.places
+            return self.index.knn_chebyshev(S.xs, S.ys, S.ids, seeds, K)
+        batches = np.array_split(seeds, workers)
+        with Pool(processes=workers, initializer=_open_worker_snapshot, initargs=(self.path,)) as pool:
+            parts = pool.map(_knn_batch, [(batch, K) for batch in batches], chunksize=1)
+        return [rows for part in parts for rows in part]
+
+
+_worker_snapshot: Optional[UniverseSnapshot] = None
+
+
+def _open_worker_snapshot(path: str) -> None:
+    global _worker_snapshot
+    _worker_snapshot = UniverseSnapshot(path)
+
+
+def _knn_batch(args) -> List[np.ndarray]:
+    seeds, K = args
+    S = _worker_snapshot.places
+    return _worker_snapshot.index.knn_chebyshev(S.xs, S.ys, S.ids, seeds, K)
+
+
+def snapshot_path(pid_path: str, snapshot_dir: str = None) -> str:
+    snapshot_dir = snapshot_dir or SNAPSHOT_DIR
+    name = os.path.basename(pid_path) + SNAPSHOT_SUFFIX
+    return os.path.join(snapshot_dir, name) if snapshot_dir else os.path.join(os.path.dirname(pid_path), name)
+
+
+def _source_meta(pid_path: str, orient: bool, require_id: bool) -> dict:
+    st = os.stat(pid_path)
+    return {"snapshot": SNAPSHOT_VERSION, "orient": bool(orient), "require_id": bool(require_id),
+            "source_size": st.st_size, "source_mtime_ns": st.st_mtime_ns}
+
+
+def write_snapshot(pid_path: str, path: str, orient: bool = True, require_id: bool = False,
+                   workers: int = None, chunk_bytes: int = None) -> str:
+    """Parse pid_path once (ingest_pid) and write its snapshot to `path`."""
+    source = _source_meta(pid_path, orient, require_id)
+    ids, xs, ys = ingest_pid(pid_path, orient, require_id, workers, chunk_bytes)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    save_columnar(PlaceSet(ids, xs, ys), tmp, source)
+    GridIndex.build(xs, ys).save(os.path.join(tmp, "index"))
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+    return path
+
+
+def open_universe(pid_path: str, orient: bool = True, require_id: bool = False, snapshot_dir: str = None,
+                  rebuild: bool = False) -> UniverseSnapshot:
+    """
+    The universe of pid_path from its snapshot, writing (or rewriting) the
+    snapshot first if it is missing, from another version, made with other
+    parse options, or older than the text file.
+    """
+    path = snapshot_path(pid_path, snapshot_dir)
+    source = _source_meta(pid_path, orient, require_id)
+    fresh = False
+    if not rebuild and os.path.exists(os.path.join(path, "meta.json")):
+        meta = read_meta(path)
+        fresh = all(meta.get(k) == v for k, v in source.items()) and GridIndex.load(os.path.join(path, "index")) is not None
+    if not fresh:
+        write_snapshot(pid_path, path, orient, require_id)
+    return UniverseSnapshot(path)
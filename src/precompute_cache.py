@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+import config as cfg
+from baseline_iadu import base_precompute
+from grid_iadu import virtual_grid_based_algorithm
+from models import Cell, Place, PlaceSet, coords_array, ids_array
+from similarity import (GridSimilarity, IndexedScores, LazySimilarity, PairwiseSimilarity,
+                        coords_fingerprint, id_index, maxDistance, remember_diameter)
+
+# On-disk cache of the precompute results, one directory per entry:
+#   <cfg.PRECOMPUTE_CACHE_DIR>/<key>/meta.json + *.npy (opened with mmap_mode="r" on a hit)
+# The key hashes the coordinates, the ids and the parameters (kind, G, metric, dtype),
+# so an unchanged dataset is never precomputed twice. Entries are evicted LRU (meta.json
+# mtime is bumped on every hit) once the directory grows past cfg.PRECOMPUTE_CACHE_MAX_BYTES.
+# Both settings are read from cfg at call time, so a script may set them after import.
+METRIC = "euclidean"
+
+
+def _cache_dir(cache_dir: Optional[str] = None) -> Optional[str]:
+    return cache_dir or getattr(cfg, "PRECOMPUTE_CACHE_DIR", None)
+
+
+def _max_bytes(max_bytes: Optional[int] = None) -> int:
+    return max_bytes or getattr(cfg, "PRECOMPUTE_CACHE_MAX_BYTES", 4 << 30)
+
+
+def cache_key(S: Union[List[Place], PlaceSet], kind: str, **params) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(coords_fingerprint(coords_array(S)).encode())
+    h.update(ids_array(S).tobytes())
+    h.update(json.dumps({"kind": kind, "metric": METRIC, **params}, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def _entry_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+
+def _load(key: str, cache_dir: str) -> Optional[Tuple[dict, Dict[str, np.ndarray]]]:
+    path = os.path.join(cache_dir, key)
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in meta["arrays"]}
+    os.utime(meta_path)  # LRU touch
+    return meta, arrays
+
+
+def _store(key: str, cache_dir: str, meta: dict, arrays: Dict[str, np.ndarray], max_bytes: int) -> None:
+    size = sum(a.nbytes for a in arrays.values())
+    if size > max_bytes:
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    final = os.path.join(cache_dir, key)
+    tmp = os.path.join(cache_dir, f".{key}.{os.getpid()}.tmp")
+    os.makedirs(tmp, exist_ok=True)
+    for name, a in arrays.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), np.asarray(a))
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump({**meta, "arrays": list(arrays)}, f)
+    try:
+        os.replace(tmp, final)
+    except OSError:  # another run stored the same entry first
+        shutil.rmtree(tmp, ignore_errors=True)
+    evict(cache_dir, max_bytes)
+
+
+def evict(cache_dir: str, max_bytes: int) -> None:
+    """Drop least recently used entries until the cache fits in max_bytes."""
+    entries = []
+    for name in os.listdir(cache_dir):
+        meta_path = os.path.join(cache_dir, name, "meta.json")
+        if not name.startswith(".") and os.path.exists(meta_path):
+            entries.append((os.path.getmtime(meta_path), _entry_bytes(os.path.join(cache_dir, name)), name))
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+        total -= size
+
+
+def clear_cache(cache_dir: Optional[str] = None) -> None:
+    cache_dir = _cache_dir(cache_dir)
+    if cache_dir and os.path.isdir(cache_dir):
+        shutil.rmtree(cache_dir)
+
+
+#######################################################################################################################
+def cached_base_precompute(S: Union[List[Place], PlaceSet], materialize: bool = True, cache_dir: Optional[str] = None,
+                           max_bytes: Optional[int] = None):
+    """
+    base_precompute(S, materialize) through the cache. A hit maps psS (and the
+    similarity matrix) read-only from disk; its prep_time is the time spent
+    loading the entry in this run (the compute time is kept in meta.json).
+    """
+    cache_dir = _cache_dir(cache_dir)
+    if not cache_dir:
+        return base_precompute(S, materialize)
+    key = cache_key(S, "exact", materialize=materialize)
+    load_start = time.time()
+    hit = _load(key, cache_dir)
+    if hit is not None:
+        meta, arrays = hit
+        coords = coords_array(S)
+        remember_diameter(coords, meta["maxD"])
+        index = id_index(S)
+        psS = IndexedScores(index, arrays["psS"])
+        sS = PairwiseSimilarity(index, arrays["matrix"]) if materialize else LazySimilarity(index, coords, meta["maxD"])
+        return psS, sS, time.time() - load_start
+
+    psS, sS, prep_time = base_precompute(S, materialize)
+    arrays = {"psS": psS.values}
+    if materialize:
+        arrays["matrix"] = sS.matrix
+    _store(key, cache_dir, {"maxD": maxDistance(S), "prep_time": prep_time}, arrays, _max_bytes(max_bytes))
+    return psS, sS, prep_time
+
+
+def cached_virtual_grid(CL: List[Cell], S: Union[List[Place], PlaceSet], G: int, dtype=np.float64,
+                        cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+    """
+    virtual_grid_based_algorithm(CL, S, dtype) through the cache, keyed by S and G
+    (CL must be the cells of SquareGrid(S, G)). Cached: cell matrix, pr, place -> cell.
+    As for cached_base_precompute, a hit reports its load time as prep_time.
+    """
+    cache_dir = _cache_dir(cache_dir)
+    if not cache_dir:
+        return virtual_grid_based_algorithm(CL, S, dtype)
+    key = cache_key(S, "grid", G=G, cells=len(CL), dtype=np.dtype(dtype).name)
+    load_start = time.time()
+    hit = _load(key, cache_dir)
+    if hit is not None:
+        meta, arrays = hit
+        index = id_index(S)
+        cell_of = arrays["cell_of"]
+        psS = IndexedScores(index, np.asarray(arrays["pr"])[cell_of])
+        return psS, GridSimilarity(index, cell_of, arrays["cell_matrix"]), time.time() - load_start
+
+    psS, sS, prep_time = virtual_grid_based_algorithm(CL, S, dtype)
+    pr = np.zeros(len(CL), dtype=np.float64)
+    pr[sS.cell_of] = psS.values
+    _store(key, cache_dir, {"prep_time": prep_time},
+           {"cell_matrix": sS.cell_matrix, "pr": pr, "cell_of": sS.cell_of}, _max_bytes(max_bytes))
+    return psS, sS, prep_time
+
@@ -0,0 +1,139 @@
+import time
+from typing import Dict, List, Tuple, Union
+import numpy as np
+from models import Place, PlaceSet, ids_array
+from HPF_eq import HPFR, HPFR_div, HPFRTracker
+from similarity import IndexedScores, PairwiseSimilarity, id_index, maxDistance
+from baseline_iadu import base_precompute, baseline_iadu_algorithm
+from precompute_cache import cached_base_precompute, cached_virtual_grid
+from biased_sampling import select_random
+from grid_iadu import grid_based_iadu_algorithm, grid_layout, grid_precompute, make_grid
+
+
+class DatasetSession:
+    """
+    One dataset S shared by every method of an experiment run. The exact psS and
+    S^S are computed once (base_precompute) and reused for:
+      - iadu selection,
+      - the final HPFR scores of every method (O(k^2) lookups),
+      - hybrid samples: the sample psS/sS are cut out of the exact matrix and
+        rescaled to the sample's maxD, instead of a fresh O(K'^2) distance pass.
+
+    The methods return the same tuples as the module-level functions.
+    share_samples=True reuses one random sample per K' across hybrid and
+    hybrid_on_grid (otherwise each call draws its own, as the functions do).
+    cache_dir (default cfg.PRECOMPUTE_CACHE_DIR) keeps the exact and grid
+    precomputes on disk across runs (precompute_cache).
+    """
+
+    def __init__(self, S: Union[List[Place], PlaceSet], materialize: bool = True, share_samples: bool = False,
+                 cache_dir: str = None):
+        self.S = S
+        self.K = len(S)
+        self.materialize = materialize
+        self.share_samples = share_samples
+        self.cache_dir = cache_dir
+        self._exact = None
+        self._samples: Dict[int, Tuple[List[Place], float]] = {}
+
+    # ---------- shared exact precompute ----------
+    def exact(self):
+        """(psS, sS, prep_time) of S, computed on first use."""
+        if self._exact is None:
+            self._exact = cached_base_precompute(self.S, self.materialize, self.cache_dir)
+        return self._exact
+
+    def score(self, R: List[Place], W: float):
+        psS, sS, _ = self.exact()
+        return HPFR(R, psS, sS, W, self.K)
+
+    def score_div(self, R: List[Place], W: float):
+        psS, sS, _ = self.exact()
+        return HPFR_div(R, psS, sS, W, self.K)
+
+    # ---------- samples ----------
+    def sample(self, K_sample: int):
+        """(sample, pruning_time) drawn with select_random; cached per K' if share_samples."""
+        if not self.share_samples:
+            return select_random(self.S, K_sample)
+        if K_sample not in self._samples:
+            self._samples[K_sample] = select_random(self.S, K_sample)
+        return self._samples[K_sample]
+
+    def sample_precompute(self, sample: Union[List[Place], PlaceSet]) -> Tuple[IndexedScores, PairwiseSimilarity, float]:
+        """
+        base_precompute(sample) served from the exact S^S: submatrix on the sample
+        rows, d = (1 - sim) * maxD(S) rescaled to 1 - d / maxD(sample).
+        """
+        if not self.materialize:
+            return base_precompute(sample, False)
+        _, sS, _ = self.exact()
+
+        prep_start = time.time()
+        maxD, sample_maxD = maxDistance(self.S), maxDistance(sample)
+        rows = np.fromiter(map(sS.index.__getitem__, ids_array(sample).tolist()), dtype=np.int64, count=len(sample))
+        sub = sS.matrix[np.ix_(rows, rows)]
+        if maxD != sample_maxD:
+            dist = (1.0 - sub) * maxD if maxD > 0 else np.zeros_like(sub)
+            sub = 1.0 - (dist / sample_maxD if sample_maxD > 0 else dist)
+        np.fill_diagonal(sub, 0.0)
+        index = id_index(sample)
+        psS, sub_sS = IndexedScores(index, sub.sum(axis=1)), PairwiseSimilarity(index, sub)
+        prep_end = time.time()
+
+        return psS, sub_sS, prep_end - prep_start
+
+    # ---------- methods ----------
+    def iadu(self, k: int, W):
+        psS, sS, prep_time = self.exact()
+        tracker = HPFRTracker(self.S, W)
+        R, selection_time = baseline_iadu_algorithm(self.S, self.K, k, W, psS, sS, tracker)
+        score, sum_psS, sum_psR = tracker.hpfr()
+        return R, score, sum_psS, sum_psR, prep_time, selection_time
+
+    def iadu_div(self, k: int, W):
+        psS, sS, prep_time = self.exact()
+        tracker = HPFRTracker(self.S, W)
+        R, selection_time = baseline_iadu_algorithm(self.S, self.K, k, W, psS, sS, tracker)
+        score_rf, score_ps, sum_psS, sum_psR = tracker.hpfr_div()
+        return R, score_rf + score_ps, score_rf, score_ps, sum_psS, sum_psR, prep_time, selection_time
+
+    def grid_iadu(self, k: int, W, G: int):
+        if grid_layout(G) != "square":
+            CL, psS, sS, prep_time = grid_precompute(self.S, G)  # pyramid level (kept in memory), quadtree or quantile grid
+        else:
+            CL = make_grid(self.S, G).get_full_cells()
+            psS, sS, prep_time = cached_virtual_grid(CL, self.S, G, cache_dir=self.cache_dir)
+        R, selection_time = grid_based_iadu_algorithm(self.S, CL, W, psS, sS, k)
+        score, sum_psS, sum_psR = self.score(R, W)
+        return R, score, sum_psS, sum_psR, prep_time, selection_time, len(CL)
+
+    def biased_sampling(self, k: int, W):
+        R_sampling, pruning_time = select_random(self.S, k)
+        score, sum_psS, sum_psR = self.score(R_sampling, W)
+        return R_sampling, score, sum_psS, sum_psR, pruning_time
+
+    def hybrid(self, k: int, K_sample, W):
+        g = self.K / (k * W)
+        if K_sample < k:
+            raise ValueError(f"Hybrid error: K_sample ({K_sample}) is smaller than k ({k})")
+        biased_sampled_S, pruning_time = self.sample(K_sample)
+        W_hybrid = K_sample / (k * g)
+
+        bs_psS, bs_sS, prep_time = self.sample_precompute(biased_sampled_S)
+        R_hybrid, selection_time = baseline_iadu_algorithm(biased_sampled_S, K_sample, k, W_hybrid, bs_psS, bs_sS)
+        score, psS_sum, psR_sum = self.score(R_hybrid, W)
+        return R_hybrid, score, psS_sum, psR_sum, prep_time, selection_time, pruning_time, W_hybrid
+
+    def hybrid_on_grid(self, k: int, G, K_sample, W):
+        if K_sample < k:
+            raise ValueError(f"Hybrid error: K_sample ({K_sample}) is smaller than k ({k})")
+        g = self.K / (k * W)
+        biased_sampled_S, pruning_time = self.sample(K_sample)
+        W_hybrid = K_sample / (k * g)
+
+        # a shared sample keeps its own pyramid, so other G reuse its sort and levels
+        CL, bs_psS, bs_sS, prep_time = grid_precompute(biased_sampled_S, G, cache=self.share_samples)
+        R_hybrid, selection_time = grid_based_iadu_algorithm(biased_sampled_S, CL, W_hybrid, bs_psS, bs_sS, k)
+        score, sum_psS, sum_psR = self.score(R_hybrid, W)
+        return R_hybrid, score, sum_psS, sum_psR, prep_time, selection_time, pruning_time
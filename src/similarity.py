@@ -0,0 +1,560 @@
+import hashlib
+import os
+from collections import OrderedDict
+from collections.abc import Mapping
+from multiprocessing import Pool, shared_memory
+from typing import Dict, List, Tuple, Union
+import numpy as np
+from models import Place, PlaceSet, coords_array, ids_array
+
+# Element budget of one pairwise tile: a (rows x K) float64 block of at most
+# TILE_ELEMENTS entries (32 MB) is the largest temporary allocated, whatever K is.
+TILE_ELEMENTS = 1 << 22
+
+
+def id_index(S: Union[List[Place], PlaceSet]) -> Dict[int, int]:
+    """Map place id -> row index (position in S)."""
+    return dict(zip(ids_array(S).tolist(), range(len(S))))
+
+
+def coords_fingerprint(coords: np.ndarray) -> str:
+    """Content hash of a coordinate array (shape + float64 bytes)."""
+    coords = np.ascontiguousarray(coords, dtype=np.float64)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(coords.shape).encode())
+    h.update(coords.tobytes())
+    return h.hexdigest()
+
+
+#######################################################################################################################
+# Diameter (maxD) of a point set: convex hull + rotating calipers instead of all O(K^2) pairs
+DIAMETER_CACHE_SIZE = 256
+_diameter_cache: "OrderedDict[str, float]" = OrderedDict()
+
+
+def _cross(o: np.ndarray, a: np.ndarray, b: np.ndarray) -> float:
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def convex_hull(coords: np.ndarray) -> np.ndarray:
+    """
+    Convex hull vertices in counter-clockwise order, collinear points dropped.
+    Quickhull with every partition step vectorized, so the Python work is
+    proportional to the hull size, not to K.
+    """
+    pts = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    if len(pts) == 0:
+        return pts
+    xs, ys = pts[:, 0], pts[:, 1]
+    left, right = np.flatnonzero(xs == xs.min()), np.flatnonzero(xs == xs.max())
+    a, b = pts[left[np.argmin(ys[left])]], pts[right[np.argmax(ys[right])]]
+    if np.array_equal(a, b):
+        return a[None, :]
+
+    hull = [a]
+    # in-order walk: each task is (points, p, q) -> hull vertices right of p->q
+    stack = [(pts, b, a), None, (pts, a, b)]
+    while stack:
+        task = stack.pop()
+        if task is None:
+            hull.append(b)
+            continue
+        if isinstance(task, np.ndarray):
+            hull.append(task)
+            continue
+        P, p, q = task
+        side = (q[0] - p[0]) * (P[:, 1] - p[1]) - (q[1] - p[1]) * (P[:, 0] - p[0])
+        right = side < 0
+        if not right.any():
+            continue
+        cand = P[right]
+        c = cand[np.argmin(side[right])]
+        stack.extend([(cand, c, q), c, (cand, p, c)])
+    return _monotone_chain(np.array(hull))
+
+
+def _monotone_chain(pts: np.ndarray) -> np.ndarray:
+    """
+    Andrew's monotone chain over the (few) quickhull vertices: guarantees a
+    strictly convex CCW polygon under its own orientation test, which rotating
+    calipers relies on when the input is nearly collinear.
+    """
+    pts = pts[np.lexsort((pts[:, 1], pts[:, 0]))]
+    lower: List[np.ndarray] = []
+    for p in pts:
+        while len(lower) >= 2 and _cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+    upper: List[np.ndarray] = []
+    for p in pts[::-1]:
+        while len(upper) >= 2 and _cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+    chain = lower[:-1] + upper[:-1]
+    return np.array(chain) if chain else pts[:1]
+
+
+def diameter(coords: np.ndarray) -> float:
+    """Exact largest pairwise Euclidean distance (rotating calipers on the hull)."""
+    hull = convex_hull(coords)
+    m = len(hull)
+    if m < 2:
+        return 0.0
+    if m == 2:
+        return float(np.hypot(*(hull[0] - hull[1])))
+
+    best = 0.0
+    j = 1
+    for i in range(m):
+        a, b = hull[i], hull[(i + 1) % m]
+        # advance the antipodal vertex while it moves away from edge (a, b)
+        while _cross(a, b, hull[(j + 1) % m]) > _cross(a, b, hull[j]):
+            j = (j + 1) % m
+        best = max(best, float(np.hypot(*(a - hull[j]))), float(np.hypot(*(b - hull[j]))))
+    return best
+
+
+def maxDistance(S: List[Place]) -> float:
+    """maxD of S, cached per dataset content (coordinates fingerprint)."""
+    coords = coords_array(S)
+    key = coords_fingerprint(coords)
+    if key in _diameter_cache:
+        _diameter_cache.move_to_end(key)
+        return _diameter_cache[key]
+    maxD = diameter(coords)
+    _diameter_cache[key] = maxD
+    if len(_diameter_cache) > DIAMETER_CACHE_SIZE:
+        _diameter_cache.popitem(last=False)
+    return maxD
+
+
+def remember_diameter(coords: np.ndarray, maxD: float) -> None:
+    """Seed the maxDistance cache with a known diameter (e.g. loaded from disk)."""
+    _diameter_cache[coords_fingerprint(coords)] = float(maxD)
+    _diameter_cache.move_to_end(coords_fingerprint(coords))
+    if len(_diameter_cache) > DIAMETER_CACHE_SIZE:
+        _diameter_cache.popitem(last=False)
+
+
+def _tile_rows(K: int) -> int:
+    """Rows per tile so that a (rows x K) float64 block stays within TILE_ELEMENTS."""
+    return max(1, min(K, TILE_ELEMENTS // max(K, 1)))
+
+
+def _block_distance(xs: np.ndarray, ys: np.ndarray, i0: int, i1: int) -> np.ndarray:
+    """Euclidean distances between rows i0:i1 and every place (in-place ops, one block)."""
+    return _cross_distance(xs[i0:i1], ys[i0:i1], xs, ys)
+
+
+def _cross_distance(xr: np.ndarray, yr: np.ndarray, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+    """(len(xr) x len(xs)) Euclidean distances between two coordinate sets."""
+    d = np.subtract.outer(xr, xs)
+    dy = np.subtract.outer(yr, ys)
+    np.multiply(d, d, out=d)
+    np.multiply(dy, dy, out=dy)
+    d += dy
+    np.sqrt(d, out=d)
+    return d
+
+
+def _block_similarity(xs: np.ndarray, ys: np.ndarray, i0: int, i1: int, maxD: float) -> np.ndarray:
+    """Similarity 1 - d/maxD between rows i0:i1 and every place."""
+    block = _block_distance(xs, ys, i0, i1)
+    if maxD > 0:
+        block /= maxD
+    np.subtract(1.0, block, out=block)
+    return block
+
+
+def _columns(coords: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    return np.ascontiguousarray(coords[:, 0]), np.ascontiguousarray(coords[:, 1])
+
+
+#######################################################################################################################
+class IndexedScores(Mapping):
+    """
+    psS as a read-only {place id -> score} mapping backed by a NumPy vector.
+    Code that indexes psS[p.id] keeps working; vectorized code uses .values.
+    """
+
+    def __init__(self, index: Dict[int, int], values: np.ndarray):
+        self.index = index
+        self.values = values
+
+    def __getitem__(self, pid: int) -> float:
+        return float(self.values[self.index[pid]])
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+
+class _SimilarityLookup:
+    """
+    Tuple-keyed lookups of the old sS dict (sS[(i, j)], sS.get((i, j))) on top of
+    an id -> row index map. Subclasses provide _pair(i, j) and row(i) on row indices.
+    The diagonal is not a stored pair: lookups of (i, i) behave like a missing key.
+    """
+
+    index: Dict[int, int]
+
+    def _pair(self, i: int, j: int) -> float:
+        raise NotImplementedError
+
+    def row(self, i: int) -> np.ndarray:
+        """Similarities between the place at row i and every place."""
+        raise NotImplementedError
+
+    def __getitem__(self, key: Tuple[int, int]) -> float:
+        i, j = self.index[key[0]], self.index[key[1]]
+        if i == j:
+            raise KeyError(key)
+        return self._pair(i, j)
+
+    def get(self, key: Tuple[int, int], default=None):
+        i, j = self.index.get(key[0]), self.index.get(key[1])
+        if i is None or j is None or i == j:
+            return default
+        return self._pair(i, j)
+
+    def __contains__(self, key: Tuple[int, int]) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        K = len(self.index)
+        return K * (K - 1)
+
+
+class PairwiseSimilarity(_SimilarityLookup):
+    """Dense symmetric S^S similarity matrix (zero diagonal)."""
+
+    def __init__(self, index: Dict[int, int], matrix: np.ndarray):
+        self.index = index
+        self.matrix = matrix
+
+    def _pair(self, i: int, j: int) -> float:
+        return float(self.matrix[i, j])
+
+    def row(self, i: int) -> np.ndarray:
+        return self.matrix[i]
+
+
+class LazySimilarity(_SimilarityLookup):
+    """
+    Matrix-free S^S: keeps only the coordinate columns and computes a
+    similarity row in O(K) when asked. Memory is O(K) instead of O(K^2).
+    """
+
+    def __init__(self, index: Dict[int, int], coords: np.ndarray, maxD: float):
+        self.index = index
+        self.xs, self.ys = _columns(coords)
+        self.maxD = maxD
+
+    def _pair(self, i: int, j: int) -> float:
+        d = float(np.hypot(self.xs[i] - self.xs[j], self.ys[i] - self.ys[j]))
+        return 1.0 - d / self.maxD if self.maxD > 0 else 1.0
+
+    def row(self, i: int) -> np.ndarray:
+        row = _block_similarity(self.xs, self.ys, i, i + 1, self.maxD)[0]
+        row[i] = 0.0
+        return row
+
+
+def cell_similarity(centers: np.ndarray, maxD: float, dtype=np.float64) -> np.ndarray:
+    """
+    |CL| x |CL| cell similarity 1 - d(center_i, center_j) / maxD in one
+    vectorized pass; the diagonal is 1.0 (places sharing a cell).
+    """
+    centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+    xs, ys = _columns(centers)
+    matrix = _block_similarity(xs, ys, 0, len(xs), maxD).astype(dtype, copy=False)
+    np.fill_diagonal(matrix, 1.0)
+    return matrix
+
+
+def cell_pr(cell_matrix: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """pr of every cell as one matrix-vector product: pr = M @ counts - 1 (the place itself)."""
+    counts = np.asarray(counts, dtype=cell_matrix.dtype)
+    return (cell_matrix @ counts).astype(np.float64) - 1.0
+
+
+#######################################################################################################################
+# Cell similarity when the |CL| x |CL| matrix is too large to store (e.g. a FullGrid with 10^6 cells)
+DENSE_CELL_ELEMENTS = 1 << 24
+
+
+class LazyCellMatrix:
+    """
+    Stand-in for the dense cell matrix: M[ci, cj] and M[ci] (one row) are
+    computed from the cell centers on demand, diagonal 1.0 as in cell_similarity.
+    """
+
+    def __init__(self, centers: np.ndarray, maxD: float, dtype=np.float64):
+        centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+        self.xs, self.ys = _columns(centers)
+        self.maxD = maxD
+        self.dtype = np.dtype(dtype)
+        self.shape = (len(self.xs), len(self.xs))
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            ci, cj = key
+            if ci == cj:
+                return 1.0
+            d = float(np.hypot(self.xs[ci] - self.xs[cj], self.ys[ci] - self.ys[cj]))
+            return 1.0 - d / self.maxD if self.maxD > 0 else 1.0
+        row = _block_similarity(self.xs, self.ys, key, key + 1, self.maxD)[0].astype(self.dtype, copy=False)
+        row[key] = 1.0
+        return row
+
+
+def cell_similarity_lookup(centers: np.ndarray, maxD: float, dtype=np.float64):
+    """Dense cell_similarity when it fits in DENSE_CELL_ELEMENTS, else a LazyCellMatrix."""
+    if len(centers) ** 2 <= DENSE_CELL_ELEMENTS:
+        return cell_similarity(centers, maxD, dtype)
+    return LazyCellMatrix(centers, maxD, dtype)
+
+
+def _fft_correlate(f_hat: np.ndarray, kernel: np.ndarray, shape: Tuple[int, int]) -> np.ndarray:
+    """out[c] = sum_c' f[c'] kernel[c - c'] on the lattice (kernel stored with wrap-around offsets)."""
+    return np.fft.irfft2(f_hat * np.fft.rfft2(kernel), s=kernel.shape)[:shape[0], :shape[1]]
+
+
+def lattice_pr(counts: np.ndarray, off_x: np.ndarray, off_y: np.ndarray, cell_w: float, cell_h: float,
+               maxD: float, near: int = 2) -> np.ndarray:
+    """
+    pr of every cell of a fully materialized (Ax x Ay) lattice via FFT convolution, O(G log G).
+
+    pr(c) = N - 1 - sum_c' n(c') |m(c) - m(c')| / maxD, where m(c) = lattice center + offset.
+    The sum is the convolution of the count grid with the lattice distance kernel, plus a
+    first-order correction for the offsets (mean center vs lattice center) of non-empty cells.
+    Neighbours within `near` cells (Chebyshev), where the linearization is poor, are
+    replaced by their exact distances. Returns an (Ax, Ay) array.
+
+    Approximate: against cell_pr on the same lattice (pr_mode="matrix") the largest
+    error measured on 2000-place synthetic sets was about 5e-3 * (N - 1) at G = 16-64
+    on clustered data, and 1e-4 to 1.5e-3 * (N - 1) at G = 256-1024. That is enough to
+    change the selected R on some datasets, at any G.
+    """
+    n = np.asarray(counts, dtype=np.float64)
+    Ax, Ay = n.shape
+    N = n.sum()
+    if maxD <= 0:
+        return np.full(n.shape, N - 1.0)
+    off_x = np.where(n > 0, off_x, 0.0)
+    off_y = np.where(n > 0, off_y, 0.0)
+
+    # Kernels over offsets (a, b) = c - c', stored modulo (2Ax, 2Ay): dist and its unit direction
+    P = (2 * Ax, 2 * Ay)
+    a = np.fft.fftfreq(P[0], 1.0 / P[0])[:, None] * cell_w
+    b = np.fft.fftfreq(P[1], 1.0 / P[1])[None, :] * cell_h
+    dist = np.hypot(a, b)
+    safe = np.where(dist > 0, dist, 1.0)
+    ux, uy = np.where(dist > 0, a / safe, 0.0), np.where(dist > 0, b / safe, 0.0)
+
+    n_hat = np.fft.rfft2(n, s=P)
+    D = _fft_correlate(n_hat, dist, n.shape)
+    D += off_x * _fft_correlate(n_hat, ux, n.shape) + off_y * _fft_correlate(n_hat, uy, n.shape)
+    D -= _fft_correlate(np.fft.rfft2(n * off_x, s=P), ux, n.shape)
+    D -= _fft_correlate(np.fft.rfft2(n * off_y, s=P), uy, n.shape)
+
+    # Exact near field: swap the linearized terms for the true distances
+    for da in range(-near, near + 1):
+        for db in range(-near, near + 1):
+            if (da == 0 and db == 0) or abs(da) >= Ax or abs(db) >= Ay:
+                continue
+            tx, sx = slice(max(da, 0), Ax + min(da, 0)), slice(max(-da, 0), Ax - max(da, 0))
+            ty, sy = slice(max(db, 0), Ay + min(db, 0)), slice(max(-db, 0), Ay - max(db, 0))
+            ex = da * cell_w + off_x[tx, ty] - off_x[sx, sy]
+            ey = db * cell_h + off_y[tx, ty] - off_y[sx, sy]
+            d0 = float(np.hypot(da * cell_w, db * cell_h))
+            approx = d0 + (da * cell_w * (ex - da * cell_w) + db * cell_h * (ey - db * cell_h)) / d0
+            D[tx, ty] += n[sx, sy] * (np.hypot(ex, ey) - approx)
+
+    return (N - 1.0) - D / maxD
+
+
+class GridSimilarity(_SimilarityLookup):
+    """
+    Implicit place-level S^S of the grid methods: place row -> cell position
+    (cell_of) plus a dense |CL| x |CL| cell similarity matrix. Two places in
+    the same cell have similarity 1.0. Memory is O(K + |CL|^2) instead of K^2.
+    """
+
+    def __init__(self, index: Dict[int, int], cell_of: np.ndarray, cell_matrix: np.ndarray):
+        self.index = index
+        self.cell_of = cell_of
+        self.cell_matrix = cell_matrix
+
+    def _pair(self, i: int, j: int) -> float:
+        ci, cj = self.cell_of[i], self.cell_of[j]
+        return 1.0 if ci == cj else float(self.cell_matrix[ci, cj])
+
+    def row(self, i: int) -> np.ndarray:
+        ci = self.cell_of[i]
+        row = self.cell_matrix[ci][self.cell_of].astype(np.float64)
+        row[self.cell_of == ci] = 1.0
+        row[i] = 0.0
+        return row
+
+
+def grid_similarity(CL, S: List[Place], cell_matrix: np.ndarray, pr: np.ndarray) -> Tuple[IndexedScores, GridSimilarity]:
+    """
+    Place-level psS/sS of a grid precompute: psS(p) = pr(cell of p) and
+    sS(p, q) = cell similarity of their cells, both looked up through cell_of.
+    cell_matrix and pr are in CL order.
+    """
+    index = id_index(S)
+    cell_of = np.full(len(S), -1, dtype=np.int64)
+    for c, cell in enumerate(CL):
+        rows = getattr(cell, "rows", None)
+        if rows is not None and cell.grid.places is S:
+            cell_of[rows] = c  # CSR cell view of a grid over S: rows are positions in S
+            continue
+        for p in cell.places:
+            cell_of[index[p.id]] = c
+    return IndexedScores(index, np.asarray(pr, dtype=np.float64)[cell_of]), GridSimilarity(index, cell_of, cell_matrix)
+
+
+def exact_pss(coords: np.ndarray, maxD: float) -> np.ndarray:
+    """
+    Exact psS vector, one tile of rows at a time; the matrix is never stored.
+    Uses psS(p) = (K - 1) - sum_q d(p, q) / maxD, so only distances are summed.
+    """
+    xs, ys = _columns(coords)
+    K = len(xs)
+    dist_sum = np.empty(K, dtype=np.float64)
+    step = _tile_rows(K)
+    for i0 in range(0, K, step):
+        i1 = min(i0 + step, K)
+        dist_sum[i0:i1] = _block_distance(xs, ys, i0, i1).sum(axis=1)
+    if maxD <= 0:
+        return np.full(K, K - 1.0)
+    return (K - 1) - dist_sum / maxD
+
+
+#######################################################################################################################
+# Multi-core psS: the upper triangle of the pair space split into square tiles over a process pool.
+# Coordinates live in one shared-memory block that every worker maps; only per-tile row/column
+# distance sums travel back to the parent, which reduces them into the psS vector.
+_shared_xs = None
+_shared_ys = None
+_shared_block = None
+
+
+def resolve_workers(workers: int = None) -> int:
+    """Number of precompute processes: None -> cfg.PRECOMPUTE_WORKERS, <= 0 -> all cores."""
+    if workers is None:
+        import config as cfg
+        workers = getattr(cfg, "PRECOMPUTE_WORKERS", 1)
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+def _tile_edge() -> int:
+    """Edge of a square (B x B) tile holding at most TILE_ELEMENTS distances."""
+    return max(1, int(TILE_ELEMENTS ** 0.5))
+
+
+def _attach_coords(name: str, K: int):
+    global _shared_xs, _shared_ys, _shared_block
+    _shared_block = shared_memory.SharedMemory(name=name)
+    xy = np.ndarray((2, K), dtype=np.float64, buffer=_shared_block.buf)
+    _shared_xs, _shared_ys = xy[0], xy[1]
+
+
+def _tile_distance_sums(tile: Tuple[int, int, int, int]) -> Tuple[int, np.ndarray, int, np.ndarray]:
+    """Distances of rows i0:i1 against columns j0:j1 (j0 >= i0), summed both ways."""
+    i0, i1, j0, j1 = tile
+    xs, ys = _shared_xs, _shared_ys
+    d = np.subtract.outer(xs[i0:i1], xs[j0:j1])
+    dy = np.subtract.outer(ys[i0:i1], ys[j0:j1])
+    np.multiply(d, d, out=d)
+    np.multiply(dy, dy, out=dy)
+    d += dy
+    np.sqrt(d, out=d)
+    rows = d.sum(axis=1)
+    # a diagonal tile already counts every pair in its row sums
+    cols = d.sum(axis=0) if j0 != i0 else None
+    return i0, rows, j0, cols
+
+
+def parallel_pss(coords: np.ndarray, maxD: float, workers: int) -> np.ndarray:
+    """
+    Exact psS with the pair space tiled over `workers` processes. Each unordered
+    pair is evaluated once (upper-triangular tiles); same result as exact_pss.
+    Tile sums are reduced in tile order (imap), so the floating-point result does
+    not depend on which worker finishes first.
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    K = len(coords)
+    if maxD <= 0:
+        return np.full(K, K - 1.0)
+    B = _tile_edge()
+    tiles = [(i0, min(i0 + B, K), j0, min(j0 + B, K)) for i0 in range(0, K, B) for j0 in range(i0, K, B)]
+
+    block = shared_memory.SharedMemory(create=True, size=max(2 * K * 8, 1))
+    try:
+        np.ndarray((2, K), dtype=np.float64, buffer=block.buf)[:] = coords.T
+        dist_sum = np.zeros(K, dtype=np.float64)
+        with Pool(processes=min(workers, len(tiles)), initializer=_attach_coords, initargs=(block.name, K)) as pool:
+            chunk = max(1, len(tiles) // (4 * workers))
+            for i0, rows, j0, cols in pool.imap(_tile_distance_sums, tiles, chunksize=chunk):
+                dist_sum[i0:i0 + len(rows)] += rows
+                if cols is not None:
+                    dist_sum[j0:j0 + len(cols)] += cols
+    finally:
+        block.close()
+        block.unlink()
+    return (K - 1) - dist_sum / maxD
+
+
+def exact_pss_of(coords: np.ndarray, query: np.ndarray, maxD: float) -> np.ndarray:
+    """
+    Exact psS (w.r.t. all of coords) of the `query` points only: O(len(query) * K)
+    distances, tiled like exact_pss. Query points are assumed to belong to coords.
+    """
+    xs, ys = _columns(coords)
+    qx, qy = _columns(np.asarray(query, dtype=np.float64).reshape(-1, 2))
+    K = len(xs)
+    dist_sum = np.empty(len(qx), dtype=np.float64)
+    step = _tile_rows(K)
+    for i0 in range(0, len(qx), step):
+        i1 = min(i0 + step, len(qx))
+        dist_sum[i0:i1] = _cross_distance(qx[i0:i1], qy[i0:i1], xs, ys).sum(axis=1)
+    if maxD <= 0:
+        return np.full(len(qx), K - 1.0)
+    return (K - 1) - dist_sum / maxD
+
+
+def exact_similarity(S: List[Place], maxD: float, dtype=np.float64) -> Tuple[IndexedScores, PairwiseSimilarity]:
+    """
+    Exact psS and pairwise similarity for S, computed in row tiles.
+    psS(p) = sum over q != p of (1 - d(p, q) / maxD).
+    """
+    coords = coords_array(S)
+    xs, ys = _columns(coords)
+    index = id_index(S)
+    K = len(coords)
+    matrix = np.empty((K, K), dtype=dtype)
+    step = _tile_rows(K)
+    for i0 in range(0, K, step):
+        i1 = min(i0 + step, K)
+        matrix[i0:i1] = _block_similarity(xs, ys, i0, i1, maxD)
+    np.fill_diagonal(matrix, 0.0)
+    psS = matrix.sum(axis=1, dtype=np.float64)
+    return IndexedScores(index, psS), PairwiseSimilarity(index, matrix)
+
+
+def lazy_similarity(S: List[Place], maxD: float, workers: int = 1) -> Tuple[IndexedScores, LazySimilarity]:
+    """
+    Exact psS plus a matrix-free S^S: O(K) memory, rows computed on demand.
+    workers > 1 spreads the psS pass over a process pool (parallel_pss).
+    """
+    coords = coords_array(S)
+    index = id_index(S)
+    pss = parallel_pss(coords, maxD, workers) if workers > 1 and len(coords) > 1 else exact_pss(coords, maxD)
+    return IndexedScores(index, pss), LazySimilarity(index, coords, maxD)
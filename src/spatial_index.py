@@ -0,0 +1,190 @@
+# spatial_index.py — static uniform-grid index over a point universe (CSR layout)
+#
+#   order       int64 (N,)          point rows sorted by cell (stable: file order inside a cell)
+#   cell_start  int64 (nx*ny + 1,)  points of cell c are order[cell_start[c]:cell_start[c+1]]
+#   meta.json   {"format", "bounds": [x0, y0, x1, y1], "nx", "ny", "N"}
+#
+# Cell c = cy * nx + cx over the tight bounds of the points; about POINTS_PER_CELL
+# points per cell on average. Saved next to a universe snapshot and opened mmap.
+
+import json
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+INDEX_FORMAT = 1
+POINTS_PER_CELL = 64
+
+
+class GridIndex:
+    def __init__(self, bounds: Tuple[float, float, float, float], nx: int, ny: int,
+                 order: np.ndarray, cell_start: np.ndarray):
+        self.x0, self.y0, self.x1, self.y1 = (float(v) for v in bounds)
+        self.nx, self.ny = int(nx), int(ny)
+        self.order = order
+        self.cell_start = cell_start
+        self.cell_w = max(self.x1 - self.x0, 1e-12) / self.nx
+        self.cell_h = max(self.y1 - self.y0, 1e-12) / self.ny
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    # ---------- build ----------
+    @staticmethod
+    def _shape(n: int, width: float, height: float, per_cell: int) -> Tuple[int, int]:
+        cells = max(1, n // max(1, per_cell))
+        aspect = max(width, 1e-12) / max(height, 1e-12)
+        nx = int(np.clip(round(np.sqrt(cells * aspect)), 1, cells))
+        ny = max(1, cells // nx)
+        return nx, ny
+
+    @classmethod
+    def build(cls, xs: np.ndarray, ys: np.ndarray, per_cell: int = POINTS_PER_CELL) -> "GridIndex":
+        xs, ys = np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64)
+        if len(xs) == 0:
+            return cls((0.0, 0.0, 0.0, 0.0), 1, 1, np.empty(0, dtype=np.int64), np.zeros(2, dtype=np.int64))
+        bounds = (float(xs.min()), float(ys.min()), float(xs.max()), float(ys.max()))
+        nx, ny = cls._shape(len(xs), bounds[2] - bounds[0], bounds[3] - bounds[1], per_cell)
+        index = cls(bounds, nx, ny, np.empty(0, dtype=np.int64), np.zeros(nx * ny + 1, dtype=np.int64))
+        cells = index.cell_ids(xs, ys)
+        index.order = np.argsort(cells, kind="stable").astype(np.int64)
+        np.cumsum(np.bincount(cells, minlength=nx * ny), out=index.cell_start[1:])
+        return index
+
+    # ---------- cells ----------
+    def cell_xy(self, xs, ys) -> Tuple[np.ndarray, np.ndarray]:
+        """Cell column/row of coordinates (clamped to the grid)."""
+        cx = np.clip(((np.asarray(xs, dtype=np.float64) - self.x0) / self.cell_w).astype(np.int64), 0, self.nx - 1)
+        cy = np.clip(((np.asarray(ys, dtype=np.float64) - self.y0) / self.cell_h).astype(np.int64), 0, self.ny - 1)
+        return cx, cy
+
+    def cell_ids(self, xs, ys) -> np.ndarray:
+        cx, cy = self.cell_xy(xs, ys)
+        return cy * self.nx + cx
+
+    def cell_points(self, c: int) -> np.ndarray:
+        return self.order[self.cell_start[c]:self.cell_start[c + 1]]
+
+    # ---------- queries ----------
+    def _candidates(self, xs: np.ndarray, ys: np.ndarray, boxes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, box of each row) inside the (B, 4) boxes, unordered."""
+        B = len(boxes)
+        xmin, ymin, xmax, ymax = boxes.T
+        live = (xmin <= xmax) & (ymin <= ymax) & (xmin <= self.x1) & (xmax >= self.x0) \
+            & (ymin <= self.y1) & (ymax >= self.y0)
+        if len(self) == 0 or not live.any():
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        cx0, cy0 = self.cell_xy(xmin, ymin)
+        cx1, cy1 = self.cell_xy(xmax, ymax)
+
+        # one run per (box, grid row): cells cx0..cx1 of that row
+        n_rows = np.where(live, cy1 - cy0 + 1, 0)
+        run_box = np.repeat(np.arange(B), n_rows)
+        run_row = cy0[run_box] + np.arange(len(run_box)) - np.repeat(np.cumsum(n_rows) - n_rows, n_rows)
+        first = run_row * self.nx
+        start = np.asarray(self.cell_start[first + cx0[run_box]])
+        lens = np.asarray(self.cell_start[first + cx1[run_box] + 1]) - start
+
+        # gather all runs at once, then the exact box test on the candidates
+        pos = np.arange(int(lens.sum())) + np.repeat(start - (np.cumsum(lens) - lens), lens)
+        cand = np.asarray(self.order[pos])
+        box = np.repeat(run_box, lens)
+        x, y = xs[cand], ys[cand]
+        keep = (x >= xmin[box]) & (x <= xmax[box]) & (y >= ymin[box]) & (y <= ymax[box])
+        return cand[keep], box[keep]
+
+    def query_bboxes(self, xs: np.ndarray, ys: np.ndarray, boxes) -> List[np.ndarray]:
+        """
+        Batched box query: for each (xmin, ymin, xmax, ymax) the rows with
+        xmin <= x <= xmax and ymin <= y <= ymax, ascending (file order).
+
+        Every box covers one contiguous run of `order` per grid row it spans;
+        the runs of all boxes are gathered and filtered in one vectorized pass,
+        so the cost is the candidates in the covered cells, not N per box.
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        cand, box = self._candidates(xs, ys, boxes)
+        srt = np.lexsort((cand, box))
+        return np.split(cand[srt], np.cumsum(np.bincount(box, minlength=len(boxes)))[:-1])
+
+    def query_bbox(self, xs: np.ndarray, ys: np.ndarray, xmin: float, ymin: float, xmax: float, ymax: float) -> np.ndarray:
+        """Rows with xmin <= x <= xmax and ymin <= y <= ymax, ascending (file order)."""
+        return self.query_bboxes(xs, ys, [(xmin, ymin, xmax, ymax)])[0]
+
+    def knn_chebyshev(self, xs: np.ndarray, ys: np.ndarray, ids: np.ndarray, seeds, K: int) -> List[np.ndarray]:
+        """
+        For each (x, y) seed the rows of its K nearest points in L-inf distance,
+        ordered by (distance, id) — the exact prefix of a full lexsort ranking.
+
+        A square of half-side r around the seed is read from the index (r from the
+        local cell density, doubled until the K-th distance falls inside it), so
+        only the points near the seed are ranked.
+        """
+        seeds = np.asarray(seeds, dtype=np.float64).reshape(-1, 2)
+        K = min(int(K), len(self))
+        cell_counts = np.diff(self.cell_start)
+        out = []
+        for cx, cy in seeds:
+            if K <= 0:
+                out.append(np.empty(0, dtype=np.int64))
+                continue
+            outside = max(self.x0 - cx, cx - self.x1, self.y0 - cy, cy - self.y1, 0.0)
+            local = max(int(cell_counts[self.cell_ids([cx], [cy])[0]]), 1)
+            r = outside + 0.5 * np.sqrt(K / local * self.cell_w * self.cell_h)
+            while True:
+                # margin: the box test and |x - cx| round differently at the edge
+                m = r + 1e-9 * (abs(cx) + abs(cy) + r) + 1e-300
+                rows, _ = self._candidates(xs, ys, np.array([[cx - m, cy - m, cx + m, cy + m]]))
+                covers_all = cx - r <= self.x0 and cy - r <= self.y0 and cx + r >= self.x1 and cy + r >= self.y1
+                if len(rows) >= K or covers_all:
+                    ranked = chebyshev_rank(xs, ys, ids, rows, cx, cy, K)
+                    if covers_all or max(abs(xs[ranked[-1]] - cx), abs(ys[ranked[-1]] - cy)) <= r:
+                        out.append(ranked)
+                        break
+                r *= 2.0
+        return out
+
+    # ---------- persistence ----------
+    def save(self, path: str) -> str:
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "order.npy"), self.order)
+        np.save(os.path.join(path, "cell_start.npy"), self.cell_start)
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"format": INDEX_FORMAT, "bounds": [self.x0, self.y0, self.x1, self.y1],
+                       "nx": self.nx, "ny": self.ny, "N": len(self.order)}, f)
+        return path
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> Optional["GridIndex"]:
+        """The saved index, or None if missing or written by another format version."""
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get("format") != INDEX_FORMAT:
+            return None
+        mode = "r" if mmap else None
+        order = np.load(os.path.join(path, "order.npy"), mmap_mode=mode)
+        cell_start = np.load(os.path.join(path, "cell_start.npy"), mmap_mode=mode)
+        return cls(meta["bounds"], meta["nx"], meta["ny"], order, cell_start)
+
+
+def chebyshev_rank(xs: np.ndarray, ys: np.ndarray, ids: np.ndarray, rows: np.ndarray, cx: float, cy: float,
+                   K: Optional[int] = None) -> np.ndarray:
+    """
+    `rows` ordered by (L-inf distance to (cx, cy), id), first K only. With K the
+    K-th distance is found by partition and only the rows up to it (ties kept)
+    are sorted, so the cost is O(n + K log K) instead of a full sort.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    d = np.maximum(np.abs(xs[rows] - cx), np.abs(ys[rows] - cy))
+    if K is not None and K < len(rows):
+        if K <= 0:
+            return rows[:0]
+        kth = np.partition(d, K - 1)[K - 1]
+        near = d <= kth
+        rows, d = rows[near], d[near]
+    order = np.lexsort((ids[rows], d))
+    return rows[order[:K]] if K is not None else rows[order]
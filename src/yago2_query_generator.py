@@ -3,13 +3,18 @@
 #   - pid.txt                 (id lon lat OR lon lat OR lat lon — auto-detected)
 #   - yago_popular.txt        (seeds: Node,Node id,lat,lon)  OR old bbox lines
 # Output:
-#   - yago_square/yago_<Node>_K{100|200|1000|2000}.pkl
+#   - yago_square/yago_<Node>.nested/   (NESTED_ROWS ranked places + K -> offset table,
+#                                       any K <= NESTED_ROWS loadable; see columnar_store.py)
+#   - or, with LEGACY_PICKLES, yago_square/yago_<Node>_K{100|200|1000|2000}.pkl
 from __future__ import annotations
 import os, re, pickle
 from typing import List, Tuple, Dict
 import numpy as np
 # ADD near the top with the other imports
-from models import Place
+from models import Place, PlaceSet, coords_array, ids_array
+from columnar_store import NESTED_SUFFIX, save_nested
+from pid_ingest import ingest_pid, open_universe
+from spatial_index import chebyshev_rank
 
 
 HERE = os.path.dirname(os.path.abspath(__file__))
@@ -17,53 +22,21 @@ PID_FILE = os.path.join(HERE, "pid.txt")
 POPULAR_FILE = os.path.join(HERE, "yago_popular.txt")
 OUT_DIR = os.path.join(HERE, "yago_square")
 K_TARGETS = [5000]
+NESTED_ROWS = 100_000      # ranked places kept per seed (largest servable K)
+LEGACY_PICKLES = False
+USE_SNAPSHOT = True        # parse pid.txt once into pid.txt.snap/ (pid_ingest.py) and reuse it
 
 FLOAT_RE = re.compile(r"[-+]?\d*\.?\d+(?:[eE][-+]?\d+)?")
 
 # OLD: returns List[Tuple[int,float,float]]
 # def read_pid_points(...)
 
-# NEW: return List[Place] with coords = (lon, lat)
-def read_pid_points(path: str) -> List[Place]:
-    raw = []
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            s = line.strip()
-            if not s or s.startswith("#"):
-                continue
-            nums = [float(x) for x in FLOAT_RE.findall(s.replace(",", " "))]
-            if len(nums) >= 3:
-                raw.append((nums[0], nums[1], nums[2]))     # maybe_id, a, b
-            elif len(nums) == 2:
-                raw.append((float("nan"), nums[0], nums[1]))# no id -> assign later
-
-    if not raw:
-        raise ValueError(f"No numeric rows in {path}")
-
-    a = np.array([r[1] for r in raw], dtype=float)
-    b = np.array([r[2] for r in raw], dtype=float)
-
-    def score(lat, lon):
-        valid = ((-90 <= lat) & (lat <= 90) & (-180 <= lon) & (lon <= 180)).sum()
-        return valid + 0.001 * ((lon.max()-lon.min()) - (lat.max()-lat.min()))
-
-    # detect orientation
-    if score(a, b) >= score(b, a):
-        lat, lon = a, b
-    else:
-        lat, lon = b, a
-
-    ids = np.array([int(r[0]) if not np.isnan(r[0]) else -1 for r in raw], dtype=int)
-    need_seq = ids < 0
-    if need_seq.any():
-        ids[need_seq] = np.arange(1, need_seq.sum() + 1, dtype=int)
-
-    lon = np.clip(lon, -180, 180)
-    lat = np.clip(lat, -90, 90)
-
-    # RETURN Place objects with coords = (x=lon, y=lat)
-    places: List[Place] = [Place(int(i), (float(lo), float(la))) for i, lo, la in zip(ids, lon, lat)]
-    return places
+# NEW: return places with coords = (lon, lat)
+def read_pid_points(path: str) -> PlaceSet:
+    # chunked, vectorized parse (pid_ingest.py); orientation auto-detected, ids
+    # numbered 1.. where missing, lon/lat clipped to their ranges
+    ids, lon, lat = ingest_pid(path, orient=True)
+    return PlaceSet(ids, lon, lat)
 
 def load_yago_seeds(path: str) -> List[Tuple[str, int, float, float]]:
     """
@@ -117,19 +90,34 @@ def load_yago_seeds(path: str) -> List[Tuple[str, int, float, float]]:
 def build_nested_square_queries(places: List[Place],
                                 center_lon: float, center_lat: float,
                                 Ks: List[int]) -> Dict[int, List[Place]]:
-    ids  = np.asarray([p.id for p in places], dtype=int)
-    lons = np.asarray([p.coords[0] for p in places], dtype=float)  # x
-    lats = np.asarray([p.coords[1] for p in places], dtype=float)  # y
-
-    d_inf = np.maximum(np.abs(lons - center_lon), np.abs(lats - center_lat))
-    order = np.lexsort((ids, d_inf))  # by L∞ then id for stability
-    ranked = [places[i] for i in order]
+    ranked = rank_square(places, center_lon, center_lat, limit=max(int(k) for k in Ks))
 
     out: Dict[int, List[Place]] = {}
     for K in sorted(set(int(k) for k in Ks)):
         out[K] = ranked[:min(K, len(ranked))]
     return out
 
+def rank_square(places: List[Place], center_lon: float, center_lat: float, limit: int = None) -> List[Place]:
+    """Places in nesting order (L∞ to the seed, then id); only the first `limit` if given."""
+    ids  = ids_array(places)
+    pts  = coords_array(places)
+    lons, lats = pts[:, 0], pts[:, 1]  # x, y
+
+    # by L∞ then id for stability; with a limit only the first `limit` are sorted
+    order = chebyshev_rank(lons, lats, ids, np.arange(len(ids)), center_lon, center_lat, limit)
+    if isinstance(places, PlaceSet):
+        return places.take(order)
+    return [places[i] for i in order]
+
+def save_nested_query(ranked: List[Place], out_dir: str, name: str, Ks: List[int]) -> str:
+    """One nested file per seed instead of one pickle per K."""
+    os.makedirs(out_dir, exist_ok=True)
+    clean = name[len("yago_"):] if name.startswith("yago_") else name
+    path = os.path.join(out_dir, f"yago_{_norm(clean)}{NESTED_SUFFIX}")
+    save_nested(ranked, path, Ks)
+    print(f"[OK] {path}  (# {len(ranked)}, K targets {sorted(set(Ks))})")
+    return path
+
 def save_queries(nested, out_dir: str, name: str):
     os.makedirs(out_dir, exist_ok=True)
     prev = None
@@ -137,13 +125,14 @@ def save_queries(nested, out_dir: str, name: str):
     if clean.startswith("yago_"):   # prevent double prefix
         clean = clean[len("yago_"):]
     for K in sorted(nested.keys()):
-        cur_ids = {p.id for p in nested[K]}
+        cur_ids = set(ids_array(nested[K]).tolist())
         if prev is not None and not prev.issubset(cur_ids):
             raise AssertionError(f"[NEST] violation at K={K} for {name}")
         prev = cur_ids
         path = os.path.join(out_dir, f"yago_{_norm(clean)}_K{K}.pkl")
+        data = nested[K].to_places() if isinstance(nested[K], PlaceSet) else nested[K]
         with open(path, "wb") as f:
-            pickle.dump(nested[K], f)  # <-- now lists of Place
+            pickle.dump(data, f)  # <-- now lists of Place
         print(f"[OK] {path}  (# {len(nested[K])})")
 
 def _norm(s: str) -> str:
@@ -152,17 +141,33 @@ def _norm(s: str) -> str:
 # ------------------- main ----------------------
 def main():
     # 1) read the universe of YAGO places
-    universe = read_pid_points(PID_FILE)  # [(id, lon, lat)]
+    if USE_SNAPSHOT:
+        snapshot = open_universe(PID_FILE, orient=True)
+        universe = snapshot.places  # mmap (id, lon, lat) columns
+    else:
+        universe = read_pid_points(PID_FILE)  # [(id, lon, lat)]
     print(f"[INFO] Loaded {len(universe):,} points from pid.txt")
 
     # 2) read seeds (starting points)
     seeds = load_yago_seeds(POPULAR_FILE)  # [(name, node_id, lat, lon)]
     print(f"[INFO] Loaded {len(seeds)} seeds from yago_popular.txt")
 
-    # 3) per seed → nearest (L∞) K places; save nested
-    for name, node_id, lat, lon in seeds:
-        nested = build_nested_square_queries(universe, center_lon=lon, center_lat=lat, Ks=K_TARGETS)
-        save_queries(nested, OUT_DIR, name)
+    # 3) per seed → nearest (L∞) places, ranked by (distance, id)
+    limit = max(K_TARGETS) if LEGACY_PICKLES else max(NESTED_ROWS, max(K_TARGETS))
+    if USE_SNAPSHOT:
+        # one batched kNN over the snapshot's grid index, seeds spread over cores
+        rows = snapshot.knn_chebyshev([(lon, lat) for _, _, lat, lon in seeds], limit)
+        ranked_per_seed = [universe.take(r) for r in rows]
+    else:
+        ranked_per_seed = [rank_square(universe, lon, lat, limit=limit) for _, _, lat, lon in seeds]
+
+    # 4) save nested
+    for (name, node_id, lat, lon), ranked in zip(seeds, ranked_per_seed):
+        if LEGACY_PICKLES:
+            nested = {K: ranked[:min(K, len(ranked))] for K in sorted(set(K_TARGETS))}
+            save_queries(nested, OUT_DIR, name)
+        else:
+            save_nested_query(ranked, OUT_DIR, name, K_TARGETS)
 
     print("[DONE] All queries built.")
 
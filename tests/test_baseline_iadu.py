@@ -0,0 +1,57 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+import numpy as np
+import pytest
+import similarity
+from models import Place
+from baseline_iadu import base_precompute, baseline_iadu_algorithm
+
+
+def _places(K):
+    S = [Place(i, (float(i), float(i * i % 7))) for i in range(K)]
+    for p in S:
+        p.rF = 0.1 * p.id
+    return S
+
+
+def test_k_larger_than_K_raises():
+    S = _places(5)
+    psS, sS, _ = base_precompute(S)
+    with pytest.raises(ValueError):
+        baseline_iadu_algorithm(S, len(S), 7, 1.0, psS, sS)
+
+
+def test_k_equal_to_K_picks_every_place_once():
+    S = _places(5)
+    psS, sS, _ = base_precompute(S)
+    R, _ = baseline_iadu_algorithm(S, len(S), 5, 1.0, psS, sS)
+    assert sorted(p.id for p in R) == [0, 1, 2, 3, 4]
+
+
+def test_workers_with_materialize_warns_and_matches_serial():
+    S = _places(40)
+    psS, sS, _ = base_precompute(S)
+    with pytest.warns(UserWarning, match="materialize=True"):
+        psS2, sS2, _ = base_precompute(S, materialize=True, workers=2)
+    np.testing.assert_array_equal(psS2.values, psS.values)
+    np.testing.assert_array_equal(sS2.matrix, sS.matrix)
+
+
+def test_parallel_pss_is_reproducible(monkeypatch):
+    monkeypatch.setattr(similarity, "TILE_ELEMENTS", 32 * 32)     # many tiles per worker
+    coords = np.random.default_rng(0).normal(size=(300, 2)) * [1e3, 1e-2]
+    maxD = similarity.diameter(coords)
+    first = similarity.parallel_pss(coords, maxD, workers=3)
+    np.testing.assert_allclose(first, similarity.exact_pss(coords, maxD), rtol=1e-12)
+    for _ in range(2):
+        np.testing.assert_array_equal(similarity.parallel_pss(coords, maxD, workers=3), first)
+
+
+def test_lazy_precompute_with_workers_matches_dense():
+    S = _places(60)
+    psS, sS, _ = base_precompute(S)
+    psS2, sS2, _ = base_precompute(S, materialize=False, workers=2)
+    np.testing.assert_allclose(psS2.values, psS.values, rtol=1e-12)
+    assert sS2[(3, 5)] == pytest.approx(sS[(3, 5)])
@@ -0,0 +1,110 @@
+import os
+import pickle
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+import numpy as np
+import pytest
+from columnar_store import (columnar_path, convert_pickles, load_columnar, load_nested, load_places, nested_rows,
+                            save_columnar, save_nested, serves_nested, serves_pickle)
+from models import Place, PlaceSet
+from yago2_query_generator import rank_square
+
+
+def _places(K, seed=0):
+    rng = np.random.default_rng(seed)
+    return [Place(int(i), (float(x), float(y)), rF=float(r))
+            for i, (x, y, r) in zip(rng.permutation(K) + 10, rng.uniform(-5, 5, (K, 3)))]
+
+
+def _assert_same(loaded, places):
+    assert len(loaded) == len(places)
+    np.testing.assert_array_equal(loaded.ids, [p.id for p in places])
+    np.testing.assert_array_equal(loaded.xs, [p.coords[0] for p in places])
+    np.testing.assert_array_equal(loaded.ys, [p.coords[1] for p in places])
+    np.testing.assert_array_equal(loaded.rF, [p.rF for p in places])
+
+
+def _write_pickle(path, places):
+    with open(path, "wb") as f:
+        pickle.dump(places, f)
+
+
+def test_columnar_round_trip(tmp_path):
+    places = _places(50)
+    path = save_columnar(places, str(tmp_path / "flower_K50.cols"))
+    loaded = load_columnar(path)
+    assert isinstance(loaded, PlaceSet)
+    assert not loaded.xs.flags.writeable                  # read-only map, not a copy
+    _assert_same(loaded, places)
+    _assert_same(load_columnar(path, mmap=False), places)
+    _assert_same(load_places(path), places)
+    assert [p.id for p in loaded] == [p.id for p in places]
+
+
+def test_converted_pickle_is_served_by_its_columns(tmp_path):
+    places = _places(40, seed=1)
+    pkl = str(tmp_path / "bubble_K40.pkl")
+    _write_pickle(pkl, places)
+    (tmp_path / "notes_K40.txt").write_text("not a dataset")
+    written = convert_pickles([str(tmp_path)])
+    assert written == [columnar_path(pkl)]
+    assert serves_pickle(columnar_path(pkl), pkl)
+    assert isinstance(load_places(pkl), PlaceSet)
+    _assert_same(load_places(pkl), places)
+    assert convert_pickles([str(tmp_path)]) == []          # up to date: nothing rewritten
+
+
+def test_stale_columns_are_ignored_and_reconverted(tmp_path):
+    pkl = str(tmp_path / "s_curve_K30.pkl")
+    _write_pickle(pkl, _places(30, seed=2))
+    convert_pickles([str(tmp_path)])
+
+    regenerated = _places(30, seed=3)
+    _write_pickle(pkl, regenerated)
+    st = os.stat(pkl)
+    os.utime(pkl, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))   # same size, newer pickle
+    assert not serves_pickle(columnar_path(pkl), pkl)
+    loaded = load_places(pkl)
+    assert isinstance(loaded, list)
+    assert [p.id for p in loaded] == [p.id for p in regenerated]
+
+    assert convert_pickles([str(tmp_path)]) == [columnar_path(pkl)]
+    _assert_same(load_places(pkl), regenerated)
+
+
+def test_columns_without_their_pickle_are_served(tmp_path):
+    places = _places(20, seed=4)
+    pkl = str(tmp_path / "flower_K20.pkl")
+    _write_pickle(pkl, places)
+    convert_pickles([str(tmp_path)], remove_pickles=True)
+    assert not os.path.exists(pkl)
+    _assert_same(load_places(pkl), places)
+
+
+def _per_K_queries(places, cx, cy, Ks):
+    # the per-K pickles the generators wrote before the nested files
+    ids = np.array([p.id for p in places])
+    d = np.array([max(abs(p.coords[0] - cx), abs(p.coords[1] - cy)) for p in places])
+    ranked = [places[i] for i in np.lexsort((ids, d))]
+    return {K: ranked[:min(K, len(ranked))] for K in Ks}
+
+
+def test_nested_region_serves_every_K_query(tmp_path):
+    places = _places(120, seed=5)
+    for p in places[::3]:
+        p.coords = np.round(p.coords)                        # distance ties, broken by id
+    Ks = [10, 50, 100, 200]
+    path = save_nested(rank_square(places, 0.25, -0.5), str(tmp_path / "yago_Seed.nested"), Ks)
+    assert nested_rows(path) == len(places)
+
+    expected = _per_K_queries(places, 0.25, -0.5, Ks)
+    for K in Ks:                                             # K=200 was saved short, like its pickle
+        assert serves_nested(path, K)
+        _assert_same(load_nested(path, K), expected[K])
+
+    _assert_same(load_nested(path, 37), _per_K_queries(places, 0.25, -0.5, [37])[37])
+    assert not serves_nested(path, 121)
+    with pytest.raises(ValueError):
+        load_nested(path, 121)
+    assert not serves_nested(str(tmp_path / "missing.nested"), 10)
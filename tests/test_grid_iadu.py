@@ -0,0 +1,52 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+import numpy as np
+import pytest
+from grid_iadu import GridPyramid
+from models import MortonOrder, Place, SquareGrid
+
+
+def _places(K, width=1.0, height=1.0, seed=0):
+    rng = np.random.default_rng(seed)
+    pts = np.vstack([rng.normal([0.3, 0.6], 0.05, (K // 2, 2)), rng.uniform(0, 1, (K - K // 2, 2))])
+    pts = np.clip(pts, 0, 1)
+    pts[:2] = [[0, 0], [1, 1]]                       # bounding box exactly [0, width] x [0, height]
+    return [Place(i, (float(x) * width, float(y) * height)) for i, (x, y) in enumerate(pts)]
+
+
+def _cells(grid):
+    return [(c.id, sorted(p.id for p in c.places), c.compute_center()) for c in grid.get_full_cells()]
+
+
+def _assert_same_cells(a, b, ordered=True):
+    if not ordered:
+        a, b = sorted(a, key=lambda c: c[0]), sorted(b, key=lambda c: c[0])
+    assert [c[0] for c in a] == [c[0] for c in b]
+    assert [c[1] for c in a] == [c[1] for c in b]
+    np.testing.assert_allclose([c[2] for c in a], [c[2] for c in b], rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize("width,height", [(1.0, 1.0), (4.0, 1.0)])
+def test_pyramid_levels_equal_morton_grids(width, height):
+    S = _places(3000, width, height)
+    pyramid = GridPyramid(S, max_level=4)
+    morton = MortonOrder(S)
+    for level in range(6):                           # level 5 is added on demand
+        G = 4 ** level
+        _assert_same_cells(_cells(pyramid.grid(G)), _cells(morton.grid(G)))
+
+
+@pytest.mark.parametrize("G", [1, 4, 16, 64, 256, 1024])
+def test_morton_cells_equal_square_cells_on_a_square_box(G):
+    S = _places(3000)
+    square = SquareGrid(S, G)
+    assert square.dims() == GridPyramid(S).grid(G).dims()
+    _assert_same_cells(_cells(GridPyramid(S).grid(G)), _cells(square), ordered=False)
+
+
+def test_morton_cells_differ_from_square_cells_on_a_wide_box():
+    S = _places(3000, width=4.0)
+    assert SquareGrid(S, 256).dims() == (32, 8)
+    assert MortonOrder(S).grid(256).dims() == (16, 16)
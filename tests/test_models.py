@@ -0,0 +1,103 @@
+import math
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+import numpy as np
+import pytest
+from models import MORTON_BITS, MortonOrder, Place, PlaceSet, QuadTreeGrid, SquareGrid
+
+
+def _reference_cells(places, G):
+    """The per-place SquareGrid assignment before the CSR layout: {(gx, gy): [place ids]} in insertion order."""
+    xs = [p.coords[0] for p in places]
+    ys = [p.coords[1] for p in places]
+    x_min, y_min = min(xs), min(ys)
+    width, height = max(max(xs) - x_min, 1e-12), max(max(ys) - y_min, 1e-12)
+    target_Ax = math.sqrt(G * max(width / height, 1e-12))
+    Ax = min((a for a in range(1, G + 1) if G % a == 0), key=lambda a: abs(a - target_Ax))
+    Ay = G // Ax
+    cell_w, cell_h = (width - 1e-12) / Ax, (height - 1e-12) / Ay
+    cells = {}
+    for p in places:
+        # zero-extent axis: the old loop raised on 0/0, the CSR grid puts every place at index 0
+        gx = min(max(int((p.coords[0] - x_min) / cell_w), 0), Ax - 1) if cell_w > 0 else 0
+        gy = min(max(int((p.coords[1] - y_min) / cell_h), 0), Ay - 1) if cell_h > 0 else 0
+        cells.setdefault((gx, gy), []).append(p)
+    return (Ax, Ay), cells
+
+
+def _datasets():
+    rng = np.random.default_rng(0)
+    pts = np.vstack([rng.normal(2, 0.1, (400, 2)), rng.uniform(-3, 7, (600, 2))])
+    yield "random", pts
+    yield "duplicates", np.repeat(pts[:50], 3, axis=0)
+    yield "lattice", np.array([(x, y) for x in range(17) for y in range(9)], dtype=float) * 0.25
+    yield "vertical", np.column_stack([np.full(80, 1.5), rng.uniform(0, 4, 80)])
+    yield "single", np.array([[3.0, -1.0]])
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+@pytest.mark.parametrize("name,pts", list(_datasets()))
+@pytest.mark.parametrize("G", [1, 7, 16, 64, 250, 1024])
+def test_csr_square_grid_matches_reference(name, pts, G):
+    places = [Place(i + 100, (float(x), float(y))) for i, (x, y) in enumerate(pts)]
+    dims, ref = _reference_cells(places, G)
+    for S in (places, PlaceSet.from_places(places)):
+        grid = SquareGrid(S, G)
+        assert grid.dims() == dims
+        CL = grid.get_full_cells()
+        assert [c.id for c in CL] == list(ref)                      # same cells, same order
+        for c in CL:
+            expected = ref[c.id]
+            assert c.size() == len(expected)
+            assert [p.id for p in c.places] == [p.id for p in expected]
+            np.testing.assert_allclose(c.compute_center(), np.mean([p.coords for p in expected], axis=0),
+                                       rtol=1e-12, atol=1e-12)
+        all_cells = grid.get_all_cells()
+        assert [c.id for c in all_cells] == [(gx, gy) for gx in range(dims[0]) for gy in range(dims[1])]
+        assert [c.size() for c in all_cells] == [len(ref.get(c.id, ())) for c in all_cells]
+
+
+def _clustered_places(K=3000, seed=1):
+    rng = np.random.default_rng(seed)
+    pts = np.vstack([rng.normal([0.2, 0.7], 0.01, (K // 3, 2)), rng.normal([0.8, 0.3], 0.1, (K // 3, 2)),
+                     rng.uniform(0, 1, (K - 2 * (K // 3), 2))])
+    pts[:40] = pts[40]                               # a stack of duplicates: cannot be split
+    return [Place(i, (float(x), float(y))) for i, (x, y) in enumerate(pts)]
+
+
+def _assert_partition(tree, S):
+    # every place in exactly one leaf, and inside it (its Morton prefix at the leaf level is the leaf code)
+    rows = np.concatenate([c.rows for c in tree.get_full_cells()])
+    np.testing.assert_array_equal(np.sort(rows), np.arange(len(S)))
+    codes = tree.morton.codes
+    for c, (level, code) in enumerate(zip(tree.cell_level, tree.cell_codes)):
+        leaf = codes[tree.cell_start[c]:tree.cell_start[c + 1]] >> np.uint32(2 * (MORTON_BITS - level))
+        assert (leaf == code).all()
+    assert sum(c.size() for c in tree.get_full_cells()) == len(S)
+
+
+@pytest.mark.parametrize("split", ["population", "extent"])
+def test_quadtree_budget_is_never_exceeded(split):
+    S = _clustered_places()
+    morton = MortonOrder(S)
+    for budget in list(range(1, 40)) + [64, 100, 250, 256, 1000, 5000]:
+        tree = QuadTreeGrid(S, max_leaves=budget, morton=morton, split=split)
+        n = len(tree.get_full_cells())
+        assert n <= budget
+        assert n >= min(budget, len(S) - 39) - 3         # stops at most 3 leaves short (a split adds up to 3)
+        _assert_partition(tree, S)
+
+
+@pytest.mark.parametrize("max_occupancy", [1, 5, 32, 500])
+@pytest.mark.parametrize("max_level", [3, 8, MORTON_BITS])
+def test_quadtree_occupancy_bounds_leaves_above_max_level(max_occupancy, max_level):
+    S = _clustered_places()
+    tree = QuadTreeGrid(S, max_occupancy=max_occupancy, max_level=max_level)
+    _assert_partition(tree, S)
+    over = tree.counts > max_occupancy
+    assert (tree.cell_level[over] == tree.max_level).all()
+    assert (tree.cell_level <= tree.max_level).all()
+    if max_occupancy < 40:
+        assert over.any()                                 # the duplicate stack stays one leaf
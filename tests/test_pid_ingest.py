@@ -0,0 +1,102 @@
+import os
+import re
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+import numpy as np
+import pytest
+from pid_ingest import ingest_pid
+
+FLOAT_RE = re.compile(r"[-+]?\d*\.?\d+(?:[eE][-+]?\d+)?")
+
+
+# ---------- the per-line readers the generators used before pid_ingest ----------
+def _baseline_yago(path):
+    raw = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            s = line.strip()
+            if not s or s.startswith("#"):
+                continue
+            nums = [float(x) for x in FLOAT_RE.findall(s.replace(",", " "))]
+            if len(nums) >= 3:
+                raw.append((nums[0], nums[1], nums[2]))
+            elif len(nums) == 2:
+                raw.append((float("nan"), nums[0], nums[1]))
+    a = np.array([r[1] for r in raw], dtype=float)
+    b = np.array([r[2] for r in raw], dtype=float)
+
+    def score(lat, lon):
+        valid = ((-90 <= lat) & (lat <= 90) & (-180 <= lon) & (lon <= 180)).sum()
+        return valid + 0.001 * ((lon.max()-lon.min()) - (lat.max()-lat.min()))
+
+    lat, lon = (a, b) if score(a, b) >= score(b, a) else (b, a)
+    ids = np.array([int(r[0]) if not np.isnan(r[0]) else -1 for r in raw], dtype=np.int64)
+    need_seq = ids < 0
+    ids[need_seq] = np.arange(1, need_seq.sum() + 1)
+    return ids, np.clip(lon, -180, 180), np.clip(lat, -90, 90)
+
+
+def _baseline_dbpedia(path):
+    out = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = line.replace(",", " ").split()
+            if len(parts) < 3:
+                continue
+            out.append((int(parts[0]), float(parts[1]), float(parts[2])))
+    return (np.array([r[0] for r in out], dtype=np.int64), np.array([r[1] for r in out]),
+            np.array([r[2] for r in out]))
+
+
+def _write_pid(path):
+    rng = np.random.default_rng(17)
+    lines = ["# pid lat lon", ""]
+    for i in range(300):
+        lat, lon = rng.uniform(-90, 90), rng.uniform(-180, 180)
+        if i % 37 == 5:
+            lines.append(f"  # comment {i}")
+        if i % 29 == 3:
+            lines.append("")
+        if i % 41 == 7:
+            lines.append(f"{lat!r} {lon!r}")              # no id
+        elif i % 23 == 11:
+            lines.append(f"{1000 + i},{lat:.6f},{lon:.6f}")
+        elif i % 19 == 2:
+            lines.append(f"{1000 + i}\t{lat:.3e}   {lon!r} 42")
+        else:
+            lines.append(f"{1000 + i} {lat!r} {lon!r}")
+    path.write_text("\n".join(lines))               # last line without a newline
+    return str(path)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("chunk_bytes", [1, 7, 64, 1 << 20])
+def test_ingest_pid_matches_baseline_yago_reader(tmp_path, workers, chunk_bytes):
+    path = _write_pid(tmp_path / "pid.txt")
+    ids, xs, ys = ingest_pid(path, orient=True, workers=workers, chunk_bytes=chunk_bytes)
+    ref_ids, ref_xs, ref_ys = _baseline_yago(path)
+    np.testing.assert_array_equal(ids, ref_ids)
+    np.testing.assert_array_equal(xs, ref_xs)
+    np.testing.assert_array_equal(ys, ref_ys)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("chunk_bytes", [1, 7, 1 << 20])
+def test_ingest_pid_matches_baseline_dbpedia_reader(tmp_path, workers, chunk_bytes):
+    path = _write_pid(tmp_path / "pid.txt")
+    ids, xs, ys = ingest_pid(path, orient=False, require_id=True, workers=workers, chunk_bytes=chunk_bytes)
+    ref_ids, ref_xs, ref_ys = _baseline_dbpedia(path)
+    np.testing.assert_array_equal(ids, ref_ids)
+    np.testing.assert_array_equal(xs, ref_xs)
+    np.testing.assert_array_equal(ys, ref_ys)
+
+
+def test_ingest_pid_without_numeric_rows_raises(tmp_path):
+    path = tmp_path / "pid.txt"
+    path.write_text("# only a comment\n\n")
+    with pytest.raises(ValueError):
+        ingest_pid(str(path), workers=1)
@@ -0,0 +1,83 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+import numpy as np
+import pytest
+import config as cfg
+import precompute_cache
+from models import Place, SquareGrid
+from precompute_cache import cache_key, cached_base_precompute, cached_virtual_grid, clear_cache
+
+
+def _places(K, seed=0):
+    rng = np.random.default_rng(seed)
+    return [Place(i, (float(x), float(y)), rF=float(r))
+            for i, (x, y, r) in enumerate(rng.uniform(0, 1, (K, 3)))]
+
+
+def _entries(cache_dir):
+    return sorted(n for n in os.listdir(cache_dir) if not n.startswith("."))
+
+
+@pytest.mark.parametrize("materialize", [True, False])
+def test_exact_hit_returns_the_miss_result(tmp_path, materialize):
+    S = _places(60)
+    psS, sS, _ = cached_base_precompute(S, materialize, cache_dir=str(tmp_path))
+    assert _entries(tmp_path) == [cache_key(S, "exact", materialize=materialize)]
+    psS2, sS2, _ = cached_base_precompute(S, materialize, cache_dir=str(tmp_path))
+    assert isinstance(psS2.values, np.memmap)
+    np.testing.assert_array_equal(psS2.values, psS.values)
+    assert dict(psS2) == dict(psS)
+    for i in range(len(S)):
+        np.testing.assert_array_equal(sS2.row(i), sS.row(i))
+    assert sS2[(3, 7)] == sS[(3, 7)]
+
+
+def test_grid_hit_returns_the_miss_result(tmp_path):
+    S = _places(200, seed=1)
+    CL = SquareGrid(S, 16).get_full_cells()
+    psS, sS, _ = cached_virtual_grid(CL, S, 16, cache_dir=str(tmp_path))
+    psS2, sS2, _ = cached_virtual_grid(CL, S, 16, cache_dir=str(tmp_path))
+    assert len(_entries(tmp_path)) == 1
+    np.testing.assert_array_equal(psS2.values, psS.values)
+    np.testing.assert_array_equal(sS2.cell_of, sS.cell_of)
+    np.testing.assert_array_equal(sS2.cell_matrix, sS.cell_matrix)
+    for i in (0, 17, 199):
+        np.testing.assert_array_equal(sS2.row(i), sS.row(i))
+
+
+def test_settings_are_read_from_config_at_call_time(tmp_path, monkeypatch):
+    S = _places(30)
+    monkeypatch.setattr(cfg, "PRECOMPUTE_CACHE_DIR", None, raising=False)
+    cached_base_precompute(S)
+    assert not os.listdir(tmp_path)
+
+    monkeypatch.setattr(cfg, "PRECOMPUTE_CACHE_DIR", str(tmp_path))
+    cached_base_precompute(S)
+    assert len(_entries(tmp_path)) == 1
+
+    monkeypatch.setattr(cfg, "PRECOMPUTE_CACHE_MAX_BYTES", 1)
+    cached_base_precompute(_places(30, seed=5))   # larger than the cap: not stored
+    assert len(_entries(tmp_path)) == 1
+
+    clear_cache()
+    assert not os.path.exists(tmp_path)
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    cache_dir = str(tmp_path)
+    A, B, C = _places(40, 1), _places(40, 2), _places(40, 3)
+    cached_base_precompute(A, cache_dir=cache_dir)
+    cached_base_precompute(B, cache_dir=cache_dir)
+    key_a, key_b = cache_key(A, "exact", materialize=True), cache_key(B, "exact", materialize=True)
+    entry = precompute_cache._entry_bytes(os.path.join(cache_dir, key_a))
+    os.utime(os.path.join(cache_dir, key_a, "meta.json"), (1_000, 1_000))
+    os.utime(os.path.join(cache_dir, key_b, "meta.json"), (2_000, 2_000))
+
+    cached_base_precompute(A, cache_dir=cache_dir)          # hit: A becomes most recent
+    cached_base_precompute(C, cache_dir=cache_dir, max_bytes=2 * entry + entry // 2)
+    assert _entries(tmp_path) == sorted([key_a, cache_key(C, "exact", materialize=True)])
+
+    precompute_cache.evict(cache_dir, 0)
+    assert _entries(tmp_path) == []
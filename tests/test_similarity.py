@@ -0,0 +1,68 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+import random
+
+import numpy as np
+import pytest
+import dataset_store
+import similarity
+from grid_iadu import old_grid_precompute
+from models import FullGrid, Place
+from similarity import diameter, maxDistance
+
+
+def _brute_diameter(coords):
+    d = np.subtract.outer(coords[:, 0], coords[:, 0]) ** 2 + np.subtract.outer(coords[:, 1], coords[:, 1]) ** 2
+    return float(np.sqrt(d.max()))
+
+
+def _cases():
+    rng = np.random.default_rng(7)
+    t = rng.uniform(-3.0, 5.0, 200)
+    yield "random", rng.normal(size=(300, 2))
+    yield "collinear", np.column_stack([t, 2.0 * t - 1.0])
+    yield "vertical", np.column_stack([np.full(50, 4.0), rng.uniform(0, 9, 50)])
+    yield "coincident", np.tile([[1.5, -2.5]], (40, 1))
+    yield "single", np.array([[3.0, 4.0]])
+    yield "two", np.array([[0.0, 0.0], [3.0, 4.0]])
+    yield "lattice", np.array([(x, y) for x in range(12) for y in range(9)], dtype=float)
+    yield "offset", rng.uniform(0, 1, (200, 2)) + np.array([1.0e6, -2.0e6])
+    yield "clustered", np.vstack([rng.normal(0, 1e-3, (100, 2)), rng.normal(50, 1e-3, (100, 2))])
+
+
+@pytest.mark.parametrize("name,coords", list(_cases()))
+def test_diameter_matches_all_pairs(name, coords):
+    assert diameter(coords) == pytest.approx(_brute_diameter(coords), rel=1e-12, abs=1e-12)
+
+
+def test_maxdistance_cache_hit_returns_same_value():
+    similarity._diameter_cache.clear()
+    coords = np.random.default_rng(3).uniform(0, 10, (120, 2))
+    S = [Place(i, (float(x), float(y))) for i, (x, y) in enumerate(coords)]
+    first = maxDistance(S)
+    assert len(similarity._diameter_cache) == 1
+    second = maxDistance([Place(p.id + 1000, p.coords) for p in S])
+    assert len(similarity._diameter_cache) == 1
+    assert first == second == pytest.approx(_brute_diameter(coords))
+
+
+@pytest.mark.parametrize("shape", ["uniform", "generate_flower_shape", "generate_bubble_clusters",
+                                   "generate_s_curve"])
+@pytest.mark.parametrize("G", [16, 64, 256])
+def test_lattice_pr_stays_close_to_cell_pr(shape, G):
+    random.seed(0)
+    np.random.seed(0)
+    if shape == "uniform":
+        S = [Place(i, tuple(np.random.uniform(0, 10, 2))) for i in range(1000)]
+    else:
+        S = getattr(dataset_store, shape)(1000)
+    grid = FullGrid(S, G)
+    FL = grid.get_all_cells()
+    grid.ensure_empty_cell_centers()
+    exact, _, _ = old_grid_precompute(FL, S, grid=grid, pr_mode="matrix")
+    approx, _, _ = old_grid_precompute(FL, S, grid=grid, pr_mode="fft")
+    # documented bound of lattice_pr: ~5e-3 * (N - 1) at worst on clustered data
+    err = np.abs(approx.values - exact.values).max() / (len(S) - 1)
+    assert err < (1e-3 if shape == "uniform" else 1e-2)
@@ -0,0 +1,115 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+import numpy as np
+import pytest
+from pid_ingest import open_universe
+from spatial_index import GridIndex
+
+
+def _universe(n=2000, seed=5):
+    rng = np.random.default_rng(seed)
+    xs = np.concatenate([rng.normal(0, 1, n // 2), rng.uniform(-10, 10, n - n // 2)])
+    ys = np.concatenate([rng.normal(3, 0.5, n // 2), rng.uniform(-4, 6, n - n // 2)])
+    xs[:50] = np.round(xs[:50])              # points exactly on box edges
+    ys[:50] = np.round(ys[:50])
+    return xs, ys
+
+
+def _brute_knn(xs, ys, ids, seed, K):
+    d = np.maximum(np.abs(xs - seed[0]), np.abs(ys - seed[1]))
+    return np.lexsort((ids, d))[:K]
+
+
+def _knn_seeds(xs, ys):
+    return np.array([
+        (xs[0], ys[0]),                        # on a data point
+        (0.0, 3.0),                            # inside the dense cluster
+        (9.9, -3.9),                           # sparse corner
+        (0.37, 2.5),
+        (40.0, 3.0),                           # out of bounds (right)
+        (-25.0, -30.0),                        # out of bounds (corner)
+    ])
+
+
+def _brute_box(xs, ys, box):
+    xmin, ymin, xmax, ymax = box
+    return np.flatnonzero((xs >= xmin) & (xs <= xmax) & (ys >= ymin) & (ys <= ymax))
+
+
+def test_query_bboxes_matches_brute_force_masks():
+    xs, ys = _universe()
+    index = GridIndex.build(xs, ys, per_cell=16)
+    boxes = [
+        (-1.0, 2.0, 1.0, 4.0),                 # edges on rounded points
+        (-100, -100, 100, 100),                # everything
+        (xs.min(), ys.min(), xs.max(), ys.max()),
+        (0.5, 0.5, 0.5, 0.5),                  # empty point box
+        (1.0, 3.0, 1.0, 3.0),                  # degenerate box on a data point
+        (2.0, -3.0, 2.0, 5.0),                 # zero-width strip
+        (3.0, 1.0, -3.0, 4.0),                 # inverted x
+        (-3.0, 4.0, 3.0, 1.0),                 # inverted y
+        (20.0, 20.0, 30.0, 30.0),              # outside the bounds
+        (-30.0, -1.0, -9.5, 1.0),              # straddles the left edge
+    ]
+    got = index.query_bboxes(xs, ys, boxes)
+    assert len(got) == len(boxes)
+    for box, rows in zip(boxes, got):
+        np.testing.assert_array_equal(rows, _brute_box(xs, ys, box))
+    np.testing.assert_array_equal(index.query_bbox(xs, ys, *boxes[0]), got[0])
+
+
+def test_query_bboxes_random_boxes():
+    xs, ys = _universe(seed=11)
+    index = GridIndex.build(xs, ys, per_cell=8)
+    rng = np.random.default_rng(2)
+    boxes = np.column_stack([rng.uniform(-12, 12, 200), rng.uniform(-6, 8, 200),
+                             rng.uniform(-12, 12, 200), rng.uniform(-6, 8, 200)])
+    for box, rows in zip(boxes, index.query_bboxes(xs, ys, boxes)):
+        np.testing.assert_array_equal(rows, _brute_box(xs, ys, box))
+
+
+def test_query_bboxes_empty_index():
+    index = GridIndex.build(np.empty(0), np.empty(0))
+    rows = index.query_bboxes(np.empty(0), np.empty(0), [(0, 0, 1, 1), (1, 1, 0, 0)])
+    assert [len(r) for r in rows] == [0, 0]
+
+
+@pytest.mark.parametrize("K", [1, 7, 64, 500])
+def test_knn_chebyshev_matches_full_lexsort(K):
+    xs, ys = _universe()
+    xs, ys = np.round(xs * 4) / 4, np.round(ys * 4) / 4     # many distance ties
+    ids = np.random.default_rng(1).permutation(len(xs)).astype(np.int64) + 100
+    index = GridIndex.build(xs, ys, per_cell=16)
+    seeds = _knn_seeds(xs, ys)
+    for seed, rows in zip(seeds, index.knn_chebyshev(xs, ys, ids, seeds, K)):
+        np.testing.assert_array_equal(rows, _brute_knn(xs, ys, ids, seed, K))
+
+
+def test_knn_chebyshev_K_larger_than_N():
+    xs, ys = _universe(n=40)
+    ids = np.arange(len(xs), dtype=np.int64)[::-1].copy()
+    index = GridIndex.build(xs, ys, per_cell=4)
+    seeds = _knn_seeds(xs, ys)
+    got = index.knn_chebyshev(xs, ys, ids, seeds, 100)
+    for seed, rows in zip(seeds, got):
+        assert len(rows) == len(xs)
+        np.testing.assert_array_equal(rows, _brute_knn(xs, ys, ids, seed, 100))
+    assert all(len(r) == 0 for r in index.knn_chebyshev(xs, ys, ids, seeds, 0))
+
+
+def test_snapshot_knn_chebyshev_workers(tmp_path):
+    xs, ys = _universe(n=600, seed=9)
+    ids = np.random.default_rng(4).permutation(len(xs)).astype(np.int64) + 1
+    pid = tmp_path / "pid.txt"
+    pid.write_text("".join(f"{i} {x!r} {y!r}\n" for i, x, y in zip(ids.tolist(), xs.tolist(), ys.tolist())))
+    snap = open_universe(str(pid), orient=False, snapshot_dir=str(tmp_path))
+    seeds = _knn_seeds(xs, ys)
+    serial = snap.knn_chebyshev(seeds, 25, workers=1)
+    parallel = snap.knn_chebyshev(seeds, 25, workers=2)
+    assert len(serial) == len(parallel) == len(seeds)
+    for seed, a, b in zip(seeds, serial, parallel):
+        expected = _brute_knn(xs, ys, ids, seed, 25)
+        np.testing.assert_array_equal(a, expected)
+        np.testing.assert_array_equal(b, expected)